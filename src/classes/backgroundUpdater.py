@@ -0,0 +1,217 @@
+import os
+import sys
+import atexit
+import sqlite3
+import threading
+import multiprocessing
+
+from classes.downloadManager import DownloadManager
+from classes.textParsers.archetypes import Archetypes
+from classes.textParsers.attributes import Attributes
+from classes.textParsers.races import Races
+from classes.textParsers.referenceSnapshot import ReferenceSnapshot
+from classes.databases.cardsDB import CardsDB
+from classes.databases.domainLookup import DomainLookup
+from classes.databases.domainCache import DomainCache
+from classes.domainKernel import DomainKernel
+
+# Checks for updates while the program is already running with the local data.
+# Downloading, merging the CDBs and updating the lookup all happen in a separate process (see UpdateData),
+# so the interfaces are never held up by the network. Once it's done, a thread of the program sets up the new data
+# (see PrepareData), and the interface calls ApplyUpdate from its own thread (so nothing is using the data at the time)
+# to swap it in, which only replaces files and handles.
+# The update process never changes the databases in use (nor anything in the Cache folder):
+# the CDBs are merged into a copy of the merged CDB and the lookup is updated in a copy, which are only moved in place on swap.
+class BackgroundUpdater:
+
+    STATUS_IDLE = ""
+    STATUS_CHECKING = "Checking for updates..."
+    STATUS_UP_TO_DATE = "Cards are up to date."
+    STATUS_UPDATED = "Cards were updated."
+    STATUS_FAILED = "Couldn't check for updates."
+
+    # The merged CDB and the lookup are updated in copies (with these names), so the ones in use never have half an update.
+    # The merged CDB's copy starts with DownloadManager.MERGED_CDB_PREFIX, so it's never merged as another CDB.
+    NEXT_MERGED_CDB_FILE = "merged_cards.next.cdb"
+    NEXT_LOOKUP_FILE = "lookup.next.sqlite3"
+
+    _instance = None
+
+    @staticmethod
+    def Instance():
+        if(BackgroundUpdater._instance is None):
+            BackgroundUpdater()
+
+        return BackgroundUpdater._instance
+
+    def __init__(self) -> None:
+        if(not BackgroundUpdater._instance is None):
+            raise Warning("This class is a Singleton!")
+
+        BackgroundUpdater._instance = self
+
+        self.process = None
+        # Receives the result of the update process (see RunUpdate).
+        self.receiver = None
+        # Waits for the update process and sets up its data (see PrepareData).
+        self.thread = None
+        # The result of the update process, as (if it succeeded, if there's new data or the error).
+        self.result = None
+        # The new data (Archetypes, Attributes, Races and CardsDB), set up but not in use yet.
+        self.prepared = None
+        self.applied = False
+        self.status = BackgroundUpdater.STATUS_IDLE
+
+    # Starts checking for updates. The local data must already be set up.
+    def Start(self) -> None:
+        # A fresh process, since forking one with the interface (and its threads) running isn't safe.
+        context = multiprocessing.get_context("spawn")
+        self.receiver, sender = context.Pipe(duplex=False)
+        # Flags set from the command line aren't carried over to the new process, so they're passed in.
+        self.process = context.Process(target=BackgroundUpdater.RunUpdate, args=(sender, CardsDB.USE_MEMORY_STORE))
+        self.process.start()
+        sender.close()
+
+        self.thread = threading.Thread(target=self.PrepareData, daemon=True)
+        self.thread.start()
+
+        # Closing the program shouldn't wait for the update. Every step of it can be safely interrupted
+        # (downloads are resumed, and databases are written in transactions), so it just carries on next time.
+        atexit.register(self.Stop)
+
+        self.status = BackgroundUpdater.STATUS_CHECKING
+
+    def Stop(self) -> None:
+        if(self.process is not None and self.process.is_alive()):
+            self.process.terminate()
+
+    # If the update finished and its data is set up. The new data is only used once ApplyUpdate is called.
+    def IsDone(self) -> bool:
+        return self.thread is not None and not self.thread.is_alive()
+
+    # Runs in the update process, sending back the result of UpdateData (or the error it raised).
+    @staticmethod
+    def RunUpdate(sender, useMemoryStore: bool) -> None:
+        try:
+            sender.send((True, BackgroundUpdater.UpdateData(useMemoryStore)))
+        except Exception as error:
+            sender.send((False, str(error)))
+
+    # Runs in the update process: downloads what changed and, if anything did, prepares all the data.
+    # Returns if there is new data.
+    @staticmethod
+    def UpdateData(useMemoryStore: bool) -> bool:
+        sys.stdout = open(os.devnull, 'w')
+
+        if(not DownloadManager.DownloadFiles()):
+            return False
+
+        # The program's snapshot is left alone, the references are just parsed.
+        ReferenceSnapshot.USE_FILE = False
+        Archetypes.Instance()
+        Attributes.Instance()
+        Races.Instance()
+
+        cdbFolder = DownloadManager.GetCdbFolder()
+        BackgroundUpdater.CopyDB(DownloadManager.GetMergedCDBPath(), os.path.join(cdbFolder, BackgroundUpdater.NEXT_MERGED_CDB_FILE))
+        DownloadManager.MERGED_CDB_FILE = BackgroundUpdater.NEXT_MERGED_CDB_FILE
+
+        # The downloaded CDBs are kept, since the copy is lost if the program closes before swapping it in.
+        # The cards are only read once here, so they aren't loaded into memory,
+        # but the lookup's workers (see DomainLookup.InitDomainsWorker) still do, unless it was turned off.
+        CardsDB.DELETE_MERGED_CDBS = False
+        CardsDB.USE_MEMORY_STORE = False
+        CardsDB.Instance()
+        CardsDB.USE_MEMORY_STORE = useMemoryStore
+
+        lookupFolder = DownloadManager.GetLookupFolder()
+        BackgroundUpdater.CopyDB(os.path.join(lookupFolder, DomainLookup.LOOKUP_FILE), os.path.join(lookupFolder, BackgroundUpdater.NEXT_LOOKUP_FILE))
+
+        DomainLookup.LOOKUP_FILE = BackgroundUpdater.NEXT_LOOKUP_FILE
+        DomainLookup.Instance().db.close()
+
+        return True
+
+    # Copies a database into another file (replacing it), while it may be in use.
+    @staticmethod
+    def CopyDB(path: str, copyPath: str) -> None:
+        current = sqlite3.connect(path)
+        copy = sqlite3.connect(copyPath)
+        current.backup(copy)
+        current.close()
+        copy.close()
+
+    # Swaps the new data in, if the update finished and found any. Returns if it did.
+    # Must be called from the thread using the data, when it isn't in the middle of using it.
+    def ApplyUpdate(self) -> bool:
+        if(not self.IsDone() or self.applied):
+            return False
+
+        self.applied = True
+
+        success, updated = self.result
+        if(not success):
+            print(f"Couldn't check for updates -> [{updated}].")
+            self.status = BackgroundUpdater.STATUS_FAILED
+            return False
+
+        if(not updated):
+            self.status = BackgroundUpdater.STATUS_UP_TO_DATE
+            return False
+
+        self.SwapData()
+        self.status = BackgroundUpdater.STATUS_UPDATED
+        return True
+
+    # Runs in a thread of the program: waits for the update process to finish and, if there's new data,
+    # sets up everything that takes a while (like loading the cards into memory) without touching the data in use.
+    def PrepareData(self) -> None:
+        try:
+            self.result = self.receiver.recv()
+        except EOFError:
+            self.result = (False, "the update process stopped")
+        self.receiver.close()
+
+        success, updated = self.result
+        if(not success or not updated):
+            return
+
+        try:
+            # Loaded here, so the ReferenceSnapshot in use is never touched from this thread.
+            snapshot = ReferenceSnapshot(True)
+            mergedCdbPath = os.path.join(DownloadManager.GetCdbFolder(), BackgroundUpdater.NEXT_MERGED_CDB_FILE)
+            self.prepared = (Archetypes(True, snapshot), Attributes(True, snapshot), Races(True, snapshot), CardsDB(detached=True, path=mergedCdbPath))
+        except Exception as error:
+            self.result = (False, str(error))
+
+    # Replaces the data in use with the prepared one.
+    # Everything is already set up, so only files and handles are swapped here.
+    def SwapData(self) -> None:
+        archetypes, attributes, races, cardsDB = self.prepared
+        self.prepared = None
+
+        CardsDB.Instance().CloseDB()
+        DomainLookup.Instance().db.close()
+        if(DomainCache._instance is not None):
+            DomainCache._instance.Close()
+
+        cardsDB.MoveDB(DownloadManager.GetMergedCDBPath())
+
+        lookupFolder = DownloadManager.GetLookupFolder()
+        os.replace(os.path.join(lookupFolder, BackgroundUpdater.NEXT_LOOKUP_FILE), os.path.join(lookupFolder, DomainLookup.LOOKUP_FILE))
+
+        Archetypes._instance = archetypes
+        Attributes._instance = attributes
+        Races._instance = races
+        CardsDB._instance = cardsDB
+
+        # Set up again from the new data once they're needed, like when the program starts.
+        DomainCache._instance = None
+        DomainKernel._instance = None
+
+        # Already updated by the update process, so it's only opened.
+        DomainLookup._instance = None
+        DomainLookup(False)
+
+    def GetStatus(self) -> str:
+        return self.status
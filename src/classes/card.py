@@ -30,15 +30,20 @@ class Card:
         # unlike the other values which are just reference.
         self.type = int(data[8])
 
-        # The setcodes (archetypes) are a bit tricky to retrieve.
-        # They are stored in the DB by concatenating hexdecimal values.
-        # So this just performs the oppositive operation:
-        # Get the first 16 bits, then the next 16, and so on.
-        self.setcodes = []
+        self.setcodes = Card.SplitSetcodes(self.setcodesHex)
+
+    # The setcodes (archetypes) are a bit tricky to retrieve.
+    # They are stored in the DB by concatenating hexdecimal values.
+    # So this just performs the oppositive operation:
+    # Get the first 16 bits, then the next 16, and so on.
+    @staticmethod
+    def SplitSetcodes(setcodesHex: int) -> list[int]:
+        setcodes = []
         for i in range(0, 49, 16):
-            setcode = (self.setcodesHex >> i) & self.HEX_SETCODE
+            setcode = (setcodesHex >> i) & Card.HEX_SETCODE
             if(setcode > 0):
-                self.setcodes.append(setcode)
+                setcodes.append(setcode)
+        return setcodes
     
     # Returns if this card is a (non-token) monster
     def IsMonster(self) -> bool:
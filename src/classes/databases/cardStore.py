@@ -0,0 +1,115 @@
+import sqlite3
+from array import array
+
+# In-memory, read-only copy of the merged cards database.
+# Every card is loaded once into compact columns (one array per field),
+# so single card lookups no longer need a SQLite round trip.
+class CardStore:
+
+    # Same flags used by CardsDB's queries (see the comment over there).
+    MONSTER = 1
+    TOKEN = 16384
+
+    # Ordered by id so the results match the order SQLite returns rows from datas.
+    LOAD_QUERY = "SELECT datas.id, alias, setcode, type, attribute, race, atk, def, name, desc FROM datas NATURAL JOIN texts ORDER BY datas.id"
+
+    def __init__(self, db: sqlite3.Connection) -> None:
+        # Numeric columns, one entry per card.
+        self.ids = array("q")
+        self.aliases = array("q")
+        self.setcodes = array("q")
+        self.types = array("q")
+        self.attributes = array("q")
+        self.races = array("q")
+        self.attacks = array("q")
+        self.defenses = array("q")
+
+        # Names and descriptions are interned: alt arts share the same texts,
+        # so each card only stores the position of its text in these lists.
+        self.names: list[str] = []
+        self.descs: list[str] = []
+        self.nameIds = array("l")
+        self.descIds = array("l")
+
+        # Indexes from a card's id / lowercase name into its position in the columns above.
+        self.idIndex: dict[int, int] = {}
+        self.nameIndex: dict[str, int] = {}
+
+        self.Load(db)
+
+    # Reads all cards from the db into the columns.
+    def Load(self, db: sqlite3.Connection) -> None:
+        internedNames = {}
+        internedDescs = {}
+
+        for id, alias, setcode, type, attribute, race, atk, defense, name, desc in db.execute(CardStore.LOAD_QUERY):
+            index = len(self.ids)
+
+            self.ids.append(id)
+            self.aliases.append(alias)
+            self.setcodes.append(setcode)
+            self.types.append(type)
+            self.attributes.append(attribute)
+            self.races.append(race)
+            self.attacks.append(atk)
+            self.defenses.append(defense)
+
+            if(name not in internedNames):
+                internedNames[name] = len(self.names)
+                self.names.append(name)
+            self.nameIds.append(internedNames[name])
+
+            if(desc not in internedDescs):
+                internedDescs[desc] = len(self.descs)
+                self.descs.append(desc)
+            self.descIds.append(internedDescs[desc])
+
+            self.idIndex[id] = index
+
+            # Names are compared case insensitive (like COLLATE NOCASE),
+            # and the first card with that name wins, like the fetchone() in CardsDB.
+            key = name.lower()
+            if(key not in self.nameIndex):
+                self.nameIndex[key] = index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # Returns the position of the card with the given id, or None if there's none.
+    def FindById(self, id) -> int:
+        try:
+            return self.idIndex.get(int(id))
+        except (TypeError, ValueError):
+            return None
+
+    # Returns the position of the card with the given name (case insensitive), or None if there's none.
+    def FindByName(self, name: str) -> int:
+        return self.nameIndex.get(name.lower())
+
+    # Returns if the card at the given position is a (non-token) monster.
+    def IsMonster(self, index: int) -> bool:
+        type = self.types[index]
+        return type & CardStore.MONSTER == CardStore.MONSTER and type & CardStore.TOKEN == 0
+
+    # Returns if the card at the given position is a spell or a trap (not a monster nor a token).
+    def IsSpellOrTrap(self, index: int) -> bool:
+        type = self.types[index]
+        return type & CardStore.MONSTER == 0 and type & CardStore.TOKEN == 0
+
+    def GetName(self, index: int) -> str:
+        return self.names[self.nameIds[index]]
+
+    # Returns the card at the given position with the same values (and order) as CardsDB.CARD_QUERY,
+    # so it can be used to create a Card.
+    def GetRow(self, index: int) -> tuple:
+        return (
+            self.ids[index],
+            self.setcodes[index],
+            self.attacks[index],
+            self.defenses[index],
+            self.races[index],
+            self.attributes[index],
+            self.names[self.nameIds[index]],
+            self.descs[self.descIds[index]],
+            self.types[index],
+        )
@@ -1,7 +1,13 @@
 import os
+import hashlib
 import sqlite3
+from urllib.request import pathname2url
+from collections.abc import Iterable
 
 from classes.downloadManager import DownloadManager
+from classes.textParsers.archetypes import Archetypes
+from classes.card import Card
+from classes.databases.cardStore import CardStore
 from classes.databases.databaseExceptions import CardIdNotFoundError, CardNameNotFoundError
 
 # Handles all the sqlite3 queries. 
@@ -12,12 +18,75 @@ class CardsDB:
     * datas.type & 1 = 1 -> this checks for the first bit of the datas.type. If it's 1, it means the card is a monster.
     * datas.type & 16384 = 0 -> same as last check, but removes tokens from the search, since they are still considered monsters.
     * Races -> Monster types (warrior, zombie, etc) are called races in the DB.
+    * The monster and spell/trap checks above must be written exactly like this (including the "datas."),
+      otherwise SQLite won't use the partial indexes created in CreateIndexes.
     """
     
     # Data which should be retrieved for the cards.
     # Make sure this matches the Card's constructor.
     CARD_QUERY = "datas.id, setcode, atk, def, race, attribute, name, desc, type from datas NATURAL JOIN texts"
 
+    # If set, all cards are loaded into memory once (see CardStore)
+    # and the queries below are answered from there instead of SQLite.
+    USE_MEMORY_STORE = True
+
+    # Max amount of values sent in a single "IN (...)" query,
+    # since SQLite limits how many parameters a query can have.
+    QUERY_CHUNK_SIZE = 900
+
+    # Tables that come from the downloaded CDBs (everything else is created by this program).
+    CDB_TABLES = ["datas", "texts"]
+
+    # Table inside the merged CDB with the hash of every file already merged into it,
+    # so files that didn't change since the last merge are skipped.
+    MERGED_FILES_TABLE = "merged_files"
+
+    # Table inside the merged CDB with the file each card was merged from,
+    # so when a file changes its cards are replaced with the new ones (see MergeSource).
+    SOURCE_TABLE = "card_source"
+
+    # Tables inside the merged CDB with a copy of the rows of every CDB besides the cards.cdb (with the file they're from),
+    # so the card can be taken from another file once the one it was merged from doesn't have it anymore (see MergeSource).
+    # The cards.cdb's rows aren't copied: it always takes precedence, so its cards are always the ones in use.
+    SOURCE_ROWS_PREFIX = "source_"
+
+    # Table inside the merged CDB with general information (key / value) used by this program.
+    INFO_TABLE = "toolbox_info"
+
+    # Table inside the merged CDB with every (card, setcode, base archetype of the setcode).
+    # Base archetypes follow Archetypes.GetBaseArchetype, so it must be rebuilt whenever the archetypes change.
+    SETCODE_TABLE = "card_setcode"
+    SETCODE_VERSION_KEY = "card_setcode_archetypes"
+
+    # Table inside the merged CDB with every (lowercase name, card).
+    # Names are searched through it (instead of COLLATE NOCASE, which only folds ASCII letters),
+    # so they're matched exactly like the .lower() done everywhere else (CardStore, DomainKernel, Domain).
+    NAME_TABLE = "card_name"
+    NAME_VERSION_KEY = "card_name_lower"
+    NAME_VERSION = "1"
+
+    # If not set, the CDBs are kept after being merged, so they're merged again into the next merged CDB
+    # (like when the update process merges them into a copy that may never be used, see BackgroundUpdater).
+    # They're deleted once they're found already merged.
+    DELETE_MERGED_CDBS = True
+
+    # SQLite only allows 10 databases to be attached at the same time.
+    MAX_ATTACHED_CDBS = 8
+
+    # Size of the blocks read when hashing a file.
+    HASH_CHUNK_SIZE = 1024 * 1024
+
+    # Indexes created in the merged CDB, so the queries below don't need to scan whole tables.
+    # The partial ones only hold monsters (or spells and traps), so filtering by them skips everything else.
+    # Check utilitaries/queryPlanChecker.py when adding or changing queries.
+    INDEXES = [
+        "CREATE INDEX IF NOT EXISTS datas_alias ON datas(alias)",
+        "CREATE INDEX IF NOT EXISTS datas_monster_attribute ON datas(attribute) WHERE type & 1 = 1 AND type & 16384 = 0",
+        "CREATE INDEX IF NOT EXISTS datas_monster_race ON datas(race) WHERE type & 1 = 1 AND type & 16384 = 0",
+        "CREATE INDEX IF NOT EXISTS datas_spell_trap ON datas(type) WHERE type & 1 = 0 AND type & 16384 = 0",
+        "CREATE INDEX IF NOT EXISTS card_setcode_base ON card_setcode(base_setcode, card_id)",
+    ]
+
     _instance = None
 
     @staticmethod
@@ -27,22 +96,56 @@ class CardsDB:
 
         return CardsDB._instance
 
-    def __init__(self) -> None:
-        if(not CardsDB._instance is None):
-            raise Warning("This class is a Singleton!")
+    # Replaces the current instance (if any) with one that only reads the merged CDB, without updating it.
+    # Used by worker processes, which can't share the main process' connection.
+    @staticmethod
+    def OpenReadOnly():
+        CardsDB._instance = None
+        CardsDB(True)
+
+        return CardsDB._instance
+
+    # Detached instances are set up without replacing the one in use, nor printing anything (see BackgroundUpdater).
+    # They don't update the merged CDB, can be set up in another thread than the one using them
+    # and can open another merged CDB than the one in use (see MoveDB).
+    def __init__(self, readOnly: bool = False, detached: bool = False, path: str = None) -> None:
+        if(not detached):
+            if(not CardsDB._instance is None):
+                raise Warning("This class is a Singleton!")
+
+            CardsDB._instance = self
 
-        CardsDB._instance = self
+            print("Setting up card database.")
 
-        print("Setting up card database.")
+        mergedCdbPath = DownloadManager.GetMergedCDBPath() if path is None else path
+        self.path = mergedCdbPath
 
-        mergedCdbPath = DownloadManager.GetMergedCDBPath()
-        CardsDB.UpdateDBs()
+        if(readOnly):
+            self.db = sqlite3.connect("file:{}?mode=ro".format(pathname2url(os.path.abspath(mergedCdbPath))), uri=True)
+        elif(detached):
+            self.db = sqlite3.connect(mergedCdbPath, check_same_thread=False)
+        else:
+            CardsDB.UpdateDBs()
+            self.db = sqlite3.connect(mergedCdbPath)
 
-        self.db = sqlite3.connect(mergedCdbPath)
         self.cursor = self.db.cursor()
 
-        print("Done.\n")
+        self.store: CardStore = None
+        if(CardsDB.USE_MEMORY_STORE):
+            self.store = CardStore(self.db)
 
+        if(not detached):
+            print("Done.\n")
+
+
+    # Returns the sha256 of a file's content.
+    @staticmethod
+    def GetFileHash(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CardsDB.HASH_CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
 
     # Merges all CDB files into a single database.
     # Used since some pre-release cards are in separate files.
@@ -50,75 +153,267 @@ class CardsDB:
     def UpdateDBs() -> None:
         print("Merging all CDBs into a single file.")
 
+        cdbFolder = DownloadManager.GetCdbFolder()
+        mergedPath = DownloadManager.GetMergedCDBPath()
+        mergedName = os.path.basename(mergedPath)
+
+        # Hashes of the files that will be merged.
+        # The cards.cdb must be hashed before it's renamed below.
+        hashes = {}
+        # Other merged CDBs (like the one prepared by the update process) are skipped too.
+        for file in os.listdir(cdbFolder):
+            if(file != mergedName and file.endswith(".cdb") and not file.startswith(DownloadManager.MERGED_CDB_PREFIX)):
+                hashes[file] = CardsDB.GetFileHash(os.path.join(cdbFolder, file))
+
         # Since the cards.cdb is always the biggest, we will use it as a base
-        initial_db_file = DownloadManager.CARDS_CDB
-
-        # However, if merged_cards.cdb already exists, use it instead
-        if(os.path.isfile(DownloadManager.GetMergedCDBPath())):
-                initial_db_file = DownloadManager.MERGED_CDB_PREFIX + DownloadManager.CARDS_CDB
-
-        merge_db = sqlite3.connect(os.path.join(DownloadManager.GetCdbFolder(), initial_db_file))
-        merge_cursor = merge_db.cursor()
-
-        # Retrieve all tables and columns from the CDB
-        queryTables = "SELECT name FROM sqlite_master WHERE type='table';"
-        tablesList = merge_cursor.execute(queryTables).fetchall()
-
-        # Dict of tables into their insertion queries
-        tableColumns = {}
-
-        for table in tablesList:
-            queryColumn = "PRAGMA table_info({})".format(table[0])
-            columns = merge_cursor.execute(queryColumn).fetchall()
-            # Creates a list of (?, ?, ?, ... , ?) to be used when inserting values in the cdb
-            tableColumns[table[0]] = ','.join(['?'] * len(columns))
-
-        for file in os.listdir(DownloadManager.GetCdbFolder()):
-            # For each CDB file other than cards.cdb
-            if(file != initial_db_file and file.endswith(".cdb")):
-                # Create a temp database connection
-                tempDB = sqlite3.connect(os.path.join(DownloadManager.GetCdbFolder(), file))
-                tempCursor = tempDB.cursor()
-
-                # For each table in cards.cdb
-                for table, column in tableColumns.items():
-                    selectQuery = "SELECT * FROM {}".format(table)
-                    insertQuery = "INSERT OR IGNORE INTO {} VALUES ({})"
-                    query = insertQuery.format(table, column)
-                    # For each row in the same table
-                    for row in tempCursor.execute(selectQuery).fetchall():
-                        # Insert it into the cards.cdb
-                        merge_cursor.execute(query, row)
-
-                tempDB.close()
-
-                # Delete CDB after it has been merged
-                os.remove(os.path.join(DownloadManager.GetCdbFolder(), file))
-        
-        # For some reason, alt arts have no setcode. This small code updates them accordingly.
-        updateAltArts = "UPDATE datas SET setcode = (SELECT setcode FROM datas as d2 WHERE datas.alias = d2.id) WHERE datas.alias != 0 AND datas.setcode = 0"
-        merge_cursor.execute(updateAltArts)
-
-        # Commiting save this to the current file (cards.cdb)
-        merge_db.commit()
+        # if merged_cards.cdb doesn't exist yet.
+        createdMerged = False
+        if(not os.path.isfile(mergedPath)):
+            os.rename(os.path.join(cdbFolder, DownloadManager.CARDS_CDB), mergedPath)
+            createdMerged = True
+
+        # Autocommit mode, so the transaction below is handled manually
+        # (SQLite can't attach databases in the middle of a transaction).
+        merge_db = sqlite3.connect(mergedPath, isolation_level=None)
+
+        CardsDB.CreateTables(merge_db)
+
+        mergedHashes = dict(merge_db.execute("SELECT file, hash FROM {}".format(CardsDB.MERGED_FILES_TABLE)).fetchall())
+        mainTables = set(row[0] for row in merge_db.execute("SELECT name FROM sqlite_master WHERE type='table'"))
+
+        # Only merge files whose content changed since the last time they were merged.
+        pending = []
+        for file, hash in hashes.items():
+            if(mergedHashes.get(file) == hash):
+                os.remove(os.path.join(cdbFolder, file))
+            else:
+                pending.append(file)
+
+        if(createdMerged):
+            pending.remove(DownloadManager.CARDS_CDB)
+
+        insert_hash = "INSERT OR REPLACE INTO {} (file, hash) VALUES (?, ?)".format(CardsDB.MERGED_FILES_TABLE)
+
+        if(len(pending) > 0 or createdMerged):
+            # Attach every file at once (up to SQLite's limit), so they are all merged in a single transaction.
+            for start in range(0, max(len(pending), 1), CardsDB.MAX_ATTACHED_CDBS):
+                batch = pending[start:start + CardsDB.MAX_ATTACHED_CDBS]
+
+                for n, file in enumerate(batch):
+                    merge_db.execute("ATTACH DATABASE ? AS source{}".format(n), (os.path.join(cdbFolder, file),))
+
+                merge_db.execute("BEGIN")
+
+                # Only before merging anything else, so every card merged so far comes from the cards.cdb.
+                if(createdMerged and start == 0):
+                    merge_db.execute(insert_hash, (DownloadManager.CARDS_CDB, hashes[DownloadManager.CARDS_CDB]))
+                    insert_sources = "INSERT OR REPLACE INTO {} (id, file) SELECT id, ? FROM datas".format(CardsDB.SOURCE_TABLE)
+                    merge_db.execute(insert_sources, (DownloadManager.CARDS_CDB,))
+
+                for n, file in enumerate(batch):
+                    CardsDB.MergeSource(merge_db, "source{}".format(n), file, mainTables)
+                    merge_db.execute(insert_hash, (file, hashes[file]))
+
+                # For some reason, alt arts have no setcode. This small code updates them accordingly.
+                updateAltArts = "UPDATE datas SET setcode = (SELECT setcode FROM datas as d2 WHERE datas.alias = d2.id) WHERE datas.alias != 0 AND datas.setcode = 0"
+                merge_db.execute(updateAltArts)
+
+                merge_db.execute("COMMIT")
+
+                for n in range(len(batch)):
+                    merge_db.execute("DETACH DATABASE source{}".format(n))
+
+                # Delete CDBs after they have been merged
+                if(CardsDB.DELETE_MERGED_CDBS):
+                    for file in batch:
+                        os.remove(os.path.join(cdbFolder, file))
+
+        # Always checked, so CDBs merged by older versions also get them.
+        CardsDB.CreateIndexes(merge_db)
+        CardsDB.UpdateCardSetcodes(merge_db, len(pending) > 0 or createdMerged)
+        CardsDB.UpdateCardNames(merge_db, len(pending) > 0 or createdMerged)
+
         merge_db.close()
 
-        # Rename cards.cdb into merged_cards.cdb
-        if(initial_db_file == DownloadManager.CARDS_CDB):
-            os.rename(
-                os.path.join(DownloadManager.GetCdbFolder(), DownloadManager.CARDS_CDB),
-                DownloadManager.GetMergedCDBPath()
-            )
+    # Merges a CDB (attached as "source") into the merged CDB, replacing the cards merged from an older version of it,
+    # so errata and removed cards are carried over too. Must be called within a transaction.
+    # Every card the file had or now has is given to the file that should have it among all CDBs merged so far:
+    # the cards.cdb takes precedence over any other file, and between other files the first one by name keeps the card.
+    # Cards merged before their file was tracked (see SOURCE_TABLE) are replaced by any file that has them.
+    @staticmethod
+    def MergeSource(db: sqlite3.Connection, source: str, file: str, mainTables: set[str]) -> None:
+        sourceTables = set(row[0] for row in db.execute("SELECT name FROM {}.sqlite_master WHERE type='table'".format(source)))
+        tables = [table for table in CardsDB.CDB_TABLES if table in mainTables]
+        isCardsCdb = file == DownloadManager.CARDS_CDB
+
+        # The cards whose file must be found again: the ones this file had and the ones it has now.
+        # Cards of the cards.cdb stay there when another file changes.
+        db.execute("DROP TABLE IF EXISTS temp.touched")
+        db.execute("CREATE TEMP TABLE touched (id INTEGER PRIMARY KEY)")
+        db.execute("INSERT OR IGNORE INTO temp.touched SELECT id FROM main.{} WHERE file = ?".format(CardsDB.SOURCE_TABLE), (file,))
+        if("datas" in sourceTables):
+            db.execute("INSERT OR IGNORE INTO temp.touched SELECT id FROM {}.datas".format(source))
+        if(not isCardsCdb):
+            db.execute("DELETE FROM temp.touched WHERE id IN (SELECT id FROM main.{} WHERE file = ?)".format(CardsDB.SOURCE_TABLE), (DownloadManager.CARDS_CDB,))
+
+        for table in tables:
+            db.execute("DELETE FROM main.{} WHERE id IN (SELECT id FROM temp.touched)".format(table))
+        db.execute("DELETE FROM main.{} WHERE id IN (SELECT id FROM temp.touched)".format(CardsDB.SOURCE_TABLE))
+
+        for table in tables:
+            if(isCardsCdb):
+                if(table in sourceTables):
+                    db.execute("INSERT OR REPLACE INTO main.{table} SELECT * FROM {source}.{table}".format(table=table, source=source))
+            else:
+                sourceRows = CardsDB.SOURCE_ROWS_PREFIX + table
+                db.execute("DELETE FROM main.{} WHERE file = ?".format(sourceRows), (file,))
+                if(table in sourceTables):
+                    db.execute("INSERT INTO main.{} SELECT ?, * FROM {}.{}".format(sourceRows, source, table), (file,))
+
+        if(isCardsCdb and "datas" in sourceTables):
+            insert_sources = "INSERT OR REPLACE INTO main.{} (id, file) SELECT id, ? FROM {}.datas".format(CardsDB.SOURCE_TABLE, source)
+            db.execute(insert_sources, (file,))
+
+        # Every other card is taken from the first of the other files that has it (if any).
+        insert_winners = """
+            INSERT INTO main.{sources} (id, file)
+            SELECT id, MIN(file) FROM main.{rows} WHERE id IN (SELECT id FROM temp.touched) AND id NOT IN (SELECT id FROM main.{sources}) GROUP BY id
+        """.format(sources=CardsDB.SOURCE_TABLE, rows=CardsDB.SOURCE_ROWS_PREFIX + "datas")
+        db.execute(insert_winners)
+
+        for table in tables:
+            columns = ",".join("rows.{}".format(row[1]) for row in db.execute("PRAGMA main.table_info({})".format(table)))
+            insert_rows = """
+                INSERT OR REPLACE INTO main.{table} SELECT {columns} FROM main.{rows} AS rows
+                WHERE rows.id IN (SELECT id FROM temp.touched) AND rows.file = (SELECT file FROM main.{sources} WHERE id = rows.id)
+            """.format(table=table, columns=columns, rows=CardsDB.SOURCE_ROWS_PREFIX + table, sources=CardsDB.SOURCE_TABLE)
+            db.execute(insert_rows)
+
+        db.execute("DROP TABLE temp.touched")
+
+    # Creates the tables this program adds to the merged CDB, if they don't exist yet.
+    @staticmethod
+    def CreateTables(db: sqlite3.Connection) -> None:
+        create_merged_files = "CREATE TABLE IF NOT EXISTS {} (file TEXT PRIMARY KEY, hash TEXT)".format(CardsDB.MERGED_FILES_TABLE)
+        db.execute(create_merged_files)
+
+        create_sources = "CREATE TABLE IF NOT EXISTS {} (id INTEGER PRIMARY KEY, file TEXT)".format(CardsDB.SOURCE_TABLE)
+        db.execute(create_sources)
+
+        # Same columns as the CDB's tables, after the file.
+        for table in CardsDB.CDB_TABLES:
+            sourceRows = CardsDB.SOURCE_ROWS_PREFIX + table
+            db.execute("CREATE TABLE IF NOT EXISTS {} AS SELECT '' AS file, * FROM {} WHERE 0".format(sourceRows, table))
+            db.execute("CREATE INDEX IF NOT EXISTS {rows}_id ON {rows}(id, file)".format(rows=sourceRows))
+
+        create_info = "CREATE TABLE IF NOT EXISTS {} (key TEXT PRIMARY KEY, value TEXT)".format(CardsDB.INFO_TABLE)
+        db.execute(create_info)
+
+        create_card_setcode = """
+            CREATE TABLE IF NOT EXISTS {} (
+                card_id         INTEGER,
+                setcode         INTEGER,
+                base_setcode    INTEGER,
+                PRIMARY KEY(card_id, setcode, base_setcode)
+            );
+        """.format(CardsDB.SETCODE_TABLE)
+        db.execute(create_card_setcode)
+
+        create_card_name = """
+            CREATE TABLE IF NOT EXISTS {} (
+                name_key        TEXT,
+                card_id         INTEGER,
+                PRIMARY KEY(name_key, card_id)
+            );
+        """.format(CardsDB.NAME_TABLE)
+        db.execute(create_card_name)
+
+    # Creates the indexes used by the queries, if they don't exist yet.
+    @staticmethod
+    def CreateIndexes(db: sqlite3.Connection) -> None:
+        for index in CardsDB.INDEXES:
+            db.execute(index)
+
+        # Names used to be searched through this one, before the card_name table.
+        db.execute("DROP INDEX IF EXISTS texts_name_nocase")
+
+    # Fills the card_setcode table, splitting each card's setcode and resolving their base archetypes.
+    # Only done if new cards were merged or the archetypes changed since the last time.
+    @staticmethod
+    def UpdateCardSetcodes(db: sqlite3.Connection, merged: bool) -> None:
+        version = Archetypes.Instance().GetVersion()
+
+        select_version = "SELECT value FROM {} WHERE key = ?".format(CardsDB.INFO_TABLE)
+        currentVersion = db.execute(select_version, (CardsDB.SETCODE_VERSION_KEY,)).fetchone()
+
+        if(not merged and currentVersion is not None and currentVersion[0] == version):
+            return
+
+        rows = []
+        for id, setcodesHex in db.execute("SELECT id, setcode FROM datas WHERE setcode != 0"):
+            for setcode in Card.SplitSetcodes(setcodesHex):
+                # Setcodes without a base archetype (like the ones in the IGNORE_LIST) are left out.
+                baseCodes = Archetypes.Instance().GetBaseArchetype(setcode)
+                if(baseCodes is not None):
+                    for baseCode in baseCodes:
+                        rows.append((id, setcode, baseCode))
+
+        db.execute("BEGIN")
+        db.execute("DELETE FROM {}".format(CardsDB.SETCODE_TABLE))
+        db.executemany("INSERT OR IGNORE INTO {} (card_id, setcode, base_setcode) VALUES (?, ?, ?)".format(CardsDB.SETCODE_TABLE), rows)
+        db.execute("INSERT OR REPLACE INTO {} (key, value) VALUES (?, ?)".format(CardsDB.INFO_TABLE), (CardsDB.SETCODE_VERSION_KEY, version))
+        db.execute("COMMIT")
+
+    # Fills the card_name table with the lowercase name of every card.
+    # Only done if new cards were merged (or it was never filled, or filled differently).
+    @staticmethod
+    def UpdateCardNames(db: sqlite3.Connection, merged: bool) -> None:
+        select_version = "SELECT value FROM {} WHERE key = ?".format(CardsDB.INFO_TABLE)
+        currentVersion = db.execute(select_version, (CardsDB.NAME_VERSION_KEY,)).fetchone()
+
+        if(not merged and currentVersion is not None and currentVersion[0] == CardsDB.NAME_VERSION):
+            return
+
+        rows = [(name.lower(), id) for id, name in db.execute("SELECT id, name FROM texts")]
+
+        db.execute("BEGIN")
+        db.execute("DELETE FROM {}".format(CardsDB.NAME_TABLE))
+        db.executemany("INSERT OR IGNORE INTO {} (name_key, card_id) VALUES (?, ?)".format(CardsDB.NAME_TABLE), rows)
+        db.execute("INSERT OR REPLACE INTO {} (key, value) VALUES (?, ?)".format(CardsDB.INFO_TABLE), (CardsDB.NAME_VERSION_KEY, CardsDB.NAME_VERSION))
+        db.execute("COMMIT")
+
+    # Moves the merged CDB to another path and opens it from there, keeping the cards in memory.
+    # Used to put a merged CDB prepared in another file in place of the one in use (see BackgroundUpdater).
+    def MoveDB(self, path: str) -> None:
+        self.db.close()
+        os.replace(self.path, path)
+
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.cursor = self.db.cursor()
 
     # Closes the db, if any.
     def CloseDB(self) -> None:
+        self.store = None
         if(self.db != None):
             self.cursor = None
             self.db.close()
             self.db = None
 
+    # Returns the (file, hash) of every CDB merged into this database.
+    # Changes whenever the cards change, so it can be used to tell if data generated from them is outdated.
+    def GetMergedFileHashes(self) -> list:
+        query = "SELECT file, hash FROM {} ORDER BY file".format(CardsDB.MERGED_FILES_TABLE)
+        return self.cursor.execute(query).fetchall()
+
     # Gets a single card's name through it's id (passcode)
     def GetNameById(self, id: int) -> str:
+        if(self.store is not None):
+            index = self.store.FindById(id)
+            if index is None:
+                raise CardIdNotFoundError(str(id))
+            return self.store.GetName(index)
+
         query = "SELECT name FROM texts WHERE id = ?"
         parameters = (id,)
         data = self.cursor.execute(query, parameters).fetchone()[0]
@@ -129,6 +424,12 @@ class CardsDB:
     # Returns the alias of a card, or 0 if there's none.
     # "Alias" refers to the "original name" of the card, like each harpy lady being "Harpy Lady"
     def GetAliasById(self, id: int) -> any:
+        if(self.store is not None):
+            index = self.store.FindById(id)
+            if index is None:
+                raise CardIdNotFoundError(str(id))
+            return self.store.aliases[index]
+
         query = "SELECT alias FROM datas WHERE datas.id = ?"
         parameters = (id,)
         data = self.cursor.execute(query, parameters).fetchone()
@@ -138,6 +439,12 @@ class CardsDB:
 
     # Gets a single card through it's id (passcode)
     def GetCardById(self, id: int) -> any:
+        if(self.store is not None):
+            index = self.store.FindById(id)
+            if index is None:
+                raise CardIdNotFoundError(str(id))
+            return self.store.GetRow(index)
+
         query = "SELECT {} WHERE datas.id = ?"
         query = query.format(CardsDB.CARD_QUERY)
         parameters = (id,)
@@ -148,6 +455,12 @@ class CardsDB:
 
     # Gets a single monster through it's id (passcode)
     def GetMonsterById(self, id: int) -> any:
+        if(self.store is not None):
+            index = self.store.FindById(id)
+            if index is None or not self.store.IsMonster(index):
+                raise CardIdNotFoundError(str(id))
+            return self.store.GetRow(index)
+
         query = "SELECT {} WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0 AND datas.id = ?"
         query = query.format(CardsDB.CARD_QUERY)
         parameters = (id,)
@@ -158,9 +471,15 @@ class CardsDB:
 
     # Gets a single monster through it's name
     def GetMonsterByName(self, name: str) -> any:
-        query = "SELECT {} WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0 AND texts.name = ? COLLATE NOCASE"
-        query = query.format(CardsDB.CARD_QUERY)
-        parameters = (name,)
+        if(self.store is not None):
+            index = self.store.FindByName(name)
+            if index is None or not self.store.IsMonster(index):
+                raise CardNameNotFoundError(name)
+            return self.store.GetRow(index)
+
+        query = "SELECT {} WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0 AND datas.id IN (SELECT card_id FROM {} WHERE name_key = ?) ORDER BY datas.id"
+        query = query.format(CardsDB.CARD_QUERY, CardsDB.NAME_TABLE)
+        parameters = (name.lower(),)
         data = self.cursor.execute(query, parameters).fetchone()
         if data is None:
             raise CardNameNotFoundError(name)
@@ -168,16 +487,78 @@ class CardsDB:
 
     # Gets a single card through it's name
     def GetCardByName(self, name: str) -> any:
-        query = "SELECT {} WHERE texts.name = ? COLLATE NOCASE"
-        query = query.format(CardsDB.CARD_QUERY)
-        parameters = (name,)
+        if(self.store is not None):
+            index = self.store.FindByName(name)
+            if index is None:
+                raise CardNameNotFoundError(name)
+            return self.store.GetRow(index)
+
+        query = "SELECT {} WHERE datas.id IN (SELECT card_id FROM {} WHERE name_key = ?) ORDER BY datas.id"
+        query = query.format(CardsDB.CARD_QUERY, CardsDB.NAME_TABLE)
+        parameters = (name.lower(),)
         data = self.cursor.execute(query, parameters).fetchone()
         if data is None:
             raise CardNameNotFoundError(name)
         return data
 
+    # Gets multiple cards through their ids (passcodes) using as few queries as possible.
+    # Returns the cards' data in the same order as the ids (duplicates included, None for the ones not found),
+    # as well as the list of ids that could not be found.
+    def GetCardsByIds(self, ids: list[int]) -> tuple[list, list]:
+        found = {}
+
+        if(self.store is not None):
+            for id in set(ids):
+                index = self.store.FindById(id)
+                if index is not None:
+                    found[id] = self.store.GetRow(index)
+
+        else:
+            unique = list(set(ids))
+            for start in range(0, len(unique), CardsDB.QUERY_CHUNK_SIZE):
+                chunk = unique[start:start + CardsDB.QUERY_CHUNK_SIZE]
+                query = "SELECT {} WHERE datas.id IN ({})"
+                query = query.format(CardsDB.CARD_QUERY, ",".join(["?"] * len(chunk)))
+                for row in self.cursor.execute(query, chunk):
+                    found[row[0]] = row
+
+        data = [found.get(id) for id in ids]
+        missing = [id for id in ids if id not in found]
+        return data, missing
+
+    # Gets multiple cards through their names (case insensitive) using as few queries as possible.
+    # Returns the cards' data in the same order as the names (duplicates included, None for the ones not found),
+    # as well as the list of names that could not be found.
+    def GetCardsByNames(self, names: list[str]) -> tuple[list, list]:
+        found = {}
+
+        if(self.store is not None):
+            for name in set(names):
+                index = self.store.FindByName(name)
+                if index is not None:
+                    found[name.lower()] = self.store.GetRow(index)
+
+        else:
+            unique = list(set(name.lower() for name in names))
+            for start in range(0, len(unique), CardsDB.QUERY_CHUNK_SIZE):
+                chunk = unique[start:start + CardsDB.QUERY_CHUNK_SIZE]
+                query = "SELECT {} WHERE datas.id IN (SELECT card_id FROM {} WHERE name_key IN ({})) ORDER BY datas.id"
+                query = query.format(CardsDB.CARD_QUERY, CardsDB.NAME_TABLE, ",".join(["?"] * len(chunk)))
+                for row in self.cursor.execute(query, chunk):
+                    # Keep the first card found with the name, like GetCardByName.
+                    found.setdefault(row[6].lower(), row)
+
+        data = [found.get(name.lower()) for name in names]
+        missing = [name for name in names if name.lower() not in found]
+        return data, missing
+
     # Gets all monsters within the domain's race and attributes
-    def GetMonstersByAttributeAndRace(self, attributes: list[int], races: list[int]) -> sqlite3.Cursor:
+    def GetMonstersByAttributeAndRace(self, attributes: list[int], races: list[int]) -> Iterable:
+        if(self.store is not None):
+            store = self.store
+            return (store.GetRow(i) for i in range(len(store))
+                    if store.IsMonster(i) and (store.attributes[i] in attributes or store.races[i] in races))
+
         query = "SELECT {} WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0 AND (datas.attribute in {} OR datas.race in {})"
         attributes_query = "({})".format(",".join(str(s) for s in attributes))
         races_query = "({})".format(",".join(str(s) for s in races))
@@ -186,25 +567,87 @@ class CardsDB:
     
     # Gets all monsters outside of the domain's race and attributes; the oppositive of the above method.
     # These are manually checked if they are the same archetype, named in the DM's desc and so on.
-    def GetMonstersExcludingAttributeAndRace(self, attributes: list[int], races: list[int]) -> sqlite3.Cursor:
+    def GetMonstersExcludingAttributeAndRace(self, attributes: list[int], races: list[int]) -> Iterable:
+        if(self.store is not None):
+            store = self.store
+            return (store.GetRow(i) for i in range(len(store))
+                    if store.IsMonster(i) and store.attributes[i] not in attributes and store.races[i] not in races)
+
         query = "SELECT {} WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0 AND datas.attribute not in {} AND datas.race not in {}"
         attributes_query = "({})".format(",".join(str(s) for s in attributes))
         races_query = "({})".format(",".join(str(s) for s in races))
         query = query.format(CardsDB.CARD_QUERY, attributes_query, races_query)
         return self.cursor.execute(query)
 
+    # Gets every card in a domain with a single query, in the same order they used to be added one pass at a time:
+    # first the monsters with one of the attributes or races,
+    # then the other monsters from one of the (base) archetypes or named in the given list (lowercase names),
+    # then, if requested, all spells and traps. Each part is ordered by id.
+    # The archetypes and names are searched through the card_setcode and card_name tables, so no other monster is ever read.
+    def GetDomainCards(self, attributes: list[int], races: list[int], setcodes: list[int], names: list[str], includeSpellsAndTraps: bool) -> Iterable:
+        query = """
+            SELECT 0, {card} WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0 AND (datas.attribute in ({attributes}) OR datas.race in ({races}))
+            UNION ALL
+            SELECT 1, {card} WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0 AND datas.attribute not in ({attributes}) AND datas.race not in ({races})
+                AND datas.id IN (
+                    SELECT card_id FROM {setcode} WHERE base_setcode IN ({setcodes})
+                    UNION
+                    SELECT card_id FROM {name} WHERE name_key IN ({names})
+                )"""
+
+        if(includeSpellsAndTraps):
+            query += """
+            UNION ALL
+            SELECT 2, {card} WHERE datas.type & 1 = 0 AND datas.type & 16384 = 0"""
+
+        # The first column is only used to order the parts.
+        query += """
+            ORDER BY 1, 2"""
+
+        query = query.format(
+            card=CardsDB.CARD_QUERY,
+            attributes=",".join(str(s) for s in attributes),
+            races=",".join(str(s) for s in races),
+            setcode=CardsDB.SETCODE_TABLE,
+            setcodes=",".join(str(s) for s in setcodes),
+            name=CardsDB.NAME_TABLE,
+            names=",".join(["?"] * len(names))
+        )
+        return (row[1:] for row in self.cursor.execute(query, [name.lower() for name in names]))
+
     # Gets all monsters' ids.
     def GetAllMonsterIds(self) -> list:
+        if(self.store is not None):
+            return [(self.store.ids[i],) for i in range(len(self.store)) if self.store.IsMonster(i)]
+
         query = "SELECT id from datas WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0"
         return self.cursor.execute(query).fetchall()
 
     # Get all monsters' names.
     def GetAllMonsterNames(self) -> list:
+        if(self.store is not None):
+            names = set(self.store.GetName(i) for i in range(len(self.store)) if self.store.IsMonster(i))
+            return [(name,) for name in sorted(names)]
+
         query = "SELECT DISTINCT name FROM texts NATURAL JOIN datas WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0 ORDER BY name"
         return self.cursor.execute(query).fetchall()
 
+    # Gets all monsters (but not tokens).
+    def GetAllMonsters(self) -> Iterable:
+        if(self.store is not None):
+            store = self.store
+            return (store.GetRow(i) for i in range(len(store)) if store.IsMonster(i))
+
+        query = "SELECT {} WHERE datas.type & 1 = 1 AND datas.type & 16384 = 0"
+        query = query.format(CardsDB.CARD_QUERY)
+        return self.cursor.execute(query)
+
     # Gets all the cards which are not monsters (nor tokens), so should be only spell and trap cards.
-    def GetAllSpellsAndTraps(self) -> sqlite3.Cursor:
+    def GetAllSpellsAndTraps(self) -> Iterable:
+        if(self.store is not None):
+            store = self.store
+            return (store.GetRow(i) for i in range(len(store)) if store.IsSpellOrTrap(i))
+
         query = "SELECT {} WHERE datas.type & 1 = 0 AND datas.type & 16384 = 0"
         query = query.format(CardsDB.CARD_QUERY)
         return self.cursor.execute(query)
\ No newline at end of file
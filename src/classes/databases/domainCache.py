@@ -0,0 +1,162 @@
+import os
+import json
+import atexit
+import time
+import hashlib
+import sqlite3
+from array import array
+
+from classes.downloadManager import DownloadManager
+from classes.databases.cardsDB import CardsDB
+
+# Stores the cards of generated domains on disk, so the same domain doesn't have to be populated over and over.
+# Each entry is keyed by the domain's content (attributes, races, archetypes, named cards and if spells/traps are included)
+# and keeps the ids of all cards in it.
+# Entries are tied to a fingerprint of the cards and reference files, so they're ignored once any of these change.
+class DomainCache:
+
+    CACHE_FILE = "domains.sqlite3"
+    DOMAIN_TABLE = "domain_cards"
+
+    # Table used by older versions, keyed by the DM's id.
+    OLD_DOMAIN_TABLE = "domain"
+
+    # Max amount of domains kept. The least recently used ones are removed first.
+    MAX_ENTRIES = 512
+
+    # New entries are kept in memory and written all at once when there are this many (or when closing the cache).
+    WRITE_BATCH_SIZE = 32
+
+    # Changes whenever the way domains are generated (or the order of their cards) does.
+    CACHE_VERSION = 2
+
+    _instance = None
+
+    @staticmethod
+    def Instance():
+        if(DomainCache._instance is None):
+            DomainCache()
+
+        return DomainCache._instance
+
+    def __init__(self) -> None:
+        if(not DomainCache._instance is None):
+            raise Warning("This class is a Singleton!")
+
+        DomainCache._instance = self
+
+        cacheFolder = DownloadManager.GetCacheFolder()
+        if(not os.path.exists(cacheFolder)):
+            os.mkdir(cacheFolder)
+
+        self.db = sqlite3.connect(os.path.join(cacheFolder, DomainCache.CACHE_FILE))
+        self.CreateTables()
+
+        # Entries not written yet ({key : (card ids, time added)}) and when each written entry was last read,
+        # kept in memory so reading from (or adding to) the cache doesn't write to disk every time.
+        # Written all at once by Write (see WRITE_BATCH_SIZE), which is also done when closing the cache.
+        self.pending: dict[str, tuple[list[int], int]] = {}
+        self.lastUsed: dict[str, int] = {}
+        atexit.register(self.Close)
+
+        self.fingerprint = DomainCache.GetFingerprint()
+
+        # Entries from older data will never be used again.
+        self.db.execute("DELETE FROM {} WHERE fingerprint != ?".format(DomainCache.DOMAIN_TABLE), (self.fingerprint,))
+        self.db.commit()
+
+    def CreateTables(self) -> None:
+        self.db.execute("DROP TABLE IF EXISTS {}".format(DomainCache.OLD_DOMAIN_TABLE))
+
+        create_domain = """
+            CREATE TABLE IF NOT EXISTS {} (
+                key             TEXT PRIMARY KEY,
+                fingerprint     TEXT,
+                card_ids        BLOB,
+                last_used       INTEGER
+            );
+        """.format(DomainCache.DOMAIN_TABLE)
+        self.db.execute(create_domain)
+        self.db.commit()
+
+    # Returns a hash of all the data used to generate domains:
+    # the CDBs merged into the cards database, the reference files and the cache's version.
+    @staticmethod
+    def GetFingerprint() -> str:
+        sha = hashlib.sha256()
+        sha.update(f"{DomainCache.CACHE_VERSION}\n".encode("utf8"))
+
+        for file, hash in CardsDB.Instance().GetMergedFileHashes():
+            sha.update(f"{file}:{hash}\n".encode("utf8"))
+
+        sha.update(DownloadManager.GetReferenceFilesHash().encode("utf8"))
+
+        return sha.hexdigest()
+
+    # Returns the key of a domain's entry: a hash of everything that decides which cards are in it.
+    # Different DMs with the same domain share the entry.
+    @staticmethod
+    def GetKey(domain, includeSpellsAndTraps: bool) -> str:
+        content = json.dumps([
+            sorted(domain.attributes),
+            sorted(domain.races),
+            sorted(domain.setcodes),
+            sorted(domain.namedCards),
+            includeSpellsAndTraps,
+        ])
+        return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+    # Returns the ids of the cards in the domain, or None if it's not cached.
+    def Get(self, domain, includeSpellsAndTraps: bool) -> list[int]:
+        key = DomainCache.GetKey(domain, includeSpellsAndTraps)
+
+        if(key in self.pending):
+            cardIds, _ = self.pending[key]
+            self.pending[key] = (cardIds, time.time_ns())
+            return cardIds
+
+        query = "SELECT card_ids FROM {} WHERE key = ? AND fingerprint = ?"
+        data = self.db.execute(query.format(DomainCache.DOMAIN_TABLE), (key, self.fingerprint)).fetchone()
+        if data is None:
+            return None
+
+        self.lastUsed[key] = time.time_ns()
+
+        cardIds = array("q")
+        cardIds.frombytes(data[0])
+        return cardIds.tolist()
+
+    # Stores the ids of the cards in the domain.
+    def Add(self, domain, cardIds: list[int], includeSpellsAndTraps: bool) -> None:
+        key = DomainCache.GetKey(domain, includeSpellsAndTraps)
+        self.lastUsed.pop(key, None)
+        self.pending[key] = (list(cardIds), time.time_ns())
+
+        if(len(self.pending) >= DomainCache.WRITE_BATCH_SIZE):
+            self.Write()
+
+    # Writes the pending entries and last use times in a single transaction,
+    # then removes the least recently used entries above MAX_ENTRIES.
+    def Write(self) -> None:
+        insert = "INSERT OR REPLACE INTO {} (key, fingerprint, card_ids, last_used) VALUES (?, ?, ?, ?)".format(DomainCache.DOMAIN_TABLE)
+        self.db.executemany(insert, [
+            (key, self.fingerprint, array("q", cardIds).tobytes(), lastUsed) for key, (cardIds, lastUsed) in self.pending.items()
+        ])
+        self.pending.clear()
+
+        update = "UPDATE {} SET last_used = ? WHERE key = ?".format(DomainCache.DOMAIN_TABLE)
+        self.db.executemany(update, [(lastUsed, key) for key, lastUsed in self.lastUsed.items()])
+        self.lastUsed.clear()
+
+        evict = "DELETE FROM {table} WHERE key NOT IN (SELECT key FROM {table} ORDER BY last_used DESC LIMIT ?)"
+        self.db.execute(evict.format(table=DomainCache.DOMAIN_TABLE), (DomainCache.MAX_ENTRIES,))
+        self.db.commit()
+
+    # Writes anything pending and closes the cache, if it isn't closed yet.
+    def Close(self) -> None:
+        if(self.db is None):
+            return
+
+        self.Write()
+        self.db.close()
+        self.db = None
@@ -0,0 +1,209 @@
+import time
+import sqlite3
+from collections.abc import Iterable
+
+import numpy as np
+
+from classes.textParsers.archetypes import Archetypes
+from classes.card import Card
+
+# Inverted index of the lookup, kept in memory.
+# Every attribute, race, base archetype and mention points to a bitmap of the DMs that have it in their domain.
+# Bitmaps are Python ints, where bit N is the N-th DM of the lookup (ordered by id),
+# so filtering a whole deck is just a few bitwise ORs and ANDs.
+class DomainIndex:
+
+    def __init__(self, db: sqlite3.Connection) -> None:
+        self.masters: list[int] = []
+        self.attributes: dict[int, int] = {}
+        self.races: dict[int, int] = {}
+        self.archetypes: dict[int, int] = {}
+        self.mentions: dict[str, int] = {}
+
+        self.Load(db)
+
+    # Reads the whole lookup.
+    def Load(self, db: sqlite3.Connection) -> None:
+        # Imported here since DomainLookup uses this class.
+        from classes.databases.domainLookup import DomainLookup
+
+        masters = db.execute("SELECT id, {attr}, {race} FROM {master} ORDER BY id".format(
+            master=DomainLookup.DM_TABLE, attr=DomainLookup.ATTR_MASK, race=DomainLookup.RACE_MASK
+        )).fetchall()
+
+        self.masters = [row[0] for row in masters]
+        ordinals = {id: ordinal for ordinal, id in enumerate(self.masters)}
+
+        self.all = (1 << len(self.masters)) - 1
+
+        attributes = [(attr, id) for id, attrMask, _ in masters for attr in DomainLookup.SplitMask(attrMask)]
+        races = [(race, id) for id, _, raceMask in masters for race in DomainLookup.SplitMask(raceMask)]
+        self.attributes = self.LoadBitmaps(attributes, ordinals)
+        self.races = self.LoadBitmaps(races, ordinals)
+
+        query = "SELECT {arch}, {master} FROM {arch}".format(master=DomainLookup.DM_TABLE, arch=DomainLookup.ARCH_TABLE)
+        self.archetypes = self.LoadBitmaps(db.execute(query), ordinals)
+
+        query = "SELECT {names}.name, {mention}.{master} FROM {mention} JOIN {names} ON {names}.id = {mention}.{mention}".format(
+            master=DomainLookup.DM_TABLE, mention=DomainLookup.QUOT_TABLE, names=DomainLookup.MENTION_NAME_TABLE
+        )
+        self.mentions = self.LoadBitmaps(db.execute(query), ordinals)
+
+        # How many DMs each key has, used to guess how selective a monster is.
+        self.attributeCounts = DomainIndex.CountBitmaps(self.attributes)
+        self.raceCounts = DomainIndex.CountBitmaps(self.races)
+        self.archetypeCounts = DomainIndex.CountBitmaps(self.archetypes)
+        self.mentionCounts = DomainIndex.CountBitmaps(self.mentions)
+
+    # Builds a bitmap for each key of the given (key, DM id) rows.
+    def LoadBitmaps(self, rows: Iterable, ordinals: dict[int, int]) -> dict:
+        positions: dict = {}
+        for key, master in rows:
+            if(master in ordinals):
+                positions.setdefault(key, []).append(ordinals[master])
+
+        size = (len(self.masters) + 7) // 8
+
+        bitmaps = {}
+        for key, keyPositions in positions.items():
+            bits = bytearray(size)
+            for position in keyPositions:
+                bits[position >> 3] |= 1 << (position & 7)
+            bitmaps[key] = int.from_bytes(bits, "little")
+
+        return bitmaps
+
+    # Returns what makes a monster fit (or not) a domain: (attribute, race, name, base archetypes).
+    # Monsters with the same signature are in exactly the same domains.
+    @staticmethod
+    def GetSignature(monster: Card) -> tuple:
+        baseArchs = set()
+        for arch in monster.setcodes:
+            codes = Archetypes.Instance().GetBaseArchetype(arch)
+            if codes is not None:
+                baseArchs.update(codes)
+
+        return (monster.attribute, monster.race, monster.name.lower(), tuple(sorted(baseArchs)))
+
+    @staticmethod
+    def CountBitmaps(bitmaps: dict) -> dict:
+        return {key: bin(bits).count("1") for key, bits in bitmaps.items()}
+
+    # Returns the bitmap of all DMs that have monsters with the given signature in their domain.
+    def FilterSignature(self, signature: tuple) -> int:
+        attribute, race, name, baseArchs = signature
+
+        bits = self.attributes.get(attribute, 0)
+        bits |= self.races.get(race, 0)
+        bits |= self.mentions.get(name, 0)
+
+        for baseArch in baseArchs:
+            bits |= self.archetypes.get(baseArch, 0)
+
+        return bits
+
+    # Returns an upper bound of how many DMs have monsters with the given signature in their domain,
+    # from how many DMs each of its keys has.
+    def EstimateSignature(self, signature: tuple) -> int:
+        attribute, race, name, baseArchs = signature
+
+        estimate = self.attributeCounts.get(attribute, 0)
+        estimate += self.raceCounts.get(race, 0)
+        estimate += self.mentionCounts.get(name, 0)
+
+        for baseArch in baseArchs:
+            estimate += self.archetypeCounts.get(baseArch, 0)
+
+        return estimate
+
+    # Returns the bitmap of all DMs that have the given monster in their domain.
+    def FilterMonster(self, monster: Card) -> int:
+        return self.FilterSignature(DomainIndex.GetSignature(monster))
+
+    # Returns the bitmap of all DMs that have every given monster in their domain.
+    # Monsters with a repeated signature are only checked once, and the ones with the fewest DMs go first,
+    # so the search can stop as soon as no DM is left.
+    def FilterDeck(self, monsters: list[Card], stats: "SearchStats" = None) -> int:
+        start = time.perf_counter()
+
+        signatures = set([DomainIndex.GetSignature(monster) for monster in monsters])
+
+        evaluated = 0
+        bits = self.all
+        for signature in sorted(signatures, key=self.EstimateSignature):
+            if(bits == 0):
+                break
+
+            bits &= self.FilterSignature(signature)
+            evaluated += 1
+
+        if(stats is not None):
+            stats.monsters = len(monsters)
+            stats.signatures = len(signatures)
+            stats.evaluated = evaluated
+            stats.masters = bin(bits).count("1")
+            stats.time = time.perf_counter() - start
+
+        return bits
+
+    # Returns the DMs whose domains have the most of the given monsters, as (DM id, monsters missing from its domain),
+    # best first. At most "amount" DMs are returned.
+    # Each distinct signature becomes a row of a (signatures x DMs) matrix, so every DM is counted at once.
+    def RankDeck(self, monsters: list[Card], amount: int) -> list[tuple[int, list[Card]]]:
+        bySignature: dict[tuple, list[Card]] = {}
+        for monster in monsters:
+            bySignature.setdefault(DomainIndex.GetSignature(monster), []).append(monster)
+
+        signatures = list(bySignature.keys())
+        if(len(signatures) == 0 or len(self.masters) == 0):
+            return []
+
+        covered = np.zeros((len(signatures), len(self.masters)), dtype=bool)
+        for row, signature in enumerate(signatures):
+            covered[row] = self.ToArray(self.FilterSignature(signature))
+
+        # Copies count, so a DM missing a card played 3 times ranks below one missing a card played once.
+        weights = np.array([len(bySignature[signature]) for signature in signatures], dtype=np.int64)
+        counts = weights @ covered
+
+        # Most monsters covered first, then by id so ties always come out the same.
+        order = np.lexsort((np.array(self.masters), -counts))[:amount]
+
+        ranking = []
+        for ordinal in order:
+            missing = []
+            for row in np.flatnonzero(~covered[:, ordinal]):
+                missing += bySignature[signatures[row]]
+            ranking.append((self.masters[ordinal], missing))
+
+        return ranking
+
+    # Returns a bitmap as a boolean array, with one entry per DM.
+    def ToArray(self, bits: int) -> np.ndarray:
+        data = np.frombuffer(bits.to_bytes((len(self.masters) + 7) // 8, "little"), dtype=np.uint8)
+        return np.unpackbits(data, bitorder="little")[:len(self.masters)].astype(bool)
+
+    # Returns the ids of the DMs in the bitmap.
+    def GetMasters(self, bits: int) -> list[int]:
+        # The binary string (reversed, so index N is bit N) is much faster to walk than shifting the int around.
+        return [self.masters[i] for i, bit in enumerate(bin(bits)[:1:-1]) if bit == "1"]
+
+# Statistics of a single reverse search.
+class SearchStats:
+
+    def __init__(self) -> None:
+        # Monsters in the deck.
+        self.monsters = 0
+        # Distinct monster signatures among them (see DomainIndex.GetSignature).
+        self.signatures = 0
+        # Signatures actually checked before the search ended.
+        self.evaluated = 0
+        # DMs found.
+        self.masters = 0
+        # Seconds taken.
+        self.time = 0.0
+
+    def __str__(self) -> str:
+        return "Checked {} of {} distinct monsters ({} in the deck), found {} DMs in {:.1f}ms.".format(
+            self.evaluated, self.signatures, self.monsters, self.masters, self.time * 1000
+        )
@@ -1,13 +1,27 @@
 import sys
 import os
+import time
+import hashlib
 import sqlite3
 
-from multiprocessing import Process, Manager
+# Only available on Unix, used to report memory usage.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 
 from classes.downloadManager import DownloadManager
 from classes.databases.cardsDB import CardsDB
+from classes.databases.domainIndex import DomainIndex, SearchStats
 from classes.databases.databaseExceptions import CardIdNotFoundError, CardNameNotFoundError
 from classes.textParsers.archetypes import Archetypes
+from classes.textParsers.attributes import Attributes
+from classes.textParsers.races import Races
+from classes.textParsers.referenceSnapshot import ReferenceSnapshot
 
 from classes.card import Card
 from classes.domain import Domain
@@ -18,12 +32,66 @@ class DomainLookup:
     
     LOOKUP_FILE = "lookup.sqlite3"
 
+    # Amount of DMs each worker generates per job when updating the lookup.
+    # Each job's domains are written to the lookup in their own transaction.
+    JOB_CHUNK_SIZE = 256
+
+    # Jobs handed to each worker at once while updating the lookup.
+    JOBS_PER_WORKER = 2
+
+    # Temporary table holding the keys of a deck being searched (see FindMastersForDeck).
+    DECK_KEY_TABLE = "deck_key"
+
+    # If reverse searches use the in-memory index (DomainIndex) instead of querying the lookup.
+    USE_MEMORY_INDEX = True
+
+    # Amount of DMs shown when ranking the closest DMs for a deck.
+    RANKING_SIZE = 10
+
+    # Above this amount of new DMs, the secondary indexes are dropped and rebuilt after inserting,
+    # which is much faster than updating them row by row.
+    BULK_LOAD_THRESHOLD = 1000
+
+    # The lookup is written in bulk and rarely, so WAL with "NORMAL" sync is safe enough and avoids a sync per write.
+    PRAGMAS = [
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+    ]
+
+    # Version of the lookup's tables. Older lookups are upgraded in place (see UpdateSchema):
+    # 1: masters and their relations.
+    # 2: indexes from each DM to its relations.
+    # 3: content hash of each DM, lookup info and named cards.
+    # 4: attributes and races as bitmasks in the DM table, mentions by id.
+    SCHEMA_VERSION = 4
+    SCHEMA_VERSION_TABLE = "schema_version"
+
+    # Key/value information about the lookup itself.
+    INFO_TABLE = "lookup_info"
+    REFERENCE_VERSION_KEY = "reference_version"
+    # Amount of DMs the lookup update in progress had to generate (only set while updating).
+    BUILD_TOTAL_KEY = "build_total"
+
+    # The setcode of every card named in a DM's text (NULL if there's no such card) when its domain was generated.
+    NAMED_CARD_TABLE = "named_card"
+
     ATTR_TABLE = "attribute"
     RACE_TABLE = "race"
     ARCH_TABLE = "archetype"
     QUOT_TABLE = "mention"
     DM_TABLE = "master"
 
+    # Attributes and races are single bit flags, so each DM keeps all of its own in one column.
+    # (Lookups before version 4 had ATTR_TABLE and RACE_TABLE relations instead.)
+    ATTR_MASK = "attr_mask"
+    RACE_MASK = "race_mask"
+
+    # Every mentioned name, so QUOT_TABLE only has to store their ids.
+    MENTION_NAME_TABLE = "mention_name"
+
+    # Tables relating DMs to the rest of their domain.
+    RELATION_TABLES = [ARCH_TABLE, QUOT_TABLE]
+
     _instance = None
 
     @staticmethod
@@ -33,34 +101,143 @@ class DomainLookup:
 
         return DomainLookup._instance
 
-    def __init__(self) -> None:
+    # If "update" isn't set, the lookup is only opened, without printing anything:
+    # it must already be up to date (see BackgroundUpdater).
+    def __init__(self, update: bool = True) -> None:
         if(not DomainLookup._instance is None):
             raise Warning("This class is a Singleton!")
 
         DomainLookup._instance = self
 
-        print("Setting up lookup database.")
+        if(update):
+            print("Setting up lookup database.")
         lookupFolder = DownloadManager.GetLookupFolder()
         if(not os.path.exists(lookupFolder)):
            os.mkdir(lookupFolder)
 
         lookupPath = os.path.join(lookupFolder, DomainLookup.LOOKUP_FILE)
-        if(not os.path.exists(lookupPath)):
-            DomainLookup.CreateDB(lookupPath)
 
         self.db = sqlite3.connect(lookupPath)
-        self.UpdateDB()
-        print("Done.\n")
+        for pragma in DomainLookup.PRAGMAS:
+            self.db.execute(pragma)
+
+        # In-memory index of the lookup, only built once it's needed (see GetIndex).
+        self.index: DomainIndex = None
+        self.indexVersion = None
+
+        # Statistics of the last reverse search (see FindMastersForDeck).
+        self.lastSearch: SearchStats = None
+
+        if(update):
+            self.UpdateSchema()
+            self.UpdateDB()
+            print("Done.\n")
+
+    # Returns the version of the lookup's tables (0 if there are no tables yet).
+    @staticmethod
+    def GetSchemaVersion(db: sqlite3.Connection) -> int:
+        tables = [row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+        if(DomainLookup.SCHEMA_VERSION_TABLE in tables):
+            return db.execute("SELECT version FROM {}".format(DomainLookup.SCHEMA_VERSION_TABLE)).fetchone()[0]
+
+        # Lookups made before the schema was versioned.
+        if(DomainLookup.DM_TABLE in tables):
+            return 1
+
+        return 0
+
+    # Creates the lookup's tables, or upgrades them from an older version.
+    # Upgrades keep all the DMs already in the lookup, and are done in a single transaction.
+    def UpdateSchema(self) -> None:
+        version = DomainLookup.GetSchemaVersion(self.db)
+        if(version == DomainLookup.SCHEMA_VERSION):
+            return
+
+        migrations = {
+            2: DomainLookup.MigrateRelationIndexes,
+            3: DomainLookup.MigrateContentHashes,
+            4: DomainLookup.MigrateBitmasks,
+        }
+
+        # SQLite would commit each ALTER/CREATE/DROP on its own, so the transaction is opened explicitly:
+        # an upgrade that's interrupted is rolled back entirely, and simply done again next time.
+        with self.db:
+            self.db.execute("BEGIN")
+            if(version == 0):
+                DomainLookup.CreateTables(self.db)
+                DomainLookup.CreateRelations(self.db)
+                DomainLookup.CreateIndexes(self.db)
+            else:
+                print("Upgrading lookup from version {} to {}.".format(version, DomainLookup.SCHEMA_VERSION))
+                for target in range(version + 1, DomainLookup.SCHEMA_VERSION + 1):
+                    migrations[target](self.db)
+
+                if(version < 3):
+                    self.UpdateNamedCards()
+
+            self.db.execute("CREATE TABLE IF NOT EXISTS '{}' ('version' INTEGER)".format(DomainLookup.SCHEMA_VERSION_TABLE))
+            self.db.execute("DELETE FROM {}".format(DomainLookup.SCHEMA_VERSION_TABLE))
+            self.db.execute("INSERT INTO {} (version) VALUES (?)".format(DomainLookup.SCHEMA_VERSION_TABLE), (DomainLookup.SCHEMA_VERSION,))
+
+        # Upgrades may drop whole tables, so the file is compacted afterwards.
+        if(version > 0):
+            self.db.execute("VACUUM")
+
+    # Migrations only use the tables as they were at their version, since later migrations change them.
+
+    # Adds indexes from each DM to its relations.
+    @staticmethod
+    def MigrateRelationIndexes(db: sqlite3.Connection) -> None:
+        for table in [DomainLookup.ATTR_TABLE, DomainLookup.RACE_TABLE, DomainLookup.ARCH_TABLE, DomainLookup.QUOT_TABLE]:
+            db.execute("CREATE INDEX IF NOT EXISTS '{table}_{master}' ON '{table}' ('{master}', '{table}')".format(table=table, master=DomainLookup.DM_TABLE))
 
+    # Adds the content hash of each DM, and the tables used to know which DMs are outdated (see UpdateDB).
+    # The DMs already in the lookup are trusted to be up to date, as they were before, so nothing has to be generated again.
+    # The named cards are filled once all migrations are done.
     @staticmethod
-    def CreateDB(path : str) -> None:
-        db = sqlite3.connect(path)
+    def MigrateContentHashes(db: sqlite3.Connection) -> None:
+        db.execute("ALTER TABLE '{}' ADD COLUMN 'hash' TEXT".format(DomainLookup.DM_TABLE))
+        db.execute("CREATE TABLE IF NOT EXISTS '{}' ('key' TEXT PRIMARY KEY, 'value' TEXT)".format(DomainLookup.INFO_TABLE))
+        db.execute("CREATE TABLE IF NOT EXISTS '{}' ('name' VARCHAR(255) PRIMARY KEY, 'setcode' INTEGER)".format(DomainLookup.NAMED_CARD_TABLE))
+
+        hashes = []
+        for data in CardsDB.Instance().GetAllMonsters():
+            card = Card(data)
+            hashes.append((DomainLookup.GetContentHash(card), card.id))
+        db.executemany("UPDATE {} SET hash = ? WHERE id = ?".format(DomainLookup.DM_TABLE), hashes)
+
+        insert_info = "INSERT OR REPLACE INTO {} (key, value) VALUES (?, ?)".format(DomainLookup.INFO_TABLE)
+        db.execute(insert_info, (DomainLookup.REFERENCE_VERSION_KEY, DownloadManager.GetReferenceFilesHash()))
+
+    # Moves the attribute and race relations into bitmasks in the DM table, and stores mentions by id.
+    @staticmethod
+    def MigrateBitmasks(db: sqlite3.Connection) -> None:
+        # Every attribute and race is a different bit, so adding them up is the same as OR-ing them.
+        for mask, table in [(DomainLookup.ATTR_MASK, DomainLookup.ATTR_TABLE), (DomainLookup.RACE_MASK, DomainLookup.RACE_TABLE)]:
+            db.execute("ALTER TABLE '{}' ADD COLUMN '{}' INTEGER NOT NULL DEFAULT 0".format(DomainLookup.DM_TABLE, mask))
+
+            update = "UPDATE {master} SET {mask} = (SELECT COALESCE(SUM(DISTINCT {table}), 0) FROM {table} WHERE {table}.{master} = {master}.id)"
+            db.execute(update.format(master=DomainLookup.DM_TABLE, mask=mask, table=table))
+            db.execute("DROP TABLE '{}'".format(table))
+
+        oldMentions = DomainLookup.QUOT_TABLE + "_old"
+        db.execute("ALTER TABLE '{}' RENAME TO '{}'".format(DomainLookup.QUOT_TABLE, oldMentions))
 
         DomainLookup.CreateTables(db)
         DomainLookup.CreateRelations(db)
 
-        db.commit()
-        db.close()
+        db.execute("INSERT INTO {names} (name) SELECT DISTINCT {mention} FROM {old}".format(
+            names=DomainLookup.MENTION_NAME_TABLE, mention=DomainLookup.QUOT_TABLE, old=oldMentions
+        ))
+        insert_mentions = """
+            INSERT INTO {mention} ({master}, {mention})
+            SELECT {old}.{master}, {names}.id FROM {old} JOIN {names} ON {names}.name = {old}.{mention}
+        """.format(mention=DomainLookup.QUOT_TABLE, master=DomainLookup.DM_TABLE, names=DomainLookup.MENTION_NAME_TABLE, old=oldMentions)
+        db.execute(insert_mentions)
+        db.execute("DROP TABLE '{}'".format(oldMentions))
+
+        DomainLookup.CreateIndexes(db)
 
     # Creates the basic "DM" table.
     @staticmethod
@@ -68,15 +245,43 @@ class DomainLookup:
         cursor = db.cursor()
 
         create_masters = """
-        CREATE TABLE IF NOT EXISTS '{}' (
-                'id' INT PRIMARY KEY
+        CREATE TABLE IF NOT EXISTS '{master}' (
+                'id' INT PRIMARY KEY,
+                'hash' TEXT,
+                '{attr}' INTEGER NOT NULL DEFAULT 0,
+                '{race}' INTEGER NOT NULL DEFAULT 0
             );
-        """.format(DomainLookup.DM_TABLE)
+        """.format(master=DomainLookup.DM_TABLE, attr=DomainLookup.ATTR_MASK, race=DomainLookup.RACE_MASK)
         cursor.execute(create_masters)
 
+        create_info = """
+        CREATE TABLE IF NOT EXISTS '{}' (
+                'key' TEXT PRIMARY KEY,
+                'value' TEXT
+            );
+        """.format(DomainLookup.INFO_TABLE)
+        cursor.execute(create_info)
+
+        create_named_cards = """
+        CREATE TABLE IF NOT EXISTS '{}' (
+                'name' VARCHAR(255) PRIMARY KEY,
+                'setcode' INTEGER
+            );
+        """.format(DomainLookup.NAMED_CARD_TABLE)
+        cursor.execute(create_named_cards)
+
+        create_mention_names = """
+        CREATE TABLE IF NOT EXISTS '{}' (
+                'id' INTEGER PRIMARY KEY,
+                'name' VARCHAR(255) UNIQUE
+            );
+        """.format(DomainLookup.MENTION_NAME_TABLE)
+        cursor.execute(create_mention_names)
+
         cursor.close()
     
-    # Creates all the relation tables (DM & attribute, DM & type...)
+    # Creates all the relation tables (DM & archetype, DM & mention).
+    # Mentions are stored by their id in MENTION_NAME_TABLE.
     @staticmethod
     def CreateRelations(db: sqlite3.Connection) -> None:
         cursor = db.cursor()
@@ -90,121 +295,411 @@ class DomainLookup:
             );
         """
 
-        for table in [DomainLookup.ATTR_TABLE, DomainLookup.RACE_TABLE, DomainLookup.ARCH_TABLE]:
+        for table in DomainLookup.RELATION_TABLES:
             cursor.execute(create_master_relation.format(master=DomainLookup.DM_TABLE, relation=table))
 
-        create_master_mention = """
-            CREATE TABLE IF NOT EXISTS '{mention}' (
-                '{master}'	INTEGER,
-                '{mention}'	VARCHAR(255),
-                PRIMARY KEY('{mention}','{master}'),
-                FOREIGN KEY('{master}') REFERENCES '{master}'('id')
-            );
-        """.format(master=DomainLookup.DM_TABLE, mention=DomainLookup.QUOT_TABLE)
-        cursor.execute(create_master_mention)
-
         cursor.close()
 
-    # Generates the domain for a list of cards in the given interval.
-    # Called by "UpdateDB" in a multiprocesses.
+    # Indexes from each DM to its relations (the primary keys already go from the relations to the DMs).
+    # Used when getting a DM's domain from the lookup.
     @staticmethod
-    def ProcessDomainsJob(data: list, allDMs: list, start: int, end: int):
+    def GetIndexes() -> list[tuple[str, str]]:
+        indexes = []
+        for table in DomainLookup.RELATION_TABLES:
+            indexes.append((
+                "{}_{}".format(table, DomainLookup.DM_TABLE),
+                "CREATE INDEX IF NOT EXISTS '{table}_{master}' ON '{table}' ('{master}', '{table}')".format(table=table, master=DomainLookup.DM_TABLE),
+            ))
+        return indexes
+
+    @staticmethod
+    def CreateIndexes(db: sqlite3.Connection) -> None:
+        for _, create in DomainLookup.GetIndexes():
+            db.execute(create)
+
+    @staticmethod
+    def DropIndexes(db: sqlite3.Connection) -> None:
+        for name, _ in DomainLookup.GetIndexes():
+            db.execute("DROP INDEX IF EXISTS '{}'".format(name))
+
+    # Sets up each worker process used by UpdateDB.
+    # Workers open their own read-only connection to the cards DB and load the reference tables only once.
+    # Flags set from the command line (or by the update process, see BackgroundUpdater) aren't carried over to new processes, so they're passed in.
+    @staticmethod
+    def InitDomainsWorker(useMemoryStore: bool, mergedCdbFile: str, useSnapshotFile: bool) -> None:
         sys.stdout = open(os.devnull, 'w')
 
-        for i in range(start, end):
+        CardsDB.USE_MEMORY_STORE = useMemoryStore
+        DownloadManager.MERGED_CDB_FILE = mergedCdbFile
+        ReferenceSnapshot.USE_FILE = useSnapshotFile
+        CardsDB.OpenReadOnly()
+        Archetypes.Instance()
+        Attributes.Instance()
+        Races.Instance()
+
+    # Generates the domains of the given DMs.
+    # Only what the lookup needs is returned (see DomainLookup.ToEntry), so little has to go back to the main process.
+    @staticmethod
+    def ProcessDomainsJob(ids: list[int]) -> list[tuple]:
+        entries = []
+        for id in ids:
             try:
-                card = Card(CardsDB.Instance().GetMonsterById(data[i][0]))
+                card = Card(CardsDB.Instance().GetMonsterById(id))
+                # Every worker would write to the cache at the same time, so it's not used here.
                 dm = Domain.GenerateFromCard(card)
-                allDMs.append(dm)
+                entries.append(DomainLookup.ToEntry(dm))
             except CardIdNotFoundError as error:
                 print(f"Could not find card with id [{error.args[0]}]")
 
-    # Updates the DB by adding missing DMs' information.
-    def UpdateDB(self) -> None:
-        all_monsters = set(CardsDB.Instance().GetAllMonsterIds())
-        cursor = self.db.cursor()
-        lookup_monsters = set(cursor.execute("Select id FROM {}".format(DomainLookup.DM_TABLE)).fetchall())
+        return entries
 
-        # Here we compare all the DMs in the CardCDB with all the DMs in the Lookup.
-        # If both tables are up to date, missing monsters should be empty.
-        missing_monsters = all_monsters - lookup_monsters
+    # Returns a domain as a lookup entry: (dm id, content hash, attributes, races, setcodes, mentions).
+    @staticmethod
+    def ToEntry(domain: Domain) -> tuple:
+        return (
+            domain.DM.id,
+            DomainLookup.GetContentHash(domain.DM),
+            tuple(domain.attributes),
+            tuple(domain.races),
+            tuple(domain.setcodes),
+            tuple(domain.namedCards)
+        )
+
+    # Returns a hash of everything in a DM that its domain depends on.
+    # If it changes (errata), the domain has to be generated again.
+    @staticmethod
+    def GetContentHash(DM: Card) -> str:
+        content = "\0".join([DM.desc, str(DM.setcodesHex), str(DM.attribute), str(DM.race), str(DM.type)])
+        return hashlib.sha1(content.encode("utf8")).hexdigest()
 
-        if(len(missing_monsters) > 0):
-            print("Updating Lookup table (might take a few minutes).")
-            
-            data = list(missing_monsters)
-            manager = Manager()
-            allDMs : list[Domain] = manager.list()
+    def GetInfo(self, key: str) -> str:
+        data = self.db.execute("SELECT value FROM {} WHERE key = ?".format(DomainLookup.INFO_TABLE), (key,)).fetchone()
+        return None if data is None else data[0]
 
-            processes : list[Process] = []
-            n = 0
+    def SetInfo(self, key: str, value: str) -> None:
+        self.db.execute("INSERT OR REPLACE INTO {} (key, value) VALUES (?, ?)".format(DomainLookup.INFO_TABLE), (key, value))
 
-            # division by 8 so it splits into 8 processes (most pcs have 4 multicores, so thats why)
-            # but if there are less than 8 monsters to insert, use one instead (otherwise the indexes get bad)
-            step = len(data) // (8 if len(data) > 7 else 1)
+    def DeleteInfo(self, key: str) -> None:
+        self.db.execute("DELETE FROM {} WHERE key = ?".format(DomainLookup.INFO_TABLE), (key,))
 
-            while(n < len(data)):
-                endIndex = min(n + step, len(data))
-                processes.append(Process(target=DomainLookup.ProcessDomainsJob, args=(data, allDMs, n, endIndex)))
-                n = endIndex
+    # Updates the DB so it matches the cards DB and the reference files.
+    # Only the DMs that are new, changed (see GetContentHash) or name a card whose setcode changed are generated again,
+    # and DMs no longer in the cards DB are removed. If the reference files changed, every DM is generated again.
+    # Domains are written in chunks as they're generated, each in its own transaction, so if the update is interrupted
+    # the next one carries on from the last chunk written (written DMs already have their current hash).
+    def UpdateDB(self) -> None:
+        current = {}
+        for data in CardsDB.Instance().GetAllMonsters():
+            card = Card(data)
+            current[card.id] = DomainLookup.GetContentHash(card)
+
+        stored = dict(self.db.execute("SELECT id, hash FROM {}".format(DomainLookup.DM_TABLE)))
+
+        referenceVersion = DownloadManager.GetReferenceFilesHash()
+        if(self.GetInfo(DomainLookup.REFERENCE_VERSION_KEY) != referenceVersion):
+            outdated = set(stored.keys())
+        else:
+            # Removed DMs have no current hash, so they're outdated too.
+            outdated = set([id for id, hash in stored.items() if current.get(id) != hash])
+            outdated.update(self.GetMastersNamingChangedCards())
+
+        missing_monsters = [id for id in current.keys() if id not in stored or id in outdated]
+
+        if(len(outdated) > 0 or len(missing_monsters) > 0):
+            removed = len([id for id in outdated if id not in current])
+
+            total = self.GetInfo(DomainLookup.BUILD_TOTAL_KEY)
+            if(total is not None):
+                print("Resuming interrupted lookup update: {} of {} DMs left.".format(len(missing_monsters), total))
+            else:
+                print("Updating Lookup table: {} new, {} changed and {} removed DMs.".format(
+                    len(missing_monsters) - (len(outdated) - removed), len(outdated) - removed, removed
+                ))
+
+            # Outdated DMs are removed first, so the lookup only ever has up to date DMs.
+            self.RemoveDomains(outdated, len(outdated) == len(stored))
+            with self.db:
+                self.SetInfo(DomainLookup.REFERENCE_VERSION_KEY, referenceVersion)
+                if(total is None):
+                    self.SetInfo(DomainLookup.BUILD_TOTAL_KEY, len(missing_monsters))
+
+            bulk = len(missing_monsters) > DomainLookup.BULK_LOAD_THRESHOLD
+            if(bulk):
+                with self.db:
+                    DomainLookup.DropIndexes(self.db)
+
+            progress = BuildProgress(len(missing_monsters))
+            for entries in self.GenerateEntries(missing_monsters):
+                self.AddDomains(entries)
+                progress.Update(len(entries))
+
+            with self.db:
+                self.DeleteInfo(DomainLookup.BUILD_TOTAL_KEY)
+
+            progress.Finish()
+
+        elif(self.GetInfo(DomainLookup.REFERENCE_VERSION_KEY) is None):
+            with self.db:
+                self.SetInfo(DomainLookup.REFERENCE_VERSION_KEY, referenceVersion)
+
+        # Also recreates the indexes if a bulk update was interrupted.
+        with self.db:
+            DomainLookup.CreateIndexes(self.db)
+
+    # Generates the lookup entries (see ToEntry) of the given DMs, yielding them a chunk at a time as they're done.
+    # Only a few chunks are handed to the workers at once, so finished chunks don't pile up in memory.
+    def GenerateEntries(self, ids: list[int]) -> Iterator[list[tuple]]:
+        chunks = [ids[n:n + DomainLookup.JOB_CHUNK_SIZE] for n in range(0, len(ids), DomainLookup.JOB_CHUNK_SIZE)]
+
+        # Starting the workers costs more than generating a handful of domains.
+        if(len(chunks) <= 1):
+            yield DomainLookup.ProcessDomainsJob(ids)
+            return
+
+        workers = min(os.cpu_count() or 1, len(chunks))
+        with ProcessPoolExecutor(max_workers=workers, initializer=DomainLookup.InitDomainsWorker, initargs=(CardsDB.USE_MEMORY_STORE, DownloadManager.MERGED_CDB_FILE, ReferenceSnapshot.USE_FILE)) as executor:
+            remaining = iter(chunks)
+            jobs = set()
+            while(True):
+                for chunk in islice(remaining, workers * DomainLookup.JOBS_PER_WORKER - len(jobs)):
+                    jobs.add(executor.submit(DomainLookup.ProcessDomainsJob, chunk))
+
+                if(len(jobs) == 0):
+                    break
+
+                done, jobs = wait(jobs, return_when=FIRST_COMPLETED)
+                for job in done:
+                    yield job.result()
+
+    # Returns the current setcode of each named card (None if there's no card with that name).
+    @staticmethod
+    def GetNamedCardSetcodes(names: list[str]) -> dict[str, int]:
+        data, _ = CardsDB.Instance().GetCardsByNames(names)
+        return {name: (None if row is None else row[1]) for name, row in zip(names, data)}
+
+    # Returns the DMs naming a card that was renamed, removed, added or had its setcode changed
+    # since their domain was generated (domains include the archetypes of the cards they name).
+    def GetMastersNamingChangedCards(self) -> set[int]:
+        stored = dict(self.db.execute("SELECT name, setcode FROM {}".format(DomainLookup.NAMED_CARD_TABLE)))
+        current = DomainLookup.GetNamedCardSetcodes(list(stored.keys()))
+
+        changed = [name for name, setcode in stored.items() if current[name] != setcode]
+
+        select = "SELECT {master} FROM {mention} JOIN {names} ON {names}.id = {mention}.{mention} WHERE {names}.name = ?".format(
+            master=DomainLookup.DM_TABLE, mention=DomainLookup.QUOT_TABLE, names=DomainLookup.MENTION_NAME_TABLE
+        )
+        masters = set()
+        for name in changed:
+            masters.update([row[0] for row in self.db.execute(select, (name,))])
+
+        return masters
+
+    # Stores the current setcode of every card named by the DMs in the lookup.
+    # Must be called within a transaction.
+    def UpdateNamedCards(self) -> None:
+        names = [row[0] for row in self.db.execute("SELECT name FROM {}".format(DomainLookup.MENTION_NAME_TABLE))]
+        setcodes = DomainLookup.GetNamedCardSetcodes(names)
+
+        self.db.execute("DELETE FROM {}".format(DomainLookup.NAMED_CARD_TABLE))
+        insert = "INSERT INTO {} (name, setcode) VALUES (?, ?)".format(DomainLookup.NAMED_CARD_TABLE)
+        self.db.executemany(insert, setcodes.items())
+
+    # Removes the given DMs (and their relations) from the lookup.
+    # If "everything" is set, the lookup is simply emptied.
+    def RemoveDomains(self, ids: set[int], everything: bool = False) -> None:
+        if(len(ids) == 0):
+            return
+
+        # The index no longer matches the lookup.
+        self.index = None
+
+        with self.db:
+            for table in DomainLookup.RELATION_TABLES:
+                if(everything):
+                    self.db.execute("DELETE FROM {}".format(table))
+                else:
+                    delete = "DELETE FROM {table} WHERE {master} = ?".format(table=table, master=DomainLookup.DM_TABLE)
+                    self.db.executemany(delete, [(id,) for id in ids])
+
+            if(everything):
+                self.db.execute("DELETE FROM {}".format(DomainLookup.DM_TABLE))
+            else:
+                self.db.executemany("DELETE FROM {} WHERE id = ?".format(DomainLookup.DM_TABLE), [(id,) for id in ids])
+
+            # Names no DM mentions anymore.
+            delete_names = "DELETE FROM {names} WHERE id NOT IN (SELECT {mention} FROM {mention})"
+            self.db.execute(delete_names.format(names=DomainLookup.MENTION_NAME_TABLE, mention=DomainLookup.QUOT_TABLE))
+            delete_named_cards = "DELETE FROM {named} WHERE name NOT IN (SELECT name FROM {names})"
+            self.db.execute(delete_named_cards.format(named=DomainLookup.NAMED_CARD_TABLE, names=DomainLookup.MENTION_NAME_TABLE))
+
+    # Adds new domains (as lookup entries, see DomainLookup.ToEntry) to the database,
+    # along with the current setcode of the cards they name.
+    # Rows are grouped per table and inserted in a single transaction.
+    def AddDomains(self, entries : list[tuple]) -> None:
+        insert_master = "INSERT OR REPLACE INTO {master} (id, hash, {attr}, {race}) VALUES (?, ?, ?, ?);".format(
+            master=DomainLookup.DM_TABLE, attr=DomainLookup.ATTR_MASK, race=DomainLookup.RACE_MASK
+        )
+        insert_relation = "INSERT OR IGNORE INTO {relation} ({master}, {relation}) VALUES (?,?);"
+        insert_name = "INSERT OR IGNORE INTO {} (name) VALUES (?);".format(DomainLookup.MENTION_NAME_TABLE)
+        insert_named_card = "INSERT OR REPLACE INTO {} (name, setcode) VALUES (?, ?);".format(DomainLookup.NAMED_CARD_TABLE)
 
-            for p in processes:
-                p.start()
+        masters = []
+        archetypes = []
+        mentions = []
 
-            for p in processes:
-                p.join()
+        for id, hash, attributes, races, setcodes, names in entries:
+            masters.append((id, hash, DomainLookup.ToMask(attributes), DomainLookup.ToMask(races)))
+            archetypes.extend([(id, arch) for arch in setcodes])
+            mentions.extend([(id, name) for name in names])
 
-            self.AddDomains(allDMs)
+        names = list(set([name for _, name in mentions]))
+        namedCards = DomainLookup.GetNamedCardSetcodes(names)
 
-    # Adds a new domain to the database.
-    def AddDomains(self, domains : list[Domain]) -> None:
-        insert_master = "INSERT OR IGNORE INTO {}(id) VALUES (?);".format(DomainLookup.DM_TABLE)
-        insert_relation = "INSERT OR IGNORE INTO {relation} ({master}, {relation}) VALUES (?,?);"
+        # The index no longer matches the lookup.
+        self.index = None
 
-        cursor = self.db.cursor()
-        for domain in domains:
-            cursor.execute(insert_master, (domain.DM.id,))
-
-            for attr in domain.attributes:
-                cursor.execute(insert_relation.format(master=DomainLookup.DM_TABLE, relation=DomainLookup.ATTR_TABLE), (domain.DM.id, attr,))
-
-            for race in domain.races:
-                cursor.execute(insert_relation.format(master=DomainLookup.DM_TABLE, relation=DomainLookup.RACE_TABLE), (domain.DM.id, race,))
-            
-            for arch in domain.setcodes:
-                cursor.execute(insert_relation.format(master=DomainLookup.DM_TABLE, relation=DomainLookup.ARCH_TABLE), (domain.DM.id, arch,))
-            
-            for mention in domain.namedCards:
-                cursor.execute(insert_relation.format(master=DomainLookup.DM_TABLE, relation=DomainLookup.QUOT_TABLE), (domain.DM.id, mention,))
-            
-        cursor.close()
-        self.db.commit()
+        with self.db:
+            self.db.executemany(insert_master, masters)
+            self.db.executemany(insert_relation.format(master=DomainLookup.DM_TABLE, relation=DomainLookup.ARCH_TABLE), archetypes)
+
+            self.db.executemany(insert_name, [(name,) for name in names])
+            nameIds = dict(self.db.execute("SELECT name, id FROM {}".format(DomainLookup.MENTION_NAME_TABLE)))
+            mentions = [(id, nameIds[name]) for id, name in mentions]
+            self.db.executemany(insert_relation.format(master=DomainLookup.DM_TABLE, relation=DomainLookup.QUOT_TABLE), mentions)
+
+            self.db.executemany(insert_named_card, namedCards.items())
+
+    # Returns the bitmask of the given flags (attributes or races).
+    @staticmethod
+    def ToMask(flags: tuple) -> int:
+        mask = 0
+        for flag in flags:
+            mask |= flag
+        return mask
+
+    # Returns the flags (attributes or races) in the given bitmask.
+    @staticmethod
+    def SplitMask(mask: int) -> list[int]:
+        flags = []
+        while(mask):
+            flag = mask & -mask
+            flags.append(flag)
+            mask ^= flag
+        return flags
+
+    # Returns the in-memory index of the lookup, (re)building it if the lookup changed since it was built.
+    def GetIndex(self) -> DomainIndex:
+        # data_version changes whenever another connection modifies the lookup.
+        version = self.db.execute("PRAGMA data_version").fetchone()[0]
+
+        if(self.index is None or self.indexVersion != version):
+            self.index = DomainIndex(self.db)
+            self.indexVersion = version
+
+        return self.index
+
+    # Returns the ids of all DMs that have every given monster card in their domain.
+    def FilterDeck(self, monsters : list[Card]) -> list[int]:
+        index = self.GetIndex()
+        self.lastSearch = SearchStats()
+        return index.GetMasters(index.FilterDeck(monsters, self.lastSearch))
+
+    # Returns the DMs that have the most of the given monster cards in their domain,
+    # as (DM id, monsters missing from its domain), best first.
+    # Used when no DM has every monster, to show the ones that are closest.
+    def RankMastersForDeck(self, monsters : list[Card], amount : int = None) -> list[tuple[int, list[Card]]]:
+        if(amount is None):
+            amount = DomainLookup.RANKING_SIZE
+
+        return self.GetIndex().RankDeck(monsters, amount)
+
+    # Returns the ids of all DMs that have every given monster card in their domain.
+    # Without the in-memory index, the whole deck is solved by a single query:
+    # the keys of each (distinct) monster go to a temporary table, and only DMs matching all monsters are kept.
+    def FindMastersForDeck(self, monsters : list[Card]) -> list[int]:
+        if(DomainLookup.USE_MEMORY_INDEX):
+            return self.FilterDeck(monsters)
+
+        start = time.perf_counter()
+
+        signatures = set([DomainIndex.GetSignature(monster) for monster in monsters])
+        if(len(signatures) == 0):
+            return [row[0] for row in self.db.execute("SELECT id FROM {}".format(DomainLookup.DM_TABLE))]
+
+        keys = []
+        for n, (attribute, race, name, baseArchs) in enumerate(signatures):
+            keys.append((n, attribute, race, None, name))
+            keys += [(n, None, None, arch, None) for arch in baseArchs]
+
+        create_keys = """
+            CREATE TEMP TABLE IF NOT EXISTS {keys} (
+                monster     INTEGER,
+                {attr}      INTEGER,
+                {race}      INTEGER,
+                {arch}      INTEGER,
+                {mention}   VARCHAR(255)
+            );
+        """.format(keys=DomainLookup.DECK_KEY_TABLE, attr=DomainLookup.ATTR_TABLE, race=DomainLookup.RACE_TABLE, arch=DomainLookup.ARCH_TABLE, mention=DomainLookup.QUOT_TABLE)
+
+        insert_keys = "INSERT INTO {} VALUES (?,?,?,?,?)".format(DomainLookup.DECK_KEY_TABLE)
+
+        # Each branch gives the (DM, monster) pairs where the monster matches the DM by one of its keys.
+        # A DM is valid if it's paired with every monster.
+        # CROSS JOIN makes SQLite go through the (few) deck keys first, and search the relations' indexes for each one.
+        branches = [
+            """SELECT {master}.id AS id, {keys}.monster FROM {keys} CROSS JOIN {master}
+                WHERE {keys}.{attr} IS NOT NULL AND ({master}.{attrMask} & {keys}.{attr} OR {master}.{raceMask} & {keys}.{race})""",
+            "SELECT {arch}.{master}, {keys}.monster FROM {keys} CROSS JOIN {arch} ON {arch}.{arch} = {keys}.{arch}",
+            """SELECT {mention}.{master}, {keys}.monster FROM {keys}
+                CROSS JOIN {names} ON {names}.name = {keys}.{mention}
+                CROSS JOIN {mention} ON {mention}.{mention} = {names}.id""",
+        ]
+        select = "SELECT id FROM ({}) GROUP BY id HAVING COUNT(DISTINCT monster) = ?".format("\n UNION ALL ".join(branches)).format(
+            keys=DomainLookup.DECK_KEY_TABLE, master=DomainLookup.DM_TABLE, names=DomainLookup.MENTION_NAME_TABLE,
+            attr=DomainLookup.ATTR_TABLE, race=DomainLookup.RACE_TABLE, arch=DomainLookup.ARCH_TABLE, mention=DomainLookup.QUOT_TABLE,
+            attrMask=DomainLookup.ATTR_MASK, raceMask=DomainLookup.RACE_MASK
+        )
+
+        with self.db:
+            self.db.execute(create_keys)
+            self.db.execute("DELETE FROM {}".format(DomainLookup.DECK_KEY_TABLE))
+            self.db.executemany(insert_keys, keys)
+            masters = [row[0] for row in self.db.execute(select, (len(signatures),))]
+            self.db.execute("DELETE FROM {}".format(DomainLookup.DECK_KEY_TABLE))
+
+        # A single query always checks every distinct monster.
+        self.lastSearch = SearchStats()
+        self.lastSearch.monsters = len(monsters)
+        self.lastSearch.signatures = len(signatures)
+        self.lastSearch.evaluated = len(signatures)
+        self.lastSearch.masters = len(masters)
+        self.lastSearch.time = time.perf_counter() - start
+
+        return masters
 
     # Returns all DMs that have the given monster card in their domain.
+    # Attributes and races are checked on the DM table alone, the other parts search a relation by its primary key.
     def FilterMonster(self, monster : Card):
         filter = self.db.cursor()
-        
-        select = """
-            SELECT id from {master}
-            WHERE
-                EXISTS (SELECT {master} FROM {attr} WHERE {master}.id = {master} AND {attr} = ?)
-                OR EXISTS (SELECT {master} FROM {race} WHERE {master}.id = {master} AND {race} = ?)
-                OR EXISTS (SELECT {master} FROM {mention} WHERE {master}.id = {master} AND {mention} = ?)""".format(
-                    master=DomainLookup.DM_TABLE,
-                    attr=DomainLookup.ATTR_TABLE, 
-                    race=DomainLookup.RACE_TABLE, 
-                    mention=DomainLookup.QUOT_TABLE
-            )
-        
+
+        part = "SELECT {master} FROM {relation} WHERE {relation} = ?"
+        parts = [
+            "SELECT id FROM {master} WHERE {attr} & ? OR {race} & ?".format(master=DomainLookup.DM_TABLE, attr=DomainLookup.ATTR_MASK, race=DomainLookup.RACE_MASK),
+            "SELECT {master} FROM {mention} JOIN {names} ON {names}.id = {mention}.{mention} WHERE {names}.name = ?".format(
+                master=DomainLookup.DM_TABLE, mention=DomainLookup.QUOT_TABLE, names=DomainLookup.MENTION_NAME_TABLE
+            ),
+        ]
+
         args = [monster.attribute, monster.race, monster.name.lower()]
 
         for arch in monster.setcodes:
             base_archs = Archetypes.Instance().GetBaseArchetype(arch)
             if base_archs is not None:
                 for base_arch in base_archs:
-                    select += "\n                OR EXISTS (SELECT {master} FROM {arch} WHERE {master}.id = {master} AND {arch} = ?)".format(master=DomainLookup.DM_TABLE, arch=DomainLookup.ARCH_TABLE)
+                    parts.append(part.format(master=DomainLookup.DM_TABLE, relation=DomainLookup.ARCH_TABLE))
                     args.append(base_arch)
 
+        select = "\n UNION ".join(parts)
         return filter.execute(select, tuple(args)).fetchall()
     
     # Retrieves all data from the given monster card
@@ -212,15 +707,73 @@ class DomainLookup:
     def GetDomain(self, monster : Card) -> list:
         cursor = self.db.cursor()
 
-        generic_query = "Select {table} from {table} where {master} = ?"
-
         data = []
         arg = tuple([monster.id])
 
-        for table in [DomainLookup.ATTR_TABLE, DomainLookup.RACE_TABLE, DomainLookup.ARCH_TABLE, DomainLookup.QUOT_TABLE]:
-            query = generic_query.format(master=DomainLookup.DM_TABLE, table=table)
-            data.append(cursor.execute(query, arg).fetchall())
-        
+        masks_query = "SELECT {attr}, {race} FROM {master} WHERE id = ?".format(master=DomainLookup.DM_TABLE, attr=DomainLookup.ATTR_MASK, race=DomainLookup.RACE_MASK)
+        masks = cursor.execute(masks_query, arg).fetchone()
+        if(masks is None):
+            masks = (0, 0)
+
+        for mask in masks:
+            data.append([(flag,) for flag in DomainLookup.SplitMask(mask)])
+
+        archetypes_query = "SELECT {arch} FROM {arch} WHERE {master} = ?".format(master=DomainLookup.DM_TABLE, arch=DomainLookup.ARCH_TABLE)
+        data.append(cursor.execute(archetypes_query, arg).fetchall())
+
+        mentions_query = "SELECT {names}.name FROM {mention} JOIN {names} ON {names}.id = {mention}.{mention} WHERE {mention}.{master} = ?".format(
+            master=DomainLookup.DM_TABLE, mention=DomainLookup.QUOT_TABLE, names=DomainLookup.MENTION_NAME_TABLE
+        )
+        data.append(cursor.execute(mentions_query, arg).fetchall())
+
         cursor.close()
 
-        return data
\ No newline at end of file
+        return data
+
+# Progress of a lookup update: how many DMs were written, how fast and how long until it's done.
+class BuildProgress:
+
+    # Minimum seconds between progress reports.
+    REPORT_INTERVAL = 2.0
+
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.done = 0
+        self.start = time.perf_counter()
+        self.lastReport = self.start
+
+    # Registers an amount of DMs as written, reporting the progress if it wasn't reported in a while.
+    def Update(self, amount: int) -> None:
+        self.done += amount
+
+        now = time.perf_counter()
+        if(now - self.lastReport < BuildProgress.REPORT_INTERVAL or self.done >= self.total):
+            return
+
+        self.lastReport = now
+        rate = self.done / (now - self.start)
+        eta = (self.total - self.done) / rate if rate > 0 else 0
+        print("  {}/{} DMs ({:.0f}%), {:.0f} DMs/s, about {:.0f}s left. {}".format(
+            self.done, self.total, 100 * self.done / self.total, rate, eta, BuildProgress.GetMemoryUsage(False)
+        ))
+
+    def Finish(self) -> None:
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0
+        print("Wrote {} domains in {:.2f}s ({:.0f} DMs/s). {}".format(self.done, elapsed, rate, BuildProgress.GetMemoryUsage(True)))
+
+    # Returns the peak resident memory of this process (and of its largest worker), as text.
+    # Workers are only accounted for once they exit, so they're left out while the update runs.
+    @staticmethod
+    def GetMemoryUsage(withWorkers: bool) -> str:
+        if(resource is None):
+            return ""
+
+        # ru_maxrss is in bytes on macOS and in kilobytes everywhere else.
+        unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+        main = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit
+        workers = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit
+
+        if(not withWorkers or workers == 0):
+            return "Peak RSS: {:.0f}MB.".format(main)
+        return "Peak RSS: {:.0f}MB (workers: {:.0f}MB).".format(main, workers)
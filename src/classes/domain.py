@@ -6,7 +6,9 @@ from classes.textParsers.attributes import Attributes
 from classes.textParsers.races import Races
 
 from classes.card import Card
+from classes.domainKernel import DomainKernel
 from classes.databases.cardsDB import CardsDB
+from classes.databases.domainCache import DomainCache
 from classes.databases.databaseExceptions import CardNameNotFoundError
 
 # A Deck masters domain, including information as well as the cards themselves.
@@ -76,43 +78,67 @@ class Domain:
         "World Legacy - \"World Wand\"",
     ]
 
-    # Helper method that searchs a text for a pattern then removes the matches from the text,
-    # returning both the found values as well as the text after changes.
-    def CleanDesc(text: str, regex: str) -> tuple[list, str]:
-        matches = set()
-        def sub(match: str) -> str:
-            matches.add(match.group(1).lower())
-            return ""
+    # Amazing regex done by @Zefile8 and @EokLennon
+    # These meticulously retrieve the information from the card's description.
+    # They are combined into a single pattern (see GetDescScanner), and the order matters:
+    # whenever more than one could match at the same place, the first one wins.
+
+    # The "this card is not treated as ..." is skipped,
+    # since we already retrieve the information from the DB, this is not useful for us.
+    NOT_TREATED_AS = "(?P<not_treated>\\(This card is not treated as an? \".*?\" card.\\))"
+    # Find cards with quotes in their names.
+    # This is important since the next search would bug and split the quotes.
+    QUOTE_CARDS_PATTERN = "\"(?P<quote>{})\""
+    # Finds all direct mentions (words between quotes), which can be either card names or archetypes
+    MENTIONED_QUOTES = "\"(?P<mention>.*?)\""
+    # Find all the races (types) mentioned in the desc
+    # The list is manually typed because in the ref file they are named "beastwarrior" / "divine" and so on, which would provide no matches.
+    RACES = "(?P<race>aqua|beast-warrior|beast|cyberse|dinosaur|divine-beast|dragon|fairy|fiend|fish|illusion|insect|machine|plant|psychic|pyro|reptile|rock|sea serpent|spellcaster|thunder|warrior|winged beast|wyrm|zombie)"
+    # Find all the attributes mentioned in the desc
+    ATTRIBUTES_PATTERN = "(?P<attribute>{})"
+
+    # The compiled scanner and the attributes it was built with.
+    _descScanner: re.Pattern = None
+    _descScannerAttributes: tuple = None
+
+    # Returns the compiled pattern that finds everything above in a single left-to-right pass.
+    # Only rebuilt if the attributes change.
+    @staticmethod
+    def GetDescScanner() -> re.Pattern:
+        attributes = tuple(Attributes.Instance().nameHex.keys())
+
+        if(Domain._descScanner is None or Domain._descScannerAttributes != attributes):
+            pattern = "|".join([
+                Domain.NOT_TREATED_AS,
+                Domain.QUOTE_CARDS_PATTERN.format("|".join(Domain.QUOTE_CARDS)),
+                Domain.MENTIONED_QUOTES,
+                Domain.RACES,
+                Domain.ATTRIBUTES_PATTERN.format("|".join(attributes)),
+            ])
+            Domain._descScanner = re.compile(pattern, flags=re.IGNORECASE)
+            Domain._descScannerAttributes = attributes
+
+        return Domain._descScanner
+
+    # Scans a description, returning the (lowercase) quoted card names, mentions, races and attributes found.
+    @staticmethod
+    def ScanDesc(text: str) -> tuple[set, set, set, set]:
+        found = {
+            "not_treated": set(),
+            "quote": set(),
+            "mention": set(),
+            "race": set(),
+            "attribute": set(),
+        }
 
-        cleaned = re.sub(regex, sub, text, flags=re.IGNORECASE)
-        return matches, cleaned
+        for match in Domain.GetDescScanner().finditer(text):
+            found[match.lastgroup].add(match.group(match.lastgroup).lower())
+
+        return found["quote"], found["mention"], found["race"], found["attribute"]
 
     # Retrieves the domain information from the DM's description.
     def GetCardDomainFromDesc(self) -> None:
-        # Amazing regex done by @Zefile8 and @EokLennon
-        # These meticulously retrieve the information from the card's description
-        # into ordered arrays ready for processing.
-
-        # Remove the "this card is not treated as ..."
-        # Since we already retrieve the information from the DB, this is not useful for us.
-        NOT_TREATED_AS = "\\(This card is not treated as an? (\".*?\") card.\\)"
-        # Find cards with quotes in their names.
-        # This is important since the next search would bug and split the quotes.
-        QUOTE_CARDS = "\"({})\"".format("|".join(self.QUOTE_CARDS))
-        # Finds all direct mentions (words between quotes), which can be either card names or archetypes
-        MENTIONED_QUOTES = "\"(.*?)\""
-        # Find all the races (types) mentioned in the desc
-        # The list is manually typed because in the ref file they are named "beastwarrior" / "divine" and so on, which would provide no matches.
-        RACES = "(aqua|beast-warrior|beast|cyberse|dinosaur|divine-beast|dragon|fairy|fiend|fish|illusion|insect|machine|plant|psychic|pyro|reptile|rock|sea serpent|spellcaster|thunder|warrior|winged beast|wyrm|zombie)"
-        # Find all the attributes mentioned in the desc 
-        ATTRIBUTES = "({})".format("|".join(Attributes.Instance().nameHex.keys()))
-        
-        text = self.DM.desc
-        _, text = Domain.CleanDesc(text, NOT_TREATED_AS)
-        quotes, text = Domain.CleanDesc(text, QUOTE_CARDS)
-        mentions, text = Domain.CleanDesc(text, MENTIONED_QUOTES)
-        races, text = Domain.CleanDesc(text, RACES)
-        attributes, text = Domain.CleanDesc(text, ATTRIBUTES)
+        quotes, mentions, races, attributes = Domain.ScanDesc(self.DM.desc)
 
         # These are the names of the cards, so just add them.
         for quote_card in quotes:
@@ -162,8 +188,29 @@ class Domain:
         self.setcodes: set = None
         self.namedCards: set = None
 
+        # Attributes and races are single bit flags in EDOPro,
+        # so the sets above are also kept as masks (and the archetypes as a bitset).
+        # Call UpdateMasks after changing the sets.
+        self.attributeMask: int = 0
+        self.raceMask: int = 0
+        self.archetypeBits: int = 0
+
         self.cards = []
 
+    # Recomputes the masks from the attributes, races and setcodes sets.
+    def UpdateMasks(self) -> None:
+        self.attributeMask = 0
+        for attribute in self.attributes:
+            self.attributeMask |= attribute
+
+        self.raceMask = 0
+        for race in self.races:
+            self.raceMask |= race
+
+        self.archetypeBits = 0
+        for setcode in self.setcodes:
+            self.archetypeBits |= 1 << setcode
+
     def __str__(self) -> str:
         return "\n".join([
             self.DM.name,
@@ -204,6 +251,7 @@ class Domain:
                 baseSetcodes = baseSetcodes.union(set(baseCodes))
         domain.setcodes = baseSetcodes
 
+        domain.UpdateMasks()
         return domain
 
     # Creates a new Domain from data.
@@ -218,8 +266,31 @@ class Domain:
         domain.setcodes = set(v[0] for v in data[2])
         domain.namedCards = set(v[0] for v in data[3])
 
+        domain.UpdateMasks()
         return domain
 
+    # Fills the domain with all its cards (replacing any it had).
+    # Uses the vectorized DomainKernel if the cards are in memory, otherwise retrieves them from the DB in a single query.
+    # The resulting card ids are kept in the DomainCache, so the next time this domain is populated they are just read back.
+    def Populate(self, includeSpellsAndTraps: bool) -> None:
+        self.RemoveAllCards()
+
+        cardIds = DomainCache.Instance().Get(self, includeSpellsAndTraps)
+        if(cardIds is not None):
+            data, _ = CardsDB.Instance().GetCardsByIds(cardIds)
+
+        else:
+            if(CardsDB.Instance().store is not None):
+                data = DomainKernel.Instance().GetDomainCards(self, includeSpellsAndTraps)
+            else:
+                data = list(CardsDB.Instance().GetDomainCards(self.attributes, self.races, self.setcodes, self.namedCards, includeSpellsAndTraps))
+
+            DomainCache.Instance().Add(self, [row[0] for row in data], includeSpellsAndTraps)
+
+        for row in data:
+            if row is not None:
+                self.AddCardToDomain(Card(row))
+
     # Adds a card to this domain, no questions asked.
     # Used mostly for cards with an attribute or race in the domain,
     # since this check is more straightfoward.
@@ -232,10 +303,10 @@ class Domain:
     # (since we can easily query/exclude these through the DB)
     def CheckIfCardInDomain(self, card : Card, skipAttributeType : bool = False) -> bool:
         if(not skipAttributeType):
-            if(card.attribute in self.attributes):
+            if(card.attribute & self.attributeMask != 0):
                 return True
 
-            if(card.race in self.races):
+            if(card.race & self.raceMask != 0):
                 return True
 
         if(card.name.lower() in self.namedCards):
@@ -248,10 +319,9 @@ class Domain:
             cardBaseSetcodes = Archetypes.Instance().GetBaseArchetype(cardSetcode)
 
             if(not cardBaseSetcodes is None):
-                for domainSetcode in self.setcodes:
-                    for cardBaseSetcode in cardBaseSetcodes:
-                        if(cardBaseSetcode == domainSetcode):
-                            return True
+                for cardBaseSetcode in cardBaseSetcodes:
+                    if((self.archetypeBits >> cardBaseSetcode) & 1 == 1):
+                        return True
 
         return False
 
@@ -0,0 +1,109 @@
+import numpy as np
+
+from classes.textParsers.archetypes import Archetypes
+
+from classes.card import Card
+from classes.databases.cardsDB import CardsDB
+
+# Evaluates domains against every card at once.
+# Uses the columns of CardsDB's memory store as numpy arrays,
+# so checking a domain is a handful of vectorized operations instead of a Python loop per card.
+class DomainKernel:
+
+    # Setcodes are 16 bits, so a lookup table with every possible (base) setcode is small enough.
+    SETCODE_TABLE_SIZE = 1 << 16
+
+    _instance = None
+
+    @staticmethod
+    def Instance():
+        if(DomainKernel._instance is None):
+            DomainKernel()
+
+        return DomainKernel._instance
+
+    def __init__(self) -> None:
+        if(not DomainKernel._instance is None):
+            raise Warning("This class is a Singleton!")
+
+        store = CardsDB.Instance().store
+        if(store is None):
+            raise Warning("DomainKernel needs CardsDB's memory store.")
+
+        DomainKernel._instance = self
+
+        self.store = store
+
+        self.attributes = np.array(store.attributes, dtype=np.int64)
+        self.races = np.array(store.races, dtype=np.int64)
+        types = np.array(store.types, dtype=np.int64)
+
+        isToken = types & Card.TOKEN != 0
+        self.isMonster = (types & Card.MONSTER == Card.MONSTER) & ~isToken
+        self.isSpellOrTrap = (types & Card.MONSTER == 0) & ~isToken
+
+        # Names are matched case insensitive, so each card points to its lowercase name.
+        self.lowerNameIndex: dict[str, int] = {}
+        lowerNameIds = []
+        for i in range(len(store)):
+            lowerName = store.GetName(i).lower()
+            lowerNameIds.append(self.lowerNameIndex.setdefault(lowerName, len(self.lowerNameIndex)))
+        self.lowerNameIds = np.array(lowerNameIds, dtype=np.int64)
+
+        # Base archetypes of each card (one row per card), padded with 0 (which is never a valid base setcode).
+        bases = []
+        for setcodesHex in store.setcodes:
+            cardBases = set()
+            for setcode in Card.SplitSetcodes(setcodesHex):
+                baseCodes = Archetypes.Instance().GetBaseArchetype(setcode)
+                if(baseCodes is not None):
+                    cardBases.update(baseCodes)
+            bases.append(cardBases)
+
+        width = max([len(cardBases) for cardBases in bases] + [1])
+        self.baseSetcodes = np.zeros((len(bases), width), dtype=np.int64)
+        for i, cardBases in enumerate(bases):
+            self.baseSetcodes[i, :len(cardBases)] = list(cardBases)
+
+    # Returns a boolean array telling which cards (in the memory store's order) are in the domain.
+    def Evaluate(self, domain, includeSpellsAndTraps: bool = False) -> np.ndarray:
+        inDomain = (self.attributes & domain.attributeMask) != 0
+        inDomain |= (self.races & domain.raceMask) != 0
+
+        if(len(domain.setcodes) > 0):
+            setcodeTable = np.zeros(DomainKernel.SETCODE_TABLE_SIZE, dtype=bool)
+            setcodeTable[list(domain.setcodes)] = True
+            setcodeTable[0] = False
+            inDomain |= setcodeTable[self.baseSetcodes].any(axis=1)
+
+        nameIds = [self.lowerNameIndex[name] for name in domain.namedCards if name in self.lowerNameIndex]
+        if(len(nameIds) > 0):
+            inDomain |= np.isin(self.lowerNameIds, nameIds)
+
+        inDomain &= self.isMonster
+
+        if(includeSpellsAndTraps):
+            inDomain |= self.isSpellOrTrap
+
+        return inDomain
+
+    # Evaluates many domains at once, returning a (domains x cards) boolean matrix.
+    def EvaluateMany(self, domains: list, includeSpellsAndTraps: bool = False) -> np.ndarray:
+        result = np.zeros((len(domains), len(self.store)), dtype=bool)
+        for i, domain in enumerate(domains):
+            result[i] = self.Evaluate(domain, includeSpellsAndTraps)
+        return result
+
+    # Returns the data (like CardsDB.CARD_QUERY) of every card in the domain, in the same order as CardsDB.GetDomainCards:
+    # monsters with one of the attributes or races, then the other monsters, then spells and traps (each by id).
+    def GetDomainCards(self, domain, includeSpellsAndTraps: bool) -> list:
+        inDomain = self.Evaluate(domain, includeSpellsAndTraps)
+        byAttributeOrRace = ((self.attributes & domain.attributeMask) != 0) | ((self.races & domain.raceMask) != 0)
+
+        parts = [
+            inDomain & self.isMonster & byAttributeOrRace,
+            inDomain & self.isMonster & ~byAttributeOrRace,
+            inDomain & self.isSpellOrTrap,
+        ]
+        indexes = np.concatenate([np.flatnonzero(part) for part in parts])
+        return [self.store.GetRow(int(i)) for i in indexes]
@@ -0,0 +1,383 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+import requests
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+# Limits how many requests are made per second.
+# Holds up to "capacity" tokens, refilled at "rate" tokens per second, and every request takes one,
+# so short bursts go through right away while the long run average stays under the rate.
+class RateLimiter:
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    # Waits until a token is available and takes it.
+    def Acquire(self) -> None:
+        while(True):
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+
+                if(self.tokens >= 1):
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+# Makes the HTTP requests of the program.
+# Every request goes through a single session (so connections are kept alive and reused) and the rate limiter,
+# and failed requests are retried with exponential backoff.
+# Several files are downloaded at once by a bounded pool of threads (see DownloadAll).
+# The validators (ETag / Last-Modified) of what was downloaded are kept, so it's only downloaded again
+# if the server says it changed (see GetValidators).
+class DownloadEngine:
+
+    # Threads downloading at once (per call of Map).
+    MAX_WORKERS = 4
+
+    # Requests per second, and how many can be made at once after being idle.
+    REQUEST_RATE = 8.0
+    REQUEST_BURST = 8
+
+    MAX_RETRIES = 5
+
+    # Seconds to wait before the first retry, doubled on each one, up to BACKOFF_MAX.
+    BACKOFF_BASE = 1.0
+    BACKOFF_MAX = 30.0
+
+    # Seconds to wait for the server to answer.
+    TIMEOUT = 30
+
+    # Size of the blocks downloaded (and hashed) at a time.
+    CHUNK_SIZE = 64 * 1024
+
+    # Downloads are written to "<file><PART_SUFFIX>" until they're complete,
+    # with what's needed to resume them in "<file><PART_SUFFIX><PART_INFO_SUFFIX>".
+    PART_SUFFIX = ".part"
+    PART_INFO_SUFFIX = ".json"
+
+    # Statuses worth trying again, since they usually go away on their own (GitHub answers 403 when rate limiting).
+    RETRY_STATUSES = {403, 408, 429, 500, 502, 503, 504}
+
+    _instance = None
+
+    @staticmethod
+    def Instance():
+        if(DownloadEngine._instance is None):
+            DownloadEngine()
+
+        return DownloadEngine._instance
+
+    def __init__(self) -> None:
+        if(not DownloadEngine._instance is None):
+            raise Warning("This class is a Singleton!")
+
+        DownloadEngine._instance = self
+
+        self.session = requests.Session()
+        # Map can be called from a task of another Map (like the CDB downloads in DownloadManager),
+        # so twice as many connections are kept per host.
+        adapter = HTTPAdapter(pool_connections=DownloadEngine.MAX_WORKERS, pool_maxsize=2 * DownloadEngine.MAX_WORKERS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.limiter = RateLimiter(DownloadEngine.REQUEST_RATE, DownloadEngine.REQUEST_BURST)
+
+        # What is known about each URL: its validators ("etag", "last_modified") and anything else stored by the caller.
+        self.validators: dict[str, dict] = {}
+        self.validatorsLock = threading.Lock()
+
+    # Reads the validators saved by SaveValidators.
+    def LoadValidators(self, path: str) -> None:
+        validators = {}
+        if(os.path.isfile(path)):
+            try:
+                with open(path, "r") as f:
+                    validators = json.load(f)
+            except ValueError:
+                print("Couldn't read the download validators, everything will be checked again.")
+
+        with self.validatorsLock:
+            self.validators = validators
+
+    def SaveValidators(self, path: str) -> None:
+        with self.validatorsLock:
+            with open(path, "w") as f:
+                json.dump(self.validators, f, indent=1, sort_keys=True)
+
+    # Returns what is known about a URL (empty if nothing is).
+    def GetValidators(self, url: str) -> dict:
+        with self.validatorsLock:
+            return dict(self.validators.get(url, {}))
+
+    # Stores values about a URL, keeping the ones already stored.
+    def SetValidators(self, url: str, values: dict) -> None:
+        with self.validatorsLock:
+            self.validators.setdefault(url, {}).update(values)
+
+    # Stores the validators the server sent for a URL, so the next request for it can be conditional.
+    def StoreResponseValidators(self, url: str, response: requests.Response) -> None:
+        self.SetValidators(url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        })
+
+    # Returns the headers that make a request only return a body if it changed since the stored validators.
+    def GetConditionalHeaders(self, url: str) -> dict:
+        validators = self.GetValidators(url)
+
+        headers = {}
+        if(validators.get("etag")):
+            headers["If-None-Match"] = validators["etag"]
+        if(validators.get("last_modified")):
+            headers["If-Modified-Since"] = validators["last_modified"]
+        return headers
+
+    # Returns how long to wait before retrying a request after the given attempt (from 0).
+    # The delay is random (full jitter), so requests that failed together don't all retry together.
+    @staticmethod
+    def GetBackoff(tryNum: int, response: requests.Response = None) -> float:
+        delay = random.uniform(0, min(DownloadEngine.BACKOFF_MAX, DownloadEngine.BACKOFF_BASE * 2 ** tryNum))
+
+        # The server may say how long to wait (in seconds).
+        if(response is not None and response.headers.get("Retry-After", "").isdigit()):
+            delay = max(delay, min(DownloadEngine.BACKOFF_MAX, float(response.headers["Retry-After"])))
+
+        return delay
+
+    # Makes a GET request, retrying up to MAX_RETRIES times if it fails.
+    # If "conditional" is set and the URL has validators, the server answers 304 (without a body) if it didn't change.
+    # If "stream" is set, the body is only read as it's iterated (see Download).
+    # Returns the response (which may not be ok), or None if the server couldn't be reached.
+    def Get(self, url: str, conditional: bool = False, headers: dict = None, stream: bool = False) -> requests.Response:
+        headers = dict(headers or {})
+        if(conditional):
+            headers.update(self.GetConditionalHeaders(url))
+
+        response = None
+        for tryNum in range(DownloadEngine.MAX_RETRIES):
+            self.limiter.Acquire()
+
+            try:
+                response = self.session.get(url, headers=headers, stream=stream, timeout=DownloadEngine.TIMEOUT)
+                reason = response.reason
+                if(response.ok or response.status_code not in DownloadEngine.RETRY_STATUSES):
+                    return response
+                response.close()
+            except requests.RequestException as error:
+                response = None
+                reason = type(error).__name__
+
+            if(tryNum + 1 < DownloadEngine.MAX_RETRIES):
+                print(f"Failed to get [{url}] -> [{reason}]. That was attempt {tryNum + 1}.")
+                time.sleep(DownloadEngine.GetBackoff(tryNum, response))
+
+        return response
+
+    # Returns the JSON of the response to a GET request (None if the request failed).
+    def GetJson(self, url: str):
+        response = self.Get(url)
+        if(response is None or not response.ok):
+            return None
+
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    # Downloads a file into the given path. Returns if the file changed (None if it couldn't be downloaded).
+    # If the file already exists, it's only downloaded if the server says it changed since the last download,
+    # and only replaced if its content is actually different.
+    # The file is streamed into a partial file next to it (so memory use doesn't depend on its size),
+    # checked against the expected size (and git hash, if given) and only then moved over the old one,
+    # so a failed download never leaves a broken file behind.
+    # Interrupted downloads are resumed from where they stopped, if the server supports it.
+    # A partial file that was already complete (the program stopped before it replaced the old file) is just checked and used.
+    def Download(self, url: str, path: str, gitHash: str = None) -> bool | None:
+        exists = os.path.isfile(path)
+        partPath = path + DownloadEngine.PART_SUFFIX
+
+        for tryNum in range(DownloadEngine.MAX_RETRIES):
+            resumeHeaders = DownloadEngine.GetResumeHeaders(url, partPath)
+            resumed = len(resumeHeaders) > 0
+            # A partial file is only left by a download of a newer file than the current one.
+            response = self.Get(url, exists and not resumed, resumeHeaders, True)
+            if(response is None):
+                print(f"Failed to download [{url}] -> [no response]. Skipping.")
+                return None
+
+            validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+            if(resumed and DownloadEngine.IsPartComplete(response, partPath)):
+                response.close()
+                # The server may not send the validators with the range error, but they're the ones the part was downloaded with.
+                info = DownloadEngine.GetPartInfo(partPath)
+                validators = {"etag": info.get("etag"), "last_modified": info.get("last_modified")}
+
+            # 304 means the file didn't change (and counts as ok).
+            elif(response.status_code == 304 or not response.ok):
+                response.close()
+                if(response.status_code == 304):
+                    return False
+
+                # The partial file can't be resumed (like when it's bigger than the file now is), so it's downloaded whole.
+                if(resumed):
+                    print(f"Couldn't resume the download of [{url}] -> [{response.reason}]. Downloading it again.")
+                    DownloadEngine.RemovePart(partPath)
+                    continue
+
+                print(f"Failed to download [{url}] -> [{response.reason}]. Skipping.")
+                return None
+
+            else:
+                try:
+                    complete = DownloadEngine.WritePart(url, response, partPath)
+                except (requests.RequestException, OSError) as error:
+                    complete = False
+                    print(f"Download of [{url}] was interrupted -> [{type(error).__name__}]. That was attempt {tryNum + 1}.")
+                finally:
+                    response.close()
+
+                if(not complete):
+                    time.sleep(DownloadEngine.GetBackoff(tryNum))
+                    continue
+
+            if(gitHash is not None and DownloadEngine.GetGitHash(partPath) != gitHash):
+                print(f"Downloaded [{url}] doesn't match its hash. That was attempt {tryNum + 1}.")
+                DownloadEngine.RemovePart(partPath)
+                continue
+
+            changed = not exists or DownloadEngine.GetFileHash(partPath) != DownloadEngine.GetFileHash(path)
+            if(changed):
+                os.replace(partPath, path)
+            DownloadEngine.RemovePart(partPath)
+
+            self.SetValidators(url, validators)
+            return changed
+
+        print(f"Failed to download [{url}]. Max attempts reached, skipping.")
+        return None
+
+    # Returns the headers that resume the download of a URL from its partial file (empty if there's nothing to resume).
+    # The download is only resumed if the file didn't change since (If-Range), otherwise the server sends it whole.
+    @staticmethod
+    def GetResumeHeaders(url: str, partPath: str) -> dict:
+        if(not os.path.isfile(partPath)):
+            return {}
+
+        info = DownloadEngine.GetPartInfo(partPath)
+        validator = info.get("etag") or info.get("last_modified")
+        if(info.get("url") != url or validator is None):
+            return {}
+
+        return {
+            "Range": "bytes={}-".format(os.path.getsize(partPath)),
+            "If-Range": validator,
+            # Ranges are of the file as stored, so it must not come compressed.
+            "Accept-Encoding": "identity",
+        }
+
+    # Returns what was saved to resume the download of a partial file (see WritePart), or nothing if it can't be read.
+    @staticmethod
+    def GetPartInfo(partPath: str) -> dict:
+        infoPath = partPath + DownloadEngine.PART_INFO_SUFFIX
+        if(not os.path.isfile(infoPath)):
+            return {}
+
+        try:
+            with open(infoPath, "r") as f:
+                return json.load(f)
+        except ValueError:
+            return {}
+
+    # Returns if the answer to a resumed download says the partial file already has the whole file:
+    # the server answers 416 (the range starts at the end of the file), or a range whose total is the size of the part.
+    # Content-Range: bytes <start>-<end>/<total> (or bytes */<total> when answering 416)
+    @staticmethod
+    def IsPartComplete(response: requests.Response, partPath: str) -> bool:
+        total = response.headers.get("Content-Range", "").split("/")[-1]
+        size = os.path.getsize(partPath)
+
+        if(response.status_code == 416):
+            return not total.isdigit() or int(total) == size
+
+        return response.status_code == 206 and total.isdigit() and int(total) == size
+
+    # Writes the body of a response into the partial file, appending to it if the response continues it.
+    # Returns if the whole file was written (if it's as big as the server said).
+    @staticmethod
+    def WritePart(url: str, response: requests.Response, partPath: str) -> bool:
+        start = 0
+        if(response.status_code == 206):
+            # Content-Range: bytes <start>-<end>/<total>
+            start = int(response.headers.get("Content-Range", "bytes 0-").split(" ")[-1].split("-")[0])
+            if(start != os.path.getsize(partPath)):
+                DownloadEngine.RemovePart(partPath)
+                return False
+
+        # What's needed to resume this download if it's interrupted.
+        with open(partPath + DownloadEngine.PART_INFO_SUFFIX, "w") as f:
+            json.dump({"url": url, "etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}, f)
+
+        with open(partPath, "ab" if start > 0 else "wb") as f:
+            for chunk in response.iter_content(DownloadEngine.CHUNK_SIZE):
+                f.write(chunk)
+            size = f.tell()
+
+        # The size is only known if the body isn't compressed.
+        length = response.headers.get("Content-Length")
+        if(length is not None and response.headers.get("Content-Encoding", "identity") == "identity"):
+            return size == start + int(length)
+
+        return True
+
+    @staticmethod
+    def RemovePart(partPath: str) -> None:
+        for path in [partPath, partPath + DownloadEngine.PART_INFO_SUFFIX]:
+            if(os.path.isfile(path)):
+                os.remove(path)
+
+    # Returns the sha256 of a file's content.
+    @staticmethod
+    def GetFileHash(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(DownloadEngine.CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    # Returns the hash git (and GitHub's API) gives to a file's content.
+    @staticmethod
+    def GetGitHash(path: str) -> str:
+        sha = hashlib.sha1("blob {}\0".format(os.path.getsize(path)).encode())
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(DownloadEngine.CHUNK_SIZE), b""):
+                sha.update(chunk)
+        return sha.hexdigest()
+
+    # Downloads every (url, path) or (url, path, git hash) at once.
+    # Returns the result of each download (see Download), in the same order.
+    def DownloadAll(self, files: list[tuple]) -> list[bool | None]:
+        return self.Map(lambda file: self.Download(*file), files)
+
+    # Calls the given function with each item at once (it should mostly wait on requests).
+    # Returns the results in the same order.
+    def Map(self, function, items: list) -> list:
+        if(len(items) <= 1):
+            return [function(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=min(DownloadEngine.MAX_WORKERS, len(items))) as executor:
+            return list(executor.map(function, items))
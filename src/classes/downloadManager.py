@@ -1,9 +1,9 @@
 import os
-import requests
-import time
+import hashlib
 
 from datetime import datetime, timezone, timedelta
 from constants.urlReference import URLs
+from classes.downloadEngine import DownloadEngine
 
 # Handles the download of files used in the program.
 class DownloadManager:
@@ -11,19 +11,24 @@ class DownloadManager:
     CARD_INFO_FOLDER = "cardinfo"
     CDB_FOLDER = "CDBs"
     LOOKUP_FOLDER = "Lookup"
+    CACHE_FOLDER = "Cache"
 
     DOWNLOAD_INFO_FILENAME = "downData"
+    VALIDATORS_FILENAME = "downValidators.json"
     ATTR_RACES_FILENAME = "attrRaces.txt"
     ARCHETYPES_FILENAME = "archetypes.txt"
     PRE_ARCHETYPES_FILENAME = "archetypes2.txt"
 
+    # Reference files in the card info folder, used to generate domains.
+    REFERENCE_FILES = [ATTR_RACES_FILENAME, ARCHETYPES_FILENAME, PRE_ARCHETYPES_FILENAME]
+
     # The prefix used in the file with all the merged CDBs
     MERGED_CDB_PREFIX = 'merged_'
     CARDS_CDB = "cards.cdb"
+    # Files starting with MERGED_CDB_PREFIX are never merged themselves (see CardsDB.UpdateDBs).
+    MERGED_CDB_FILE = MERGED_CDB_PREFIX + CARDS_CDB
     RELEASE_CDB = "release-"
 
-    MAX_RETRIES = 5
-
     # Checks if the reference folder (where all data is stored)
     # exists or not.
     @staticmethod
@@ -50,66 +55,124 @@ class DownloadManager:
     def GetLookupFolder() -> str:
         return os.path.join(DownloadManager.FILES_BASE_FOLDER, DownloadManager.LOOKUP_FOLDER)
 
+    # Returns the path to the folder with data cached by the program (like generated domains).
+    # Everything in there can be safely deleted.
+    @staticmethod
+    def GetCacheFolder() -> str:
+        return os.path.join(DownloadManager.FILES_BASE_FOLDER, DownloadManager.CACHE_FOLDER)
+
+    # Returns a hash of the contents of all reference files.
+    # It changes whenever any of them is updated.
+    @staticmethod
+    def GetReferenceFilesHash() -> str:
+        sha = hashlib.sha256()
+
+        for file in DownloadManager.REFERENCE_FILES:
+            path = os.path.join(DownloadManager.GetCardInfoFolder(), file)
+            if(os.path.isfile(path)):
+                with open(path, "rb") as f:
+                    sha.update(f.read())
+
+        return sha.hexdigest()
+
     # Returns the path to the merged CDB file.
     @staticmethod
     def GetMergedCDBPath() -> str:
-        return os.path.join(DownloadManager.GetCdbFolder(), DownloadManager.MERGED_CDB_PREFIX + DownloadManager.CARDS_CDB)
+        return os.path.join(DownloadManager.GetCdbFolder(), DownloadManager.MERGED_CDB_FILE)
+
+    # Returns the path to the file with the validators of everything downloaded (see DownloadEngine).
+    @staticmethod
+    def GetValidatorsFile() -> str:
+        return os.path.join(DownloadManager.FILES_BASE_FOLDER, DownloadManager.VALIDATORS_FILENAME)
 
-    # Returns all cdb files that should be downloaded from BabelCDB.
+    # Returns all cdb files that should be downloaded from BabelCDB, as (file name, download URL, git hash),
+    # along with the response of the list. The files are None if the list didn't change since it was last downloaded,
+    # or couldn't be downloaded.
+    # The list's validators aren't stored here, only once its files were downloaded.
     @staticmethod
-    def GetCdbsForDownload() -> list:
+    def GetCdbsForDownload(conditional: bool) -> tuple:
+        response = DownloadEngine.Instance().Get(URLs.BABEL_CDB, conditional)
+        if(response is not None and response.status_code == 304):
+            return None, response
+
+        try:
+            cdbInfo = response.json() if response is not None and response.ok else None
+        except ValueError:
+            cdbInfo = None
+
+        # GitHub answers with a "message" instead of the list when something went wrong (like hitting the rate limit).
+        if(not isinstance(cdbInfo, list)):
+            print("Couldn't get the list of CDBs from " + URLs.BABEL_CDB + ".")
+            return None, response
+
         files = []
-        cdbInfo = requests.get(URLs.BABEL_CDB).json()
         for info in cdbInfo:
             fileName = info["name"]
             if(fileName == DownloadManager.CARDS_CDB or fileName.startswith(DownloadManager.RELEASE_CDB)):
-                files.append((fileName, info["download_url"]))
-        return files
+                files.append((fileName, info["download_url"], info.get("sha")))
+        return files, response
 
-    # Checks if a given file was changed since the last_update.
-    # This is done by pinging github's api to get the last commit that changed this file
-    # and using it's date as reference.
+    # Returns the reference files as (file name, download URL, description).
+    @staticmethod
+    def GetReferenceSources() -> list[tuple[str, str, str]]:
+        return [
+            (DownloadManager.ATTR_RACES_FILENAME, URLs.ATTRIBUTES_AND_RACES, "attributes and types"),
+            (DownloadManager.ARCHETYPES_FILENAME, URLs.ARCHETYPES, "archetypes"),
+            (DownloadManager.PRE_ARCHETYPES_FILENAME, URLs.PRE_ARCHETYPES, "pre-release archetypes"),
+        ]
+
+    # Downloads a reference file if it's missing or changed. Returns if it changed.
     @staticmethod
-    def CheckIfFileWasUpdatedFromURL(URL : str, last_update : datetime) -> bool:
-        fileInfo = requests.get(URL).json()
+    def UpdateReferenceFile(file: str, url: str, description: str) -> bool:
+        changed = DownloadEngine.Instance().Download(url, os.path.join(DownloadManager.GetCardInfoFolder(), file))
+        if(changed):
+            print("Updated {}.".format(description))
+        return bool(changed)
+
+    # Downloads the CDBs that are missing or changed in BabelCDB. Returns if any changed.
+    # The list of CDBs is only downloaded if it changed, and then only the CDBs whose git hash changed are.
+    # Downloaded CDBs are merged (and deleted) by CardsDB, which also skips any whose content is the same.
+    @staticmethod
+    def UpdateCdbs() -> bool:
+        engine = DownloadEngine.Instance()
+        merged = os.path.isfile(DownloadManager.GetMergedCDBPath())
 
-        if(fileInfo is None or len(fileInfo) == 0):
-            print("Couldn't download file from " + URL + ".")
+        files, response = DownloadManager.GetCdbsForDownload(merged)
+        if(files is None):
             return False
 
-        # If it contains "message", it means it returned this:
-            # {'message': "API rate limit exceeded for IP. 
-            # (But here's the good news: Authenticated requests get a higher rate limit. Check out the documentation for more details.)",
-            # 'documentation_url': 'https://docs.github.com/rest/overview/resources-in-the-rest-api#rate-limiting'}
-        if("message" in fileInfo):
-            return False
+        downloads = []
+        for fileName, url, sha in files:
+            if(not merged or sha is None or engine.GetValidators(url).get("sha") != sha):
+                downloads.append((fileName, url, sha))
 
-        fileTime = datetime.fromisoformat(fileInfo[0]["commit"]["committer"]["date"].replace("Z","+00:00"))
-        
-        if(fileTime > last_update):
-            return True
-        
-        return False
+        if(len(downloads) > 0):
+            print("Updating cards database ({} of {} files).".format(len(downloads), len(files)))
+
+        cdbFolder = DownloadManager.GetCdbFolder()
+        results = engine.DownloadAll([(url, os.path.join(cdbFolder, fileName), sha) for fileName, url, sha in downloads])
+        for (_, url, sha), result in zip(downloads, results):
+            if(result is not None):
+                engine.SetValidators(url, {"sha": sha})
 
-    # Tries to download a file and performs up to MAX_RETRIES in case it fails
+        # Otherwise the list must be downloaded again next time, so the missing files are retried.
+        if(None not in results):
+            engine.StoreResponseValidators(URLs.BABEL_CDB, response)
+
+        return any(results)
+
+    # Checks if every file needed to run the program was already downloaded (and the CDBs merged).
     @staticmethod
-    def DownloadFileWithRetry(file, url : str) -> None:
-        for tryNum in range(DownloadManager.MAX_RETRIES):
-            r = requests.get(url)
-            if(r.ok):
-                file.write(r.content)
-                file.seek(0)
-                time.sleep(2) # So GitHub doesn't get mad at us after downloading something.
-                return
-            else:
-                print(f"Failed to download [{url}] -> [{r.reason}]. That was attempt {tryNum + 1}.")
-                time.sleep(5 + 3 * tryNum)
-            
-        print(f"Failed to download [{url}]. Max attempts reached, skipping.")
+    def HasLocalFiles() -> bool:
+        files = [os.path.join(DownloadManager.GetCardInfoFolder(), file) for file in DownloadManager.REFERENCE_FILES]
+        files.append(DownloadManager.GetMergedCDBPath())
+        return all([os.path.isfile(file) for file in files])
 
     @staticmethod
-    # (Re)Downloads all files needed.
-    def DownloadFiles() -> None:
+    # (Re)Downloads all files needed. Returns if any of them changed.
+    # Files are only downloaded again if the server says they changed (see DownloadEngine),
+    # and everything is downloaded at once.
+    def DownloadFiles() -> bool:
         print("Checking for updates...")
 
         # Make the dirs
@@ -133,55 +196,26 @@ class DownloadManager:
         # Only check for updates if it has been 30 minutes since last check
         # Just to avoid spamming github's api, but also saves internet I guess.
         shouldCheckForUpdate = datetime.now(timezone.utc) - lastUpdate > timedelta(minutes=30)
-        updated = False
-
-        # Download the attributes and races file
-        attrRacesFile = os.path.join(cardInfoFolder, DownloadManager.ATTR_RACES_FILENAME)
-        if(not os.path.isfile(attrRacesFile) 
-            or (shouldCheckForUpdate 
-                and DownloadManager.CheckIfFileWasUpdatedFromURL(URLs.ATTRIBUTES_AND_RACES_TIME, lastUpdate))):
-            
-            updated = True
-            print("Updating attributes and types.")
-            with open(attrRacesFile, "wb") as f:
-                DownloadManager.DownloadFileWithRetry(f, URLs.ATTRIBUTES_AND_RACES)
-            
-        # Download the archetypes files
-        archFile = os.path.join(cardInfoFolder, DownloadManager.ARCHETYPES_FILENAME)
-        if(not os.path.isfile(archFile) 
-            or (shouldCheckForUpdate 
-                and DownloadManager.CheckIfFileWasUpdatedFromURL(URLs.ARCHETYPES_TIME, lastUpdate))):
-            
-            updated = True
-            print("Updating archetypes.")
-            with open(archFile, "wb") as f:
-                DownloadManager.DownloadFileWithRetry(f, URLs.ARCHETYPES)
-        
-        preArchFile = os.path.join(cardInfoFolder, DownloadManager.PRE_ARCHETYPES_FILENAME)
-        if(not os.path.isfile(preArchFile) 
-            or (shouldCheckForUpdate 
-                and DownloadManager.CheckIfFileWasUpdatedFromURL(URLs.PRE_ARCHETYPES_TIME, lastUpdate))):
-            
-            updated = True
-            print("Updating pre-release archetypes.")
-            with open(preArchFile, "wb") as f:
-                DownloadManager.DownloadFileWithRetry(f, URLs.PRE_ARCHETYPES)
-        
-        # Download all the cdbs files
-        mergedCDBPath = DownloadManager.GetMergedCDBPath()
-        if(not os.path.isfile(mergedCDBPath)
-            # We only check the last commit of babelCDB because it would be too many requests to
-            # do a per-file check. Not perfect, but better than nothing.
-            or (shouldCheckForUpdate 
-                and DownloadManager.CheckIfFileWasUpdatedFromURL(URLs.BABEL_CDB_TIME, lastUpdate))):
-
-            updated = True
-            print("Updating cards database.")
-
-            for file in DownloadManager.GetCdbsForDownload():
-                with open(os.path.join(cdbFolder, file[0]), "wb") as f:
-                    DownloadManager.DownloadFileWithRetry(f, file[1])
-    
+
+        engine = DownloadEngine.Instance()
+        engine.LoadValidators(DownloadManager.GetValidatorsFile())
+
+        # Missing files are always downloaded.
+        tasks = []
+        for file, url, description in DownloadManager.GetReferenceSources():
+            if(shouldCheckForUpdate or not os.path.isfile(os.path.join(cardInfoFolder, file))):
+                tasks.append(lambda file=file, url=url, description=description: DownloadManager.UpdateReferenceFile(file, url, description))
+
+        if(shouldCheckForUpdate or not os.path.isfile(DownloadManager.GetMergedCDBPath())):
+            tasks.append(DownloadManager.UpdateCdbs)
+
+        updated = any(engine.Map(lambda task: task(), tasks))
+
+        engine.SaveValidators(DownloadManager.GetValidatorsFile())
+
+        # Nothing in the Cache folder has to be removed: the DomainCache and the ReferenceSnapshot
+        # are keyed by the files they were generated from, so entries from the old files are just ignored.
+
         # Update the download information file with the last date updated
         if(shouldCheckForUpdate or updated):
             with open(DownloadManager.GetDownloadInfoFile(), "w") as f:
@@ -189,3 +223,4 @@ class DownloadManager:
                 f.seek(0)
 
         print("Done.\n")
+        return updated
@@ -3,7 +3,6 @@ from array import array
 from classes.card import Card
 
 from classes.databases.cardsDB import CardsDB
-from classes.databases.databaseExceptions import CardIdNotFoundError, CardNameNotFoundError
 
 # Handles simple name lists
 class NameList:
@@ -15,6 +14,8 @@ class NameList:
         main = []
         extra = []
 
+        names = []
+
         lines = nameList.split("\n")
         for line in lines:
             line = line.strip()
@@ -22,18 +23,22 @@ class NameList:
             if not line: #empty line
                 continue
 
-            try:
-                data = CardsDB.Instance().GetCardByName(line.strip())
-                card = Card(data)
+            names.append(line)
 
-                if card.IsExtraDeckMonster():
-                    extra.append(card)
-                else:
-                    main.append(card)
+        cardsData, missing = CardsDB.Instance().GetCardsByNames(names)
+        for name in missing:
+            print(f"Couldn't process card with name [{name}]. Keep in mind pre-release cards are not supported.")
 
-            except CardNameNotFoundError as error:
-                print(f"Couldn't process card with name [{error.args[0]}]. Keep in mind pre-release cards are not supported.")
+        for data in cardsData:
+            if data is None:
                 continue
+
+            card = Card(data)
+
+            if card.IsExtraDeckMonster():
+                extra.append(card)
+            else:
+                main.append(card)
         
         return [main, extra, []]
     
@@ -5,7 +5,6 @@ from collections import Counter
 from classes.card import Card
 
 from classes.databases.cardsDB import CardsDB
-from classes.databases.databaseExceptions import CardIdNotFoundError, CardNameNotFoundError
 
 # Handles Untap lists
 class UntapDeck:
@@ -44,7 +43,8 @@ class UntapDeck:
 
             curr_deck.append(line)
 
-        decks = [[], [], []]
+        # (deck index, amount, name) of every line, so all cards can be retrieved at once.
+        entries = []
 
         for i in range(0,3):
             for line in untap_lines[i]:
@@ -62,15 +62,21 @@ class UntapDeck:
                 else:
                     print(f"Couldn't process card amount [{info.group(1)}].")
 
-                try:
-                    data = CardsDB.Instance().GetCardByName(name)
-                    card = Card(data)
-                    for _ in range(amount):
-                        decks[i].append(card)
+                entries.append((i, amount, name))
 
-                except CardNameNotFoundError as error:
-                    print(f"Couldn't process card with name [{error.args[0]}]. Keep in mind pre-release cards are not supported.")
-                    continue
+        cardsData, missing = CardsDB.Instance().GetCardsByNames([entry[2] for entry in entries])
+        for name in missing:
+            print(f"Couldn't process card with name [{name}]. Keep in mind pre-release cards are not supported.")
+
+        decks = [[], [], []]
+
+        for (i, amount, _), data in zip(entries, cardsData):
+            if data is None:
+                continue
+
+            card = Card(data)
+            for _ in range(amount):
+                decks[i].append(card)
         
         return decks
     
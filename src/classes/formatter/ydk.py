@@ -3,7 +3,6 @@ from array import array
 from classes.card import Card
 
 from classes.databases.cardsDB import CardsDB
-from classes.databases.databaseExceptions import CardIdNotFoundError, CardNameNotFoundError
 
 # Handles YDK lists
 class YDK:
@@ -38,29 +37,23 @@ class YDK:
         extra = []
         side = []
 
-        for id in decks[0]:
-            try:
-                data = CardsDB.Instance().GetCardById(id)
-                card = Card(data)
+        cardsData, missing = CardsDB.Instance().GetCardsByIds(decks[0] + decks[1])
+        for id in missing:
+            print(f"Couldn't process card with id [{id}]. Keep in mind pre-release cards are not supported.")
 
-                if card.IsExtraDeckMonster():
-                    extra.append(card)
-                else:
-                    main.append(card)
-
-            except CardIdNotFoundError as error:
-                print(f"Couldn't process card with id [{error.args[0]}]. Keep in mind pre-release cards are not supported.")
+        # The first ids belong to the main/extra deck, the rest to the side deck.
+        for i, data in enumerate(cardsData):
+            if data is None:
                 continue
 
-        for id in decks[1]:
-            try:
-                data = CardsDB.Instance().GetCardById(id)
-                card = Card(data)
-                side.append(card)
+            card = Card(data)
 
-            except CardIdNotFoundError as error:
-                print(f"Couldn't process card with id [{error.args[0]}]. Keep in mind pre-release cards are not supported.")
-                continue
+            if i >= len(decks[0]):
+                side.append(card)
+            elif card.IsExtraDeckMonster():
+                extra.append(card)
+            else:
+                main.append(card)
         
         return [main, extra, side]
     
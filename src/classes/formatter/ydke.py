@@ -4,7 +4,6 @@ from base64 import b64encode, b64decode
 from classes.card import Card
 
 from classes.databases.cardsDB import CardsDB
-from classes.databases.databaseExceptions import CardIdNotFoundError, CardNameNotFoundError
 
 # Handles YDKE URLs
 class YDKE:
@@ -31,15 +30,11 @@ class YDKE:
             idList = array("I")
             idList.frombytes(b64decode(decks[i]))
             
-            decklist = []
-            for id in idList:
-                try:
-                    data = CardsDB.Instance().GetCardById(id)
-                    decklist.append(Card(data))
-                except CardIdNotFoundError as error:
-                    print(f"Couldn't process card with id [{error.args[0]}]. Keep in mind pre-release cards are not supported.")
-                    continue
+            cardsData, missing = CardsDB.Instance().GetCardsByIds(idList.tolist())
+            for id in missing:
+                print(f"Couldn't process card with id [{id}]. Keep in mind pre-release cards are not supported.")
 
+            decklist = [Card(data) for data in cardsData if data is not None]
             passcodes.append(decklist)
         
         return passcodes
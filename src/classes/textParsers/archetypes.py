@@ -1,7 +1,9 @@
 import os
+import hashlib
 
 from classes.textParsers.textParser import TextParser
 from classes.downloadManager import DownloadManager
+from classes.textParsers.referenceSnapshot import ReferenceSnapshot
 
 # Reference class for all the archetypes HEXCODES
 class Archetypes(TextParser):
@@ -16,6 +18,9 @@ class Archetypes(TextParser):
     # Hex value for the base archetype bits of a setcode.
     HEX_BASE_SETCODE = int('0xfff', 0)
 
+    # Amount of possible setcodes (they are 16 bits long).
+    SETCODE_COUNT = 1 << 16
+
     # List of archetypes in edo to ignore.
     # Mostly series that are miss categorized as archetypes.
     IGNORE_LIST = [
@@ -68,6 +73,10 @@ class Archetypes(TextParser):
         int('0x307b', 0): [int('0x7b', 0), int('0x1ab', 0)],# Galaxy-Eyes Tachyon Dragon is both a Galaxy and Tachyon.
     }
 
+    # Name of the tables in the ReferenceSnapshot, and everything they depend on besides the reference files.
+    SNAPSHOT_NAME = "archetypes"
+    SNAPSHOT_RULES = (HEADER, PRE_HEADER, PRE_ARCHETYPE_HEADER, PARSE_LINE, HEX_BASE_SETCODE, SETCODE_COUNT, IGNORE_LIST, ARCH_REPLACES, EXTRA_CASES, BASE_ARCH_EXCEPTIONS)
+
     _instance = None
 
     @staticmethod
@@ -77,23 +86,47 @@ class Archetypes(TextParser):
 
         return Archetypes._instance
     
-    def __init__(self) -> None:
-        if(not Archetypes._instance is None):
-            raise Warning("This class is a Singleton!")
-        
-        Archetypes._instance = self
+    # Detached instances are set up without replacing the one in use, nor printing anything (see BackgroundUpdater).
+    # They use the given ReferenceSnapshot (or one of their own) instead of the one in use, since they may be set up in another thread.
+    def __init__(self, detached: bool = False, snapshot: ReferenceSnapshot = None) -> None:
+        if(not detached):
+            if(not Archetypes._instance is None):
+                raise Warning("This class is a Singleton!")
+
+            Archetypes._instance = self
+        elif(snapshot is None):
+            snapshot = ReferenceSnapshot(True)
+
+        self.snapshot = snapshot
 
         self.hexName = {}
         self.nameHex = {}
+        self.baseArchetypes: tuple = ()
 
-        self.Update()
+        self.Update(not detached)
     
-    def Update(self) -> None:
+    def Update(self, verbose: bool = True) -> None:
+        if(verbose):
+            print("Setting up Archetype Reference.")
+
+        snapshot = ReferenceSnapshot.Instance() if self.snapshot is None else self.snapshot
+        key = ReferenceSnapshot.GetKey([DownloadManager.ARCHETYPES_FILENAME, DownloadManager.PRE_ARCHETYPES_FILENAME], Archetypes.SNAPSHOT_RULES)
+        tables = snapshot.Get(Archetypes.SNAPSHOT_NAME, key)
+
+        if(tables is None):
+            self.Parse()
+            snapshot.Set(Archetypes.SNAPSHOT_NAME, key, (self.hexName, self.nameHex, self.baseArchetypes))
+        else:
+            self.hexName, self.nameHex, self.baseArchetypes = tables
+
+        if(verbose):
+            print("Done.\n")
+
+    # Parses the tables from the reference files and applies all the fixups above.
+    def Parse(self) -> None:
         updateHexName = {}
         updateNameHex = {}
 
-        print("Setting up Archetype Reference.")
-
         with open(os.path.join(DownloadManager.GetCardInfoFolder(), DownloadManager.ARCHETYPES_FILENAME), "r", encoding="utf8") as f:
             text = f.read()
             self.ParseSection(
@@ -148,27 +181,44 @@ class Archetypes(TextParser):
         self.hexName = updateHexName
         self.nameHex = updateNameHex
 
-        print("Done.\n")
+        # GetBaseArchetype is called for every setcode of every card many times over,
+        # so the base archetypes of all possible setcodes are resolved once here (and kept in the snapshot).
+        self.baseArchetypes = tuple(self.ResolveBaseArchetype(hexCode) for hexCode in range(Archetypes.SETCODE_COUNT))
+
+    # Returns a hash of everything GetBaseArchetype depends on.
+    # Changes whenever the reference files (or the rules in this class) change,
+    # so anything computed from the archetypes knows when it must be rebuilt.
+    def GetVersion(self) -> str:
+        data = repr((sorted(self.hexName.items()), sorted(Archetypes.BASE_ARCH_EXCEPTIONS.items())))
+        return hashlib.sha256(data.encode("utf8")).hexdigest()
+
+    # Returns the base archetypes of a setcode (or None if it doesn't belong to any).
+    # These are all precomputed in Update, so this is just a lookup.
+    def GetBaseArchetype(self, hexCode: int) -> tuple[int]:
+        if(0 <= hexCode < Archetypes.SETCODE_COUNT):
+            return self.baseArchetypes[hexCode]
+
+        return self.ResolveBaseArchetype(hexCode)
 
     # Helper method to extract the base and valid code of an archetype.
-    def GetBaseArchetype(self, hexCode: int) -> list[int]:
+    def ResolveBaseArchetype(self, hexCode: int) -> tuple[int]:
 
         # Some archetypes that are incorrected classified
         # get special treatment.
         if(hexCode in Archetypes.BASE_ARCH_EXCEPTIONS):
-            return Archetypes.BASE_ARCH_EXCEPTIONS[hexCode]
+            return tuple(Archetypes.BASE_ARCH_EXCEPTIONS[hexCode])
 
         baseCode = hexCode & Archetypes.HEX_BASE_SETCODE
 
         # While "Genex Ally" is not an archetype,
         # Just "Genex" is (and it's marked as a sub-archetype).
         if(baseCode in self.hexName):
-            return [baseCode]
+            return (baseCode,)
 
         # "Supreme King Gate" and "Supreme King Dragon", for example,
         # don't have a base hexCode, but are still valid archetypes.
         if(hexCode in self.hexName):
-            return [hexCode]
+            return (hexCode,)
         
         # Probably something from the IGNORE_LIST, so just ignore.
         return None
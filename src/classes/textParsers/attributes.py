@@ -2,6 +2,7 @@ import os
 
 from classes.textParsers.textParser import TextParser
 from classes.downloadManager import DownloadManager
+from classes.textParsers.referenceSnapshot import ReferenceSnapshot
 
 # Reference class for all the Attributes HEXCODES
 class Attributes(TextParser):
@@ -13,6 +14,10 @@ class Attributes(TextParser):
     # The line that describes the format of each attribute entry in the section.
     PARSE_LINE = "#define ATTRIBUTE_([\\w]+)\\s+(\\S+)"
 
+    # Name of the tables in the ReferenceSnapshot, and everything they depend on besides the reference file.
+    SNAPSHOT_NAME = "attributes"
+    SNAPSHOT_RULES = (HEADER, PARSE_LINE)
+
     _instance = None
 
     @staticmethod
@@ -22,20 +27,43 @@ class Attributes(TextParser):
 
         return Attributes._instance
     
-    def __init__(self) -> None:
-        if(not Attributes._instance is None):
-            raise Warning("This class is a Singleton!")
+    # Detached instances are set up without replacing the one in use, nor printing anything (see BackgroundUpdater).
+    # They use the given ReferenceSnapshot (or one of their own) instead of the one in use, since they may be set up in another thread.
+    def __init__(self, detached: bool = False, snapshot: ReferenceSnapshot = None) -> None:
+        if(not detached):
+            if(not Attributes._instance is None):
+                raise Warning("This class is a Singleton!")
+
+            Attributes._instance = self
+        elif(snapshot is None):
+            snapshot = ReferenceSnapshot(True)
 
-        Attributes._instance = self
+        self.snapshot = snapshot
 
         self.hexName = {}
         self.nameHex = {}
 
-        self.Update()
+        self.Update(not detached)
 
-    def Update(self) -> None:
-        print("Setting up Attributes Reference.")
-        
+    def Update(self, verbose: bool = True) -> None:
+        if(verbose):
+            print("Setting up Attributes Reference.")
+
+        snapshot = ReferenceSnapshot.Instance() if self.snapshot is None else self.snapshot
+        key = ReferenceSnapshot.GetKey([DownloadManager.ATTR_RACES_FILENAME], Attributes.SNAPSHOT_RULES)
+        tables = snapshot.Get(Attributes.SNAPSHOT_NAME, key)
+
+        if(tables is None):
+            self.Parse()
+            snapshot.Set(Attributes.SNAPSHOT_NAME, key, (self.hexName, self.nameHex))
+        else:
+            self.hexName, self.nameHex = tables
+
+        if(verbose):
+            print("Done.\n")
+
+    # Parses the tables from the reference file.
+    def Parse(self) -> None:
         updateNameHex = {}
         updateHexName = {}
 
@@ -54,5 +82,3 @@ class Attributes(TextParser):
 
         self.hexName = updateHexName
         self.nameHex = updateNameHex
-
-        print("Done.\n")
\ No newline at end of file
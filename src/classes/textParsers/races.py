@@ -2,6 +2,7 @@ import os
 
 from classes.textParsers.textParser import TextParser
 from classes.downloadManager import DownloadManager
+from classes.textParsers.referenceSnapshot import ReferenceSnapshot
 
 # Reference class for all the Races HEXCODES
 class Races(TextParser):
@@ -13,6 +14,10 @@ class Races(TextParser):
     # The line that describes the format of each type entry in the section.
     PARSE_LINE = "#define RACE_([\\w]+)\\s+(\\S+)"
 
+    # Name of the tables in the ReferenceSnapshot, and everything they depend on besides the reference file.
+    SNAPSHOT_NAME = "races"
+    SNAPSHOT_RULES = (HEADER, PARSE_LINE)
+
     _instance = None
 
     @staticmethod
@@ -22,20 +27,43 @@ class Races(TextParser):
 
         return Races._instance
     
-    def __init__(self) -> None:
-        if(not Races._instance is None):
-            raise Warning("This class is a Singleton!")
-        
-        Races._instance = self
+    # Detached instances are set up without replacing the one in use, nor printing anything (see BackgroundUpdater).
+    # They use the given ReferenceSnapshot (or one of their own) instead of the one in use, since they may be set up in another thread.
+    def __init__(self, detached: bool = False, snapshot: ReferenceSnapshot = None) -> None:
+        if(not detached):
+            if(not Races._instance is None):
+                raise Warning("This class is a Singleton!")
+
+            Races._instance = self
+        elif(snapshot is None):
+            snapshot = ReferenceSnapshot(True)
+
+        self.snapshot = snapshot
 
         self.hexName = {}
         self.nameHex = {}
 
-        self.Update()
+        self.Update(not detached)
 
-    def Update(self) -> None:
-        print("Setting up Types Reference.")
-        
+    def Update(self, verbose: bool = True) -> None:
+        if(verbose):
+            print("Setting up Types Reference.")
+
+        snapshot = ReferenceSnapshot.Instance() if self.snapshot is None else self.snapshot
+        key = ReferenceSnapshot.GetKey([DownloadManager.ATTR_RACES_FILENAME], Races.SNAPSHOT_RULES)
+        tables = snapshot.Get(Races.SNAPSHOT_NAME, key)
+
+        if(tables is None):
+            self.Parse()
+            snapshot.Set(Races.SNAPSHOT_NAME, key, (self.hexName, self.nameHex))
+        else:
+            self.hexName, self.nameHex = tables
+
+        if(verbose):
+            print("Done.\n")
+
+    # Parses the tables from the reference file.
+    def Parse(self) -> None:
         updateNameHex = {}
         updateHexName = {}
 
@@ -54,5 +82,3 @@ class Races(TextParser):
 
         self.hexName = updateHexName
         self.nameHex = updateNameHex
-        
-        print("Done.\n")
@@ -0,0 +1,114 @@
+import os
+import sys
+import marshal
+import hashlib
+import threading
+
+from classes.downloadManager import DownloadManager
+
+# Keeps the tables parsed from the reference files (after all of their fixups) in a single binary file,
+# so they're loaded with one read on startup instead of parsed again.
+# Each table is stored with a key of the files it comes from and the rules used to parse them (see GetKey),
+# so it's only used while neither of them changed.
+class ReferenceSnapshot:
+
+    SNAPSHOT_FILE = "references.snapshot"
+
+    # Changes whenever the layout of the snapshot does.
+    # Marshal's format also depends on the python version, so that's part of it too.
+    SNAPSHOT_VERSION = (1, marshal.version, sys.version_info.major, sys.version_info.minor)
+
+    # If not set, the snapshot file is neither read nor written, so the tables are always parsed
+    # (like in the update process, which doesn't touch the files in use, see BackgroundUpdater).
+    USE_FILE = True
+
+    _instance = None
+
+    @staticmethod
+    def Instance():
+        if(ReferenceSnapshot._instance is None):
+            ReferenceSnapshot()
+
+        return ReferenceSnapshot._instance
+
+    # Detached instances are loaded without replacing the one in use (see BackgroundUpdater),
+    # so they can be used from another thread than the one using it.
+    def __init__(self, detached: bool = False) -> None:
+        if(not detached):
+            if(not ReferenceSnapshot._instance is None):
+                raise Warning("This class is a Singleton!")
+
+            ReferenceSnapshot._instance = self
+
+        # {table name : (key, table)}
+        self.tables = ReferenceSnapshot.Load()
+
+    @staticmethod
+    def GetSnapshotPath() -> str:
+        return os.path.join(DownloadManager.GetCacheFolder(), ReferenceSnapshot.SNAPSHOT_FILE)
+
+    # Returns a hash of the contents of the reference files and the rules used to parse them.
+    @staticmethod
+    def GetKey(files: list[str], rules: tuple) -> str:
+        sha = hashlib.sha256()
+
+        for file in files:
+            with open(os.path.join(DownloadManager.GetCardInfoFolder(), file), "rb") as f:
+                sha.update(f.read())
+
+        sha.update(repr(rules).encode("utf8"))
+
+        return sha.hexdigest()
+
+    # Returns all tables in the snapshot, or none if there isn't a (valid) one.
+    @staticmethod
+    def Load() -> dict:
+        path = ReferenceSnapshot.GetSnapshotPath()
+        if(not ReferenceSnapshot.USE_FILE or not os.path.isfile(path)):
+            return {}
+
+        try:
+            with open(path, "rb") as f:
+                version, tables = marshal.loads(f.read())
+        except (EOFError, ValueError, TypeError):
+            return {}
+
+        if(version != ReferenceSnapshot.SNAPSHOT_VERSION):
+            return {}
+
+        return tables
+
+    # Writes every table to the snapshot.
+    # Written to a temporary file first (one per thread), so a snapshot is never left half written
+    # (and a detached instance can write its own at the same time, see BackgroundUpdater).
+    def Save(self) -> None:
+        if(not ReferenceSnapshot.USE_FILE):
+            return
+
+        cacheFolder = DownloadManager.GetCacheFolder()
+        if(not os.path.exists(cacheFolder)):
+            os.makedirs(cacheFolder)
+
+        path = ReferenceSnapshot.GetSnapshotPath()
+        tempPath = "{}.{}.{}.tmp".format(path, os.getpid(), threading.get_ident())
+        with open(tempPath, "wb") as f:
+            f.write(marshal.dumps((ReferenceSnapshot.SNAPSHOT_VERSION, self.tables)))
+
+        os.replace(tempPath, path)
+
+    # Returns the table stored with this key, or None if it must be parsed again.
+    # If the table in memory doesn't match, the snapshot is read again first,
+    # since another instance may have written a newer one (see BackgroundUpdater).
+    def Get(self, name: str, key: str) -> tuple:
+        if(name not in self.tables or self.tables[name][0] != key):
+            self.tables = ReferenceSnapshot.Load()
+
+        if(name in self.tables and self.tables[name][0] == key):
+            return self.tables[name][1]
+
+        return None
+
+    # Stores the table (which can only have python's basic types) and saves the snapshot.
+    def Set(self, name: str, key: str, table: tuple) -> None:
+        self.tables[name] = (key, table)
+        self.Save()
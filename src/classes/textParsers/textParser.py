@@ -8,18 +8,15 @@ class TextParser:
     # Dic: Where to store the information ordered by {first column : second column}
     # ReverseDic: same as dic, but reversed
     def ParseSection(self, text: str, header: str, line: str, dic: dict, reverseDic: dict) -> None:
-        # First, retrive the entire section of the file.
+        # First, find where the section of the file is.
         section = re.search("{}({}\n)*".format(header, line), text)
 
         if(section is None or section.group(0) is None):
             print("Could not find section [{}].".format(header))
             return
 
-        # Remove the header from the section.
-        list = section.group(0).strip().removeprefix(header)
-        # For each entry in the section, retrieve the archetype's name and hexcode.
-        for entry in list.split("\n"):
-            info = re.search(line, entry)
+        # Then, retrieve each archetype's name and hexcode in a single pass over the section (skipping the header).
+        for info in re.compile(line).finditer(text, section.start() + len(header), section.end()):
 
             # if(info.group(1) in dic):
             #     print(f"Replacing \t{info.group(1)}\t[{dic[info.group(1)]}] -> [{info.group(2)}]")
@@ -27,4 +24,4 @@ class TextParser:
 
             # if(info.group(2) in reverseDic):
             #     print(f"Replacing \t{info.group(2)}\t[{reverseDic[info.group(2)]}] -> [{info.group(1)}]")
-            reverseDic[info.group(2)] = info.group(1)
\ No newline at end of file
+            reverseDic[info.group(2)] = info.group(1)
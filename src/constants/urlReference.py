@@ -5,7 +5,3 @@ class URLs:
     ARCHETYPES = "https://raw.githubusercontent.com/ProjectIgnis/Distribution/refs/heads/master/config/strings.conf"
     PRE_ARCHETYPES = "https://raw.githubusercontent.com/ProjectIgnis/DeltaBagooska/refs/heads/master/strings.conf"
 
-    BABEL_CDB_TIME = "https://api.github.com/repos/ProjectIgnis/BabelCDB/commits?page=1&per_page=1"
-    ATTRIBUTES_AND_RACES_TIME = "https://api.github.com/repos/edo9300/edopro/commits?path=gframe%2Fcommon.h&page=1&per_page=1"
-    ARCHETYPES_TIME = "https://api.github.com/repos/ProjectIgnis/Distribution/commits?path=config%2Fstrings.conf&page=1&per_page=1"
-    PRE_ARCHETYPES_TIME = "https://api.github.com/repos/ProjectIgnis/DeltaBagooska/commits?path=strings.conf&page=1&per_page=1"
@@ -10,6 +10,7 @@ from classes.databases.domainLookup import DomainLookup
 from classes.domainExporter import DomainExporter
 from classes.deckChecker import DeckChecker
 from classes.formatter.deckFormatter import DeckFormatter
+from classes.backgroundUpdater import BackgroundUpdater
 
 
 # Class that handles the CLI interface of the program
@@ -46,9 +47,22 @@ class CommandLineInterface:
         input()
         print("")
 
+    # Swaps in the data of the background update if it's done, letting the user know.
+    # Only called before starting over a tool, so the data never changes in the middle of using it.
+    def ApplyUpdate(self) -> None:
+        if(BackgroundUpdater.Instance().process is None or BackgroundUpdater.Instance().applied):
+            return
+
+        BackgroundUpdater.Instance().ApplyUpdate()
+        if(BackgroundUpdater.Instance().applied):
+            print(BackgroundUpdater.Instance().GetStatus() + "\n")
+
     # The program's intro, which gives the user the option to update files before continuing.
     def IntroInput(self) -> None:
         print("Welcome to Domain Toolbox! Version {}\n".format(ProgramInfo.VERSION))
+
+        if(BackgroundUpdater.Instance().process is not None):
+            print(BackgroundUpdater.Instance().GetStatus() + "\n")
     
     def DecideTool(self) -> int:
         while(True):
@@ -100,18 +114,6 @@ class CommandLineInterface:
     
     # Prompt that adds cards to a deckmaster's domain.
     def GetDomainCards(self, domain: Domain) -> None:
-        print("Retrieving monsters in this domain...")
-
-        data = CardsDB.Instance().GetMonstersByAttributeAndRace(domain.attributes, domain.races)
-        for row in data:
-            card = Card(row)
-            domain.AddCardToDomain(card)
-
-        data = CardsDB.Instance().GetMonstersExcludingAttributeAndRace(domain.attributes, domain.races)
-        for row in data:
-            card = Card(row)
-            domain.CheckAndAddCardToDomain(card)
-        
         while(True):
             print("Should I add spells and traps to the domain?")
             print("(1) Yes, add spells and traps to the list.")
@@ -122,14 +124,9 @@ class CommandLineInterface:
                 self.InfoMessage(self.NOT_DIGIT_ANSWER)
                 continue
 
-            elif(answer == '1'):
-                data = CardsDB.Instance().GetAllSpellsAndTraps()
-                for row in data:
-                    card = Card(row)
-                    domain.AddCardToDomain(card)
-                return 
-            
-            elif(answer == '2'):
+            elif(answer == '1' or answer == '2'):
+                print("Retrieving cards in this domain...")
+                domain.Populate(answer == '1')
                 return
 
             else:
@@ -203,6 +200,8 @@ class CommandLineInterface:
 
         if tool == 1:
             while(True):
+                self.ApplyUpdate()
+
                 # Step 2) Get the Deckmaster and Domain.
                 domain = self.GetDeckMasterAndDomain()
 
@@ -216,6 +215,8 @@ class CommandLineInterface:
         
         elif tool == 2:
             while(True):
+                self.ApplyUpdate()
+
                 answer = self.RequestInput("Please, provide the YDKE url.")
                 try:
                     print(DeckChecker.CheckDeck(answer))
@@ -225,6 +226,8 @@ class CommandLineInterface:
         
         elif tool == 3:            
             while(True):
+                self.ApplyUpdate()
+
                 answer = self.RequestInput("Please, provide the YDKE url.")
                 decks = DeckFormatter.Instance().Decode(DeckFormatter.Format.YDKE, answer)
                 if(decks is None):
@@ -236,23 +239,25 @@ class CommandLineInterface:
                         desired += [card for card in deck if card.IsMonster()]
                     
                     if(len(desired) > 0):
-                        candidates : list[set] = []
-                        for card in desired:
-                            candidates.append(set(DomainLookup.Instance().FilterMonster(card)))
-
-                        validDMs : set = candidates[0]
-                        for candidate in candidates:
-                            validDMs = validDMs.intersection(candidate)
+                        validDMs = DomainLookup.Instance().FindMastersForDeck(desired)
 
                         # TODO: Process this in some way (banlist?)
                         dmList = []
                         for dm in validDMs:
-                            dmList.append(CardsDB.Instance().GetNameById(dm[0]))
+                            dmList.append(CardsDB.Instance().GetNameById(dm))
                         
                         dmList.sort()
 
                         for dm in dmList:
                             print(dm)
+
+                        print("\n" + str(DomainLookup.Instance().lastSearch))
+
+                        if(len(dmList) == 0):
+                            print("\nNo DM has every monster in its domain. The closest ones are:")
+                            for dm, missing in DomainLookup.Instance().RankMastersForDeck(desired):
+                                missingNames = sorted(set([card.name for card in missing]))
+                                print(f"{CardsDB.Instance().GetNameById(dm)} (missing {len(missing)}: {', '.join(missingNames)})")
                     
                     else:
                         print("The deck provided has no monsters.")
@@ -261,6 +266,8 @@ class CommandLineInterface:
         
         elif tool == 4:
             while(True):
+                self.ApplyUpdate()
+
                 print("What is the format you are converting from?")
                 from_format = self.SelectDeckFormat()
 
@@ -3,6 +3,7 @@ import tkinter
 from tkinter import ttk
 
 from constants.programInfo import ProgramInfo
+from classes.backgroundUpdater import BackgroundUpdater
 
 from interfaces.guiTabs.domGenTab import DomainGeneratorGUI
 from interfaces.guiTabs.deckCheckerTab import DeckCheckerGUI
@@ -14,6 +15,9 @@ class GraphicalUserInterface:
 
     TITLE = "Yugioh Domain Toolbox ({})"
 
+    # Milliseconds between checks of the background update.
+    UPDATE_POLL_INTERVAL = 500
+
     # The main interface loop.
     def StartInterface(self) -> None:            
         # TKinter setup.
@@ -32,6 +36,13 @@ class GraphicalUserInterface:
         tabControl.add(deckCheckerTab, text="Deck Validator")
         tabControl.add(reverseDomainTab, text="Reverse Domain Searcher")
         tabControl.add(formatConverterTab, text="Format Converter")
+
+        # Status of the background update, below the tabs.
+        updateStatus = tkinter.StringVar()
+        updateStatus.set(BackgroundUpdater.Instance().GetStatus())
+        statusLabel = ttk.Label(frame, textvariable=updateStatus, anchor="w")
+        statusLabel.pack(side=tkinter.BOTTOM, fill="x", padx=5)
+
         tabControl.pack(expand = 1, fill ="both") 
 
         # Domain Generator
@@ -50,5 +61,17 @@ class GraphicalUserInterface:
         formatConverterClass = FormatConverterGUI()
         formatConverterClass.Tab(formatConverterTab)
 
+        # The new data is swapped in from Tkinter's loop, so it never happens in the middle of a callback.
+        def PollUpdate():
+            if(BackgroundUpdater.Instance().ApplyUpdate()):
+                domGenTabClass.UpdateMonsterNames()
+
+            updateStatus.set(BackgroundUpdater.Instance().GetStatus())
+            if(not BackgroundUpdater.Instance().applied):
+                frame.after(self.UPDATE_POLL_INTERVAL, PollUpdate)
+
+        if(BackgroundUpdater.Instance().process is not None):
+            PollUpdate()
+
         frame.mainloop()
         
\ No newline at end of file
@@ -53,24 +53,8 @@ class DomainGeneratorGUI:
     
     # Adds cards to a deckmaster's domain.
     def GetDomainCards(self, domain: Domain, spelltrap: str) -> None:
-        # Remove all cards before adding new ones.
-        domain.RemoveAllCards()
-
-        data = CardsDB.Instance().GetMonstersByAttributeAndRace(domain.attributes, domain.races)
-        for row in data:
-            card = Card(row)
-            domain.AddCardToDomain(card)
-
-        data = CardsDB.Instance().GetMonstersExcludingAttributeAndRace(domain.attributes, domain.races)
-        for row in data:
-            card = Card(row)
-            domain.CheckAndAddCardToDomain(card)
-        
-        if(spelltrap == self.SPELL_OPT_ADD_SPELLS):
-            data = CardsDB.Instance().GetAllSpellsAndTraps()
-            for row in data:
-                card = Card(row)
-                domain.AddCardToDomain(card)
+        # Populate removes all cards before adding new ones.
+        domain.Populate(spelltrap == self.SPELL_OPT_ADD_SPELLS)
     
     # Prompt to check which formats the user wants to export the domain.
     def ExportDomain(self, domain: Domain, export) -> None:
@@ -87,6 +71,10 @@ class DomainGeneratorGUI:
             DomainExporter.toLflist(domain)
             return
 
+    # Suggests the monsters of the current cards DB (called after it's updated).
+    def UpdateMonsterNames(self) -> None:
+        self.nameEntry.autocompleteList = [name[0] for name in CardsDB.Instance().GetAllMonsterNames()]
+
     def Tab(self, domainGeneratorTab : Frame) -> None:
         # "Global" Variables
         domain = None
@@ -139,6 +127,7 @@ class DomainGeneratorGUI:
         idtext.trace_add("write", OnIdChanged)
         id = AutoCompleteEntry(monsterNames, leftside, textvariable=idtext, width=30)
         id.pack()
+        self.nameEntry = id
 
         leftside.pack(side=tkinter.LEFT, padx=15)
 
@@ -53,26 +53,27 @@ class ReverseDomainGUI:
                     message.insert(INSERT, "The deck provided has no monsters.")
                     return
 
-                candidates : list[set] = []
-                for card in desired:
-                    candidates.append(set(DomainLookup.Instance().FilterMonster(card)))
-
-                validDMs : set = candidates[0]
-                for candidate in candidates:
-                    validDMs = validDMs.intersection(candidate)
-
-                # Convert DMs to list
-                to_format = formatDict[toChoice.get()]
-
-                deck = [[], [], []]
-                for dm in validDMs:
-                    card = Card(CardsDB.Instance().GetCardById(dm[0]))
-                    if card.IsExtraDeckMonster():
-                        deck[1].append(card)
-                    else:
-                        deck[0].append(card)
-
-                answer = DeckFormatter.Instance().Encode(to_format, deck)
+                validDMs = DomainLookup.Instance().FindMastersForDeck(desired)
+
+                if(len(validDMs) == 0):
+                    answer = "No DM has every monster in its domain. The closest ones are:\n"
+                    for dm, missing in DomainLookup.Instance().RankMastersForDeck(desired):
+                        missingNames = sorted(set([card.name for card in missing]))
+                        answer += f"\n{CardsDB.Instance().GetNameById(dm)} (missing {len(missing)}: {', '.join(missingNames)})"
+
+                else:
+                    # Convert DMs to list
+                    to_format = formatDict[toChoice.get()]
+
+                    deck = [[], [], []]
+                    for dm in validDMs:
+                        card = Card(CardsDB.Instance().GetCardById(dm))
+                        if card.IsExtraDeckMonster():
+                            deck[1].append(card)
+                        else:
+                            deck[0].append(card)
+
+                    answer = DeckFormatter.Instance().Encode(to_format, deck)
 
             except (CardIdNotFoundError, CardNameNotFoundError) as error:
                 answer = f"Couldn't process card [{error.args[0]}].\nKeep in mind pre-released cards are not supported."
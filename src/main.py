@@ -8,6 +8,7 @@ from classes.textParsers.archetypes import Archetypes
 from classes.textParsers.attributes import Attributes
 from classes.textParsers.races import Races
 from classes.downloadManager import DownloadManager
+from classes.backgroundUpdater import BackgroundUpdater
 
 from classes.databases.cardsDB import CardsDB
 from classes.databases.domainLookup import DomainLookup
@@ -17,7 +18,15 @@ def main():
     freeze_support()
 
     # Setup
-    DownloadManager.DownloadFiles()
+    if("--no-memory-store" in sys.argv):
+        CardsDB.USE_MEMORY_STORE = False
+        DomainLookup.USE_MEMORY_INDEX = False
+
+    # Once there's local data, the program starts right away with it and updates are checked in the background.
+    backgroundUpdate = DownloadManager.HasLocalFiles() and "--wait-for-updates" not in sys.argv
+    if(not backgroundUpdate):
+        DownloadManager.DownloadFiles()
+
     Archetypes.Instance()
     Attributes.Instance()
     Races.Instance()
@@ -25,6 +34,9 @@ def main():
     DomainLookup.Instance()
     print("")
 
+    if(backgroundUpdate):
+        BackgroundUpdater.Instance().Start()
+
     if("--cli" in sys.argv):
         interface = CommandLineInterface()
     else:
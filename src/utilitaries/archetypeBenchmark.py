@@ -0,0 +1,96 @@
+import random
+import time
+
+from classes.card import Card
+from classes.domain import Domain
+from classes.textParsers.archetypes import Archetypes
+from classes.databases.cardsDB import CardsDB
+from classes.databases.domainLookup import DomainLookup
+
+# Compares how fast the code using Archetypes.GetBaseArchetype runs with:
+# - every setcode resolved again on each call (exceptions, base mask and hexName probes), like before the table;
+# - the table of all setcodes precomputed in Archetypes.Update (the current code).
+# Measures GetBaseArchetype itself, Domain.CheckIfCardInDomain, Domain.GenerateFromCard (domain generation)
+# and DomainLookup.ProcessDomainsJob (what each worker does when building the lookup).
+# Nothing is written to the lookup or the domain cache.
+# Must be run from the src folder, after the program has downloaded the CDBs:
+#   python -m utilitaries.archetypeBenchmark
+
+# Amount of domains each card is checked against.
+SAMPLE_SIZE = 300
+
+# Times GetBaseArchetype is called for every setcode of every card.
+CALL_REPEATS = 20
+
+# Each measure is taken this many times (the best one is kept), since a single run is quite noisy.
+RUNS = 2
+
+# Returns the best time of calling "function" RUNS times.
+def Best(function) -> float:
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+# Makes GetBaseArchetype resolve every setcode again on each call (or use the table again).
+def UseTable(useTable: bool) -> None:
+    archetypes = Archetypes.Instance()
+    if(useTable):
+        archetypes.__dict__.pop("GetBaseArchetype", None)
+    else:
+        archetypes.GetBaseArchetype = archetypes.ResolveBaseArchetype
+
+# Returns how many of each operation per second are done, as (name, amount, seconds).
+def Measure(setcodes: list[int], monsters: list[Card], domains: list[Domain]) -> list[tuple[str, int, float]]:
+    archetypes = Archetypes.Instance()
+    ids = [monster.id for monster in monsters]
+
+    def CallGetBaseArchetype():
+        for _ in range(CALL_REPEATS):
+            for setcode in setcodes:
+                archetypes.GetBaseArchetype(setcode)
+
+    def CheckCards():
+        for domain in domains:
+            for monster in monsters:
+                domain.CheckIfCardInDomain(monster)
+
+    def GenerateDomains():
+        for monster in monsters:
+            Domain.GenerateFromCard(monster)
+
+    def ProcessLookupJobs():
+        for start in range(0, len(ids), DomainLookup.JOB_CHUNK_SIZE):
+            DomainLookup.ProcessDomainsJob(ids[start:start + DomainLookup.JOB_CHUNK_SIZE])
+
+    return [
+        ("GetBaseArchetype", len(setcodes) * CALL_REPEATS, Best(CallGetBaseArchetype)),
+        ("CheckIfCardInDomain", len(domains) * len(monsters), Best(CheckCards)),
+        ("GenerateFromCard", len(monsters), Best(GenerateDomains)),
+        ("Lookup build jobs", len(monsters), Best(ProcessLookupJobs)),
+    ]
+
+def main():
+    cardsDB = CardsDB.Instance()
+    Archetypes.Instance()
+
+    monsters = [Card(row) for row in cardsDB.GetAllMonsters()]
+    setcodes = [setcode for monster in monsters for setcode in monster.setcodes]
+
+    random.seed(0)
+    domains = [Domain.GenerateFromCard(monster) for monster in random.sample(monsters, min(SAMPLE_SIZE, len(monsters)))]
+
+    UseTable(False)
+    before = Measure(setcodes, monsters, domains)
+    UseTable(True)
+    after = Measure(setcodes, monsters, domains)
+
+    print(f"{len(monsters)} monsters, best of {RUNS} runs (per second):")
+    print("{:<22}{:>14}{:>14}{:>10}".format("", "Resolved", "Table", "Speedup"))
+    for (name, amount, beforeTime), (_, _, afterTime) in zip(before, after):
+        print("{:<22}{:>14,.0f}{:>14,.0f}{:>9.2f}x".format(name, amount / beforeTime, amount / afterTime, beforeTime / afterTime))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import re
+import sys
+
+from classes.textParsers.attributes import Attributes
+from classes.databases.cardsDB import CardsDB
+from classes.card import Card
+from classes.domain import Domain
+
+# Compares Domain.ScanDesc (single pass) against the original parser,
+# which ran each regex over the description one after the other, removing the matches each time.
+# Both must find exactly the same things on every monster.
+# Must be run from the src folder, after the program has downloaded the CDBs:
+#   python -m utilitaries.descParserChecker
+
+# The original parser, kept here only for comparison.
+def CleanDesc(text: str, regex: str) -> tuple[set, str]:
+    matches = set()
+    def sub(match: str) -> str:
+        matches.add(match.group(1).lower())
+        return ""
+
+    cleaned = re.sub(regex, sub, text, flags=re.IGNORECASE)
+    return matches, cleaned
+
+def LegacyScanDesc(text: str) -> tuple[set, set, set, set]:
+    NOT_TREATED_AS = "\\(This card is not treated as an? (\".*?\") card.\\)"
+    QUOTE_CARDS = "\"({})\"".format("|".join(Domain.QUOTE_CARDS))
+    MENTIONED_QUOTES = "\"(.*?)\""
+    RACES = "(aqua|beast-warrior|beast|cyberse|dinosaur|divine-beast|dragon|fairy|fiend|fish|illusion|insect|machine|plant|psychic|pyro|reptile|rock|sea serpent|spellcaster|thunder|warrior|winged beast|wyrm|zombie)"
+    ATTRIBUTES = "({})".format("|".join(Attributes.Instance().nameHex.keys()))
+
+    _, text = CleanDesc(text, NOT_TREATED_AS)
+    quotes, text = CleanDesc(text, QUOTE_CARDS)
+    mentions, text = CleanDesc(text, MENTIONED_QUOTES)
+    races, text = CleanDesc(text, RACES)
+    attributes, text = CleanDesc(text, ATTRIBUTES)
+
+    return quotes, mentions, races, attributes
+
+def main():
+    cardsDB = CardsDB.Instance()
+
+    checked = 0
+    mismatches = 0
+    for id in cardsDB.GetAllMonsterIds():
+        card = Card(cardsDB.GetMonsterById(id[0]))
+        checked += 1
+
+        expected = LegacyScanDesc(card.desc)
+        found = Domain.ScanDesc(card.desc)
+
+        if(expected != found):
+            mismatches += 1
+            print(f"[{card.id}] {card.name}")
+            print(f"\texpected: {expected}")
+            print(f"\tfound:    {found}")
+
+    print(f"\n{mismatches} of {checked} descriptions parsed differently.")
+    sys.exit(1 if mismatches > 0 else 0)
+
+if __name__ == '__main__':
+    main()
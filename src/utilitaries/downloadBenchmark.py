@@ -0,0 +1,231 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import json
+import hashlib
+import tracemalloc
+import requests
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from constants.urlReference import URLs
+from classes.downloadEngine import DownloadEngine
+from classes.downloadManager import DownloadManager
+
+# Runs DownloadManager.DownloadFiles against a local stand-in for GitHub:
+# - on an empty folder, comparing it with downloading the same files one at a time (like before DownloadEngine);
+# - again with nothing changed, where every file should be revalidated without downloading anything;
+# - again after one CDB changed, where only that CDB should be downloaded;
+# - again while a changed file can't be downloaded, where the old file should be kept.
+# The stand-in answers every request after a delay, fails the first request for some files and drops the connection
+# halfway through others, so retries and resumed downloads are exercised too.
+# Must be run from the src folder:
+#   python -m utilitaries.downloadBenchmark
+
+# Seconds the stand-in waits before answering.
+LATENCY = 0.2
+
+CDB_FILES = ["cards.cdb"] + ["release-{}.cdb".format(n) for n in range(8)]
+FILE_SIZE = 256 * 1024
+# The cards.cdb is much bigger, to check memory use doesn't grow with the file size.
+BIG_FILE_SIZE = 16 * 1024 * 1024
+
+# Files whose first request fails with a 503.
+FLAKY_FILES = {"release-3.cdb", "strings.conf"}
+# Files whose first download is cut halfway.
+CUT_FILES = {"cards.cdb", "release-6.cdb"}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    contents: dict[str, bytes] = {}
+    failed = set()
+    cut = set()
+    # Files that can't be downloaded at all.
+    broken = set()
+    lock = threading.Lock()
+
+    # Bytes of every body sent.
+    sent = 0
+
+    def do_GET(self) -> None:
+        time.sleep(LATENCY)
+        path = self.path.split("?")[0]
+        name = path.rsplit("/", 1)[-1]
+
+        with StandInHandler.lock:
+            fail = name in FLAKY_FILES and name not in StandInHandler.failed
+            StandInHandler.failed.add(name)
+
+        if(fail or name in StandInHandler.broken):
+            self.Answer(503, b"")
+        elif(path == "/contents/"):
+            host = "http://{}:{}".format(*self.server.server_address)
+            listing = [{"name": file, "download_url": "{}/raw/{}".format(host, file), "sha": GetGitHash(StandInHandler.contents[file])} for file in CDB_FILES]
+            self.Answer(200, json.dumps(listing).encode())
+        elif(path.startswith("/raw/") and name in StandInHandler.contents):
+            self.Answer(200, StandInHandler.contents[name])
+        else:
+            self.Answer(404, b"")
+
+    # Answers with the body, with 304 if the client already has it or with the requested range of it.
+    def Answer(self, status: int, body: bytes) -> None:
+        etag = '"{}"'.format(GetHash(body))
+        total = len(body)
+        # Slices of a memoryview aren't copies, so the stand-in doesn't add to the memory measured.
+        body = memoryview(body)
+        start = 0
+        if(status == 200 and self.headers.get("If-None-Match") == etag):
+            status = 304
+            body = b""
+        elif(status == 200 and self.headers.get("Range") and self.headers.get("If-Range") == etag):
+            status = 206
+            start = int(self.headers["Range"].split("=")[1].split("-")[0])
+            body = body[start:]
+
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        if(status in [200, 206]):
+            self.send_header("ETag", etag)
+        if(status == 206):
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(start, total - 1, total))
+        self.end_headers()
+
+        name = self.path.rsplit("/", 1)[-1]
+        with StandInHandler.lock:
+            cut = status == 200 and name in CUT_FILES and name not in StandInHandler.cut
+            StandInHandler.cut.add(name)
+
+        if(cut):
+            body = body[:len(body) // 2]
+            self.close_connection = True
+
+        self.wfile.write(body)
+
+        with StandInHandler.lock:
+            StandInHandler.sent += len(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+def GetHash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+# The hash GitHub's API gives to a file's content.
+def GetGitHash(content: bytes) -> str:
+    sha = hashlib.sha1("blob {}\0".format(len(content)).encode())
+    sha.update(content)
+    return sha.hexdigest()
+
+def GetContent(name: str) -> bytes:
+    size = BIG_FILE_SIZE if name == "cards.cdb" else FILE_SIZE
+    return (name.encode() * (size // len(name) + 1))[:size]
+
+# Runs DownloadManager.DownloadFiles as if the last check was long ago.
+# Returns how long it took and how many bytes were downloaded.
+def Update() -> tuple[float, int]:
+    if(os.path.isfile(DownloadManager.GetDownloadInfoFile())):
+        os.remove(DownloadManager.GetDownloadInfoFile())
+
+    sent = StandInHandler.sent
+    start = time.perf_counter()
+    DownloadManager.DownloadFiles()
+    return time.perf_counter() - start, StandInHandler.sent - sent
+
+def ReadFile(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+# Returns the CDBs downloaded, and deletes them (like CardsDB does after merging them).
+def TakeCdbs() -> dict[str, bytes]:
+    cdbs = {}
+    for file in os.listdir(DownloadManager.GetCdbFolder()):
+        path = os.path.join(DownloadManager.GetCdbFolder(), file)
+        if(path != DownloadManager.GetMergedCDBPath()):
+            with open(path, "rb") as f:
+                cdbs[file] = f.read()
+            os.remove(path)
+    return cdbs
+
+def main():
+    for file in CDB_FILES + ["common.h", "strings.conf"]:
+        StandInHandler.contents[file] = GetContent(file)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = "http://{}:{}".format(*server.server_address)
+
+    URLs.BABEL_CDB = host + "/contents/"
+    URLs.ATTRIBUTES_AND_RACES = host + "/raw/common.h"
+    URLs.ARCHETYPES = host + "/raw/strings.conf"
+    URLs.PRE_ARCHETYPES = host + "/raw/pre/strings.conf"
+
+    # Retries shouldn't make the comparison about how long the backoff was.
+    DownloadEngine.BACKOFF_BASE = 0.1
+
+    folder = tempfile.mkdtemp()
+    currentFolder = DownloadManager.FILES_BASE_FOLDER
+    DownloadManager.FILES_BASE_FOLDER = folder
+    errors = []
+    try:
+        tracemalloc.start()
+        firstTime, firstBytes = Update()
+        peakMemory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        expected = {os.path.join(DownloadManager.GetCardInfoFolder(), file): GetContent(name) for file, name in [
+            (DownloadManager.ATTR_RACES_FILENAME, "common.h"),
+            (DownloadManager.ARCHETYPES_FILENAME, "strings.conf"),
+            (DownloadManager.PRE_ARCHETYPES_FILENAME, "strings.conf"),
+        ]}
+        for path, content in expected.items():
+            if(ReadFile(path) != content):
+                errors.append("Wrong file: " + path)
+
+        if(TakeCdbs() != {file: GetContent(file) for file in CDB_FILES}):
+            errors.append("Wrong CDBs on the first update.")
+
+        # What CardsDB would have merged them into.
+        open(DownloadManager.GetMergedCDBPath(), "wb").close()
+
+        unchangedTime, unchangedBytes = Update()
+        if(unchangedBytes != 0 or len(TakeCdbs()) != 0):
+            errors.append("Something was downloaded with nothing changed.")
+
+        StandInHandler.contents["release-5.cdb"] = GetContent("release-5.cdb v2")
+        changedTime, changedBytes = Update()
+        if(TakeCdbs() != {"release-5.cdb": StandInHandler.contents["release-5.cdb"]}):
+            errors.append("Wrong CDBs after one changed.")
+
+        attrRacesPath = os.path.join(DownloadManager.GetCardInfoFolder(), DownloadManager.ATTR_RACES_FILENAME)
+        StandInHandler.contents["common.h"] = GetContent("common.h v2")
+        StandInHandler.broken.add("common.h")
+        Update()
+        if(ReadFile(attrRacesPath) != GetContent("common.h")):
+            errors.append("The old file wasn't kept when its download failed.")
+
+        # The same requests as the first update, one at a time and without a shared session.
+        start = time.perf_counter()
+        requests.get(URLs.BABEL_CDB)
+        for url in [URLs.ATTRIBUTES_AND_RACES, URLs.ARCHETYPES, URLs.PRE_ARCHETYPES] + [host + "/raw/" + file for file in CDB_FILES]:
+            requests.get(url).content
+        sequentialTime = time.perf_counter() - start
+
+        leftovers = [file for _, _, files in os.walk(folder) for file in files if file.endswith(DownloadEngine.PART_SUFFIX)]
+        if(len(leftovers) > 0):
+            errors.append("Partial files were left behind: {}".format(leftovers))
+    finally:
+        DownloadManager.FILES_BASE_FOLDER = currentFolder
+        shutil.rmtree(folder)
+        server.shutdown()
+
+    print(f"{len(CDB_FILES) + 2} files of {FILE_SIZE // 1024}KB and one of {BIG_FILE_SIZE // 1024}KB, {LATENCY * 1000:.0f}ms of latency per request.")
+    print(f"First update:    {firstTime:.2f}s, {firstBytes // 1024}KB (with {len(FLAKY_FILES)} retries and {len(CUT_FILES)} resumed downloads),")
+    print(f"                 {peakMemory // 1024}KB of peak memory.")
+    print(f"One at a time:   {sequentialTime:.2f}s (downloads only, the old code also slept 2s after each file).")
+    print(f"Nothing changed: {unchangedTime:.2f}s, {unchangedBytes // 1024}KB.")
+    print(f"One CDB changed: {changedTime:.2f}s, {changedBytes // 1024}KB.")
+    print("All files downloaded correctly." if len(errors) == 0 else "\n".join(errors))
+
+if __name__ == '__main__':
+    main()
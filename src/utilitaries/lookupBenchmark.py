@@ -0,0 +1,125 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from classes.card import Card
+from classes.databases.cardsDB import CardsDB
+from classes.databases.domainLookup import DomainLookup
+from classes.databases.domainIndex import DomainIndex
+
+# Compares the size of the lookup and how long DomainLookup.GetDomain and DomainLookup.FilterMonster take with:
+# - the original layout (one row per DM & attribute/race/archetype/mention, schema version 1);
+# - the same rows with indexes from each DM to its relations (version 3);
+# - the current layout (attributes and races as bitmasks in the DM table, mentions by id).
+# Each layout is built in a temporary copy filled with the current lookup's DMs.
+# Must be run from the src folder, after the program has set up the lookup:
+#   python -m utilitaries.lookupBenchmark
+
+# Amount of monsters each query is run for.
+SAMPLE_SIZE = 200
+
+ROW_TABLES = [DomainLookup.ATTR_TABLE, DomainLookup.RACE_TABLE, DomainLookup.ARCH_TABLE, DomainLookup.QUOT_TABLE]
+
+# Builds the row layout with the current lookup's DMs.
+def CreateRowLayout(lookup: DomainLookup, path: str, withIndexes: bool) -> sqlite3.Connection:
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE '{}' ('id' INT PRIMARY KEY, 'hash' TEXT)".format(DomainLookup.DM_TABLE))
+    for table in ROW_TABLES:
+        db.execute("CREATE TABLE '{table}' ('{master}' INTEGER, '{table}' INTEGER, PRIMARY KEY('{table}','{master}'))".format(table=table, master=DomainLookup.DM_TABLE))
+        if(withIndexes):
+            db.execute("CREATE INDEX '{table}_{master}' ON '{table}' ('{master}', '{table}')".format(table=table, master=DomainLookup.DM_TABLE))
+
+    masters = lookup.db.execute("SELECT id, hash FROM {}".format(DomainLookup.DM_TABLE)).fetchall()
+    db.executemany("INSERT INTO {} VALUES (?, ?)".format(DomainLookup.DM_TABLE), masters)
+
+    class Master:
+        pass
+
+    for id, _ in masters:
+        master = Master()
+        master.id = id
+        for table, values in zip(ROW_TABLES, lookup.GetDomain(master)):
+            db.executemany("INSERT INTO {} VALUES (?, ?)".format(table), [(id, value[0]) for value in values])
+
+    db.commit()
+    db.execute("VACUUM")
+    return db
+
+# Copies only the current lookup's domain tables.
+def CreateMaskLayout(lookup: DomainLookup, path: str) -> sqlite3.Connection:
+    lookup.db.execute("VACUUM INTO ?", (path,))
+    db = sqlite3.connect(path)
+    for table in [DomainLookup.INFO_TABLE, DomainLookup.NAMED_CARD_TABLE, DomainLookup.SCHEMA_VERSION_TABLE]:
+        db.execute("DROP TABLE IF EXISTS '{}'".format(table))
+    db.commit()
+    db.execute("VACUUM")
+    return db
+
+# The queries of DomainLookup.GetDomain and DomainLookup.FilterMonster for the row layout.
+def RowGetDomain(db: sqlite3.Connection, monster: Card) -> list:
+    query = "SELECT {table} FROM {table} WHERE {master} = ?"
+    return [db.execute(query.format(table=table, master=DomainLookup.DM_TABLE), (monster.id,)).fetchall() for table in ROW_TABLES]
+
+def RowFilterMonster(db: sqlite3.Connection, monster: Card) -> list:
+    part = "SELECT {master} FROM {table} WHERE {table} = ?"
+    parts = [part.format(table=table, master=DomainLookup.DM_TABLE) for table in [DomainLookup.ATTR_TABLE, DomainLookup.RACE_TABLE, DomainLookup.QUOT_TABLE]]
+    args = [monster.attribute, monster.race, monster.name.lower()]
+
+    for baseArch in DomainIndex.GetSignature(monster)[3]:
+        parts.append(part.format(table=DomainLookup.ARCH_TABLE, master=DomainLookup.DM_TABLE))
+        args.append(baseArch)
+
+    return db.execute("\n UNION ".join(parts), args).fetchall()
+
+def Measure(getDomain, filterMonster, monsters: list[Card]) -> tuple[float, float]:
+    start = time.perf_counter()
+    for monster in monsters:
+        getDomain(monster)
+    getDomainTime = (time.perf_counter() - start) / len(monsters)
+
+    start = time.perf_counter()
+    for monster in monsters:
+        filterMonster(monster)
+    filterMonsterTime = (time.perf_counter() - start) / len(monsters)
+
+    return getDomainTime, filterMonsterTime
+
+def main():
+    lookup = DomainLookup.Instance()
+    cardsDB = CardsDB.Instance()
+
+    random.seed(0)
+    ids = [row[0] for row in cardsDB.GetAllMonsterIds()]
+    monsters = [Card(cardsDB.GetCardById(id)) for id in random.sample(ids, min(SAMPLE_SIZE, len(ids)))]
+
+    results = []
+    folder = tempfile.mkdtemp()
+    try:
+        for name, withIndexes in [("Rows (v1)", False), ("Rows (v3)", True)]:
+            path = os.path.join(folder, name)
+            db = CreateRowLayout(lookup, path, withIndexes)
+            times = Measure(lambda monster: RowGetDomain(db, monster), lambda monster: RowFilterMonster(db, monster), monsters)
+            results.append((name, os.path.getsize(path), times))
+            db.close()
+
+        path = os.path.join(folder, "masks")
+        db = CreateMaskLayout(lookup, path)
+        currentDB = lookup.db
+        lookup.db = db
+        times = Measure(lookup.GetDomain, lookup.FilterMonster, monsters)
+        lookup.db = currentDB
+        results.append((f"Masks (v{DomainLookup.SCHEMA_VERSION})", os.path.getsize(path), times))
+        db.close()
+    finally:
+        shutil.rmtree(folder)
+
+    print(f"Average over {len(monsters)} monsters:")
+    print("{:<15}{:>12}{:>15}{:>15}".format("", "Size", "GetDomain", "FilterMonster"))
+    for name, size, times in results:
+        print("{:<15}{:>10.0f}KB{:>13.3f}ms{:>13.3f}ms".format(name, size / 1024, times[0] * 1000, times[1] * 1000))
+
+if __name__ == '__main__':
+    main()
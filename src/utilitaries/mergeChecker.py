@@ -0,0 +1,172 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+
+from classes.downloadManager import DownloadManager
+from classes.databases.cardsDB import CardsDB
+from classes.databases.domainLookup import DomainLookup
+from classes.card import Card
+
+# Checks that CardsDB.UpdateDBs carries changed CDBs over to the merged CDB, and from there to the lookup:
+# - errata in the cards.cdb (or any other CDB) replace the old text, and the lookup generates the DM again;
+# - cards removed from a CDB are removed from the merged CDB too;
+# - the cards.cdb still takes precedence over other CDBs with the same card;
+# - a card that moved from a release CDB into the cards.cdb goes back to the release's card
+#   once the cards.cdb changes without it, even though the release CDB didn't change.
+# Runs on a small copy of the current cards, in a temporary folder.
+# Must be run from the src folder, after the program has downloaded the CDBs:
+#   python -m utilitaries.mergeChecker
+
+# Amount of monsters in the test cards.cdb.
+# Few enough that the lookup is built without starting any workers.
+SAMPLE_SIZE = 100
+
+RELEASE_CDB = "release-check.cdb"
+
+# Writes a CDB with the given rows ({table : rows}), with the same tables as the original CDBs.
+def WriteCdb(path: str, schema: dict[str, str], rows: dict[str, list]) -> None:
+    if(os.path.isfile(path)):
+        os.remove(path)
+
+    db = sqlite3.connect(path)
+    for table, create in schema.items():
+        db.execute(create)
+        if(len(rows[table]) > 0):
+            db.executemany("INSERT INTO {} VALUES ({})".format(table, ",".join(["?"] * len(rows[table][0]))), rows[table])
+    db.commit()
+    db.close()
+
+# Returns the rows of the given cards ({table : rows}), with their descs replaced by the ones in "descs".
+def GetRows(source: sqlite3.Connection, ids: list[int], descs: dict[int, str] = {}) -> dict[str, list]:
+    rows = {}
+    for table in CardsDB.CDB_TABLES:
+        query = "SELECT * FROM {} WHERE id IN ({}) ORDER BY id".format(table, ",".join(["?"] * len(ids)))
+        cursor = source.execute(query, ids)
+        columns = [column[0] for column in cursor.description]
+        rows[table] = [list(row) for row in cursor]
+
+        if("desc" in columns):
+            for row in rows[table]:
+                if(row[0] in descs):
+                    row[columns.index("desc")] = descs[row[0]]
+
+    return rows
+
+# Merges the CDBs in the folder and updates the lookup, like when the program starts.
+def SetUp() -> None:
+    if(CardsDB._instance is not None):
+        CardsDB.Instance().CloseDB()
+    if(DomainLookup._instance is not None):
+        DomainLookup.Instance().db.close()
+    CardsDB._instance = None
+    DomainLookup._instance = None
+
+    CardsDB.Instance()
+    DomainLookup.Instance()
+
+def GetDesc(id: int) -> str:
+    data = CardsDB.Instance().db.execute("SELECT desc FROM texts WHERE id = ?", (id,)).fetchone()
+    return None if data is None else data[0]
+
+def main():
+    source = sqlite3.connect(DownloadManager.GetMergedCDBPath())
+    schema = dict(source.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name IN ({})".format(
+        ",".join("'{}'".format(table) for table in CardsDB.CDB_TABLES)
+    )))
+
+    ids = [row[0] for row in source.execute(
+        "SELECT id FROM datas WHERE type & 1 = 1 AND type & 16384 = 0 AND alias = 0 ORDER BY id LIMIT ?", (SAMPLE_SIZE + 1,)
+    )]
+    cardIds, releaseId = ids[:-1], ids[-1]
+    erratedId, namedId, removedId, sharedId, movedId = cardIds[:5]
+
+    named = source.execute("SELECT name FROM texts WHERE id = ?", (namedId,)).fetchone()[0]
+    erratedDesc = source.execute("SELECT desc FROM texts WHERE id = ?", (erratedId,)).fetchone()[0]
+    erratedDesc += '\nYou can add 1 "{}" from your Deck to your hand.'.format(named)
+
+    cardInfoFolder = DownloadManager.GetCardInfoFolder()
+    folder = tempfile.mkdtemp()
+    currentFolder = DownloadManager.FILES_BASE_FOLDER
+    DownloadManager.FILES_BASE_FOLDER = folder
+
+    stdout = sys.stdout
+    errors = []
+    try:
+        shutil.copytree(cardInfoFolder, DownloadManager.GetCardInfoFolder())
+        os.mkdir(DownloadManager.GetCdbFolder())
+        cardsPath = os.path.join(DownloadManager.GetCdbFolder(), DownloadManager.CARDS_CDB)
+        releasePath = os.path.join(DownloadManager.GetCdbFolder(), RELEASE_CDB)
+
+        sys.stdout = open(os.devnull, "w")
+
+        # The release CDB also has one of the cards in the cards.cdb, with a different text,
+        # and a card that isn't in the cards.cdb yet.
+        releaseDescs = {sharedId: "Release text.", movedId: "Release moved text."}
+        WriteCdb(cardsPath, schema, GetRows(source, [id for id in cardIds if id != movedId]))
+        WriteCdb(releasePath, schema, GetRows(source, [releaseId, sharedId, movedId], releaseDescs))
+        SetUp()
+        sharedDesc = GetDesc(sharedId)
+        movedDesc = GetDesc(movedId)
+
+        if(sharedDesc == "Release text."):
+            errors.append("The release CDB replaced a card from the cards.cdb.")
+        if(movedDesc != "Release moved text."):
+            errors.append("The release's card that isn't in the cards.cdb wasn't merged.")
+
+        # Errata to a DM (naming another card) and to the release's card, a card removed from the cards.cdb
+        # and the release's card moved into the cards.cdb.
+        releaseDescs[releaseId] = "Release errata."
+        WriteCdb(cardsPath, schema, GetRows(source, [id for id in cardIds if id != removedId], {erratedId: erratedDesc}))
+        WriteCdb(releasePath, schema, GetRows(source, [releaseId, sharedId, movedId], releaseDescs))
+        SetUp()
+
+        if(GetDesc(erratedId) != erratedDesc):
+            errors.append("The errata in the cards.cdb didn't reach the merged CDB.")
+        if(GetDesc(releaseId) != "Release errata."):
+            errors.append("The errata in the release CDB didn't reach the merged CDB.")
+        if(GetDesc(removedId) is not None):
+            errors.append("The card removed from the cards.cdb is still in the merged CDB.")
+        if(GetDesc(sharedId) != sharedDesc):
+            errors.append("The release CDB replaced a card from the cards.cdb after changing.")
+        if(GetDesc(movedId) == movedDesc):
+            errors.append("The card moved into the cards.cdb kept the release's text.")
+
+        lookup = DomainLookup.Instance()
+        DM = Card(CardsDB.Instance().GetMonsterById(erratedId))
+        storedHash = lookup.db.execute("SELECT hash FROM {} WHERE id = ?".format(DomainLookup.DM_TABLE), (erratedId,)).fetchone()
+        if(storedHash is None or storedHash[0] != DomainLookup.GetContentHash(DM)):
+            errors.append("The lookup wasn't updated with the errata.")
+        if((named.lower(),) not in lookup.GetDomain(DM)[3]):
+            errors.append("The errata'd DM's domain doesn't include the card it now names.")
+        if(lookup.db.execute("SELECT 1 FROM {} WHERE id = ?".format(DomainLookup.DM_TABLE), (removedId,)).fetchone() is not None):
+            errors.append("The removed card is still in the lookup.")
+
+        # The cards.cdb changes again without the moved and the shared cards, while the release CDB doesn't change:
+        # both are taken from the release CDB again.
+        WriteCdb(cardsPath, schema, GetRows(source, [id for id in cardIds if id not in [removedId, sharedId, movedId]], {erratedId: erratedDesc}))
+        SetUp()
+
+        if(GetDesc(movedId) != "Release moved text."):
+            errors.append("The card removed from the cards.cdb wasn't taken from the unchanged release CDB.")
+        if(GetDesc(sharedId) != "Release text."):
+            errors.append("The shared card removed from the cards.cdb wasn't taken from the unchanged release CDB.")
+        if(GetDesc(releaseId) != "Release errata."):
+            errors.append("The release's own card changed when the cards.cdb did.")
+        if(GetDesc(erratedId) != erratedDesc):
+            errors.append("The cards.cdb's card lost its errata when the cards.cdb changed again.")
+    finally:
+        sys.stdout = stdout
+        CardsDB.Instance().CloseDB()
+        DomainLookup.Instance().db.close()
+        CardsDB._instance = None
+        DomainLookup._instance = None
+        DownloadManager.FILES_BASE_FOLDER = currentFolder
+        source.close()
+        shutil.rmtree(folder)
+
+    print("Changed CDBs were merged correctly." if len(errors) == 0 else "\n".join(errors))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import sys
+
+from classes.databases.cardsDB import CardsDB
+
+# Checks if any of the CardsDB queries falls back to scanning an entire table
+# (which means it isn't using the indexes in CardsDB.INDEXES).
+# Must be run from the src folder, after the program has downloaded the CDBs:
+#   python -m utilitaries.queryPlanChecker
+
+# Tables that should never be fully scanned.
+CHECKED_TABLES = ["datas", "texts"]
+
+def IsFullScan(detail: str) -> bool:
+    for table in CHECKED_TABLES:
+        # "SCAN datas USING INDEX ..." is fine, just "SCAN datas" is not.
+        if(detail == f"SCAN {table}"):
+            return True
+    return False
+
+def main():
+    # Queries have to actually go to SQLite.
+    CardsDB.USE_MEMORY_STORE = False
+    cardsDB = CardsDB.Instance()
+
+    monsterId = cardsDB.GetAllMonsterIds()[0][0]
+    monster = cardsDB.GetCardById(monsterId)
+    name = monster[6]
+    attributes = [monster[5]]
+    races = [monster[4]]
+    setcodes = [row[0] for row in cardsDB.db.execute("SELECT DISTINCT base_setcode FROM card_setcode LIMIT 2")]
+
+    statements = []
+    cardsDB.db.set_trace_callback(statements.append)
+
+    cardsDB.GetNameById(monsterId)
+    cardsDB.GetAliasById(monsterId)
+    cardsDB.GetCardById(monsterId)
+    cardsDB.GetMonsterById(monsterId)
+    cardsDB.GetMonsterByName(name)
+    cardsDB.GetCardByName(name)
+    cardsDB.GetCardsByIds([monsterId, monsterId])
+    cardsDB.GetCardsByNames([name, name])
+    cardsDB.GetMonstersByAttributeAndRace(attributes, races)
+    cardsDB.GetMonstersExcludingAttributeAndRace(attributes, races)
+    cardsDB.GetDomainCards(attributes, races, setcodes, [name], True)
+    cardsDB.GetAllMonsterIds()
+    cardsDB.GetAllMonsterNames()
+    cardsDB.GetAllSpellsAndTraps()
+
+    cardsDB.db.set_trace_callback(None)
+
+    failed = 0
+    for statement in statements:
+        plan = [row[3] for row in cardsDB.db.execute("EXPLAIN QUERY PLAN " + statement)]
+        fullScans = [detail for detail in plan if IsFullScan(detail)]
+
+        print(("FULL SCAN " if len(fullScans) > 0 else "OK        ") + statement)
+        for detail in plan:
+            print("\t" + detail)
+
+        if(len(fullScans) > 0):
+            failed += 1
+
+    print(f"\n{failed} of {len(statements)} queries scan an entire table.")
+    sys.exit(1 if failed > 0 else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import os
+import sys
+import time
+
+from classes.textParsers.archetypes import Archetypes
+from classes.textParsers.attributes import Attributes
+from classes.textParsers.races import Races
+from classes.textParsers.referenceSnapshot import ReferenceSnapshot
+
+# Compares how long setting up the Archetypes, Attributes and Races references takes
+# when parsing the reference files and when loading them from the ReferenceSnapshot,
+# and checks both give the same tables.
+# Must be run from the src folder, after the program has downloaded the reference files:
+#   python -m utilitaries.referenceBenchmark
+
+# Amount of times each is measured (the best one is kept).
+REPEATS = 20
+
+PARSERS = [Archetypes, Attributes, Races]
+
+# Sets up all references again. Returns how long it took and their tables.
+def SetUp() -> tuple[float, list]:
+    for parser in PARSERS:
+        parser._instance = None
+    ReferenceSnapshot._instance = None
+
+    start = time.perf_counter()
+    references = [parser.Instance() for parser in PARSERS]
+    setUpTime = time.perf_counter() - start
+
+    tables = [(reference.hexName, reference.nameHex) for reference in references]
+    tables.append(references[0].baseArchetypes)
+    return setUpTime, tables
+
+def main():
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, "w")
+
+    try:
+        parseTimes = []
+        for _ in range(REPEATS):
+            if(os.path.isfile(ReferenceSnapshot.GetSnapshotPath())):
+                os.remove(ReferenceSnapshot.GetSnapshotPath())
+            parseTime, parsed = SetUp()
+            parseTimes.append(parseTime)
+
+        snapshotTimes = []
+        for _ in range(REPEATS):
+            snapshotTime, loaded = SetUp()
+            snapshotTimes.append(snapshotTime)
+    finally:
+        sys.stdout = stdout
+
+    print(f"Best of {REPEATS}:")
+    print(f"Parsing the reference files: {min(parseTimes) * 1000:.2f}ms (including writing the snapshot).")
+    print(f"Loading the snapshot:        {min(snapshotTimes) * 1000:.2f}ms, {os.path.getsize(ReferenceSnapshot.GetSnapshotPath()) // 1024}KB.")
+    print("Same tables." if parsed == loaded else "The snapshot has different tables!")
+
+if __name__ == '__main__':
+    main()